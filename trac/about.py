@@ -22,7 +22,7 @@ import re
 from genshi.builder import tag
 
 from trac.core import *
-from trac.loader import get_plugin_info
+from trac.loader import get_plugin_info, load_deferred_components
 from trac.perm import IPermissionRequestor
 from trac.util.translation import _
 from trac.web import IRequestHandler
@@ -69,6 +69,7 @@ class AboutModule(Component):
 
         if 'CONFIG_VIEW' in req.perm('config', 'ini'):
             # Collect config information
+            load_deferred_components(self.env)
             defaults = self.config.defaults(self.compmgr)
             sections = []
             for section in self.config.sections(self.compmgr):
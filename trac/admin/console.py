@@ -553,10 +553,25 @@ class TracAdminHelpMacro(WikiMacroBase):
         return html.PRE(buf.getvalue(), class_='wiki')
 
 
+def _profile(func, *args):
+    """Call `func` under the profiler and print the most expensive calls
+    on `stderr`."""
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats('cumulative').print_stats(40)
+
+
 def run(args=None):
     """Main entry point."""
     if args is None:
         args = sys.argv[1:]
+    if args and args[0] == '--profile-startup':
+        return _profile(run, args[1:])
     if has_babel:
         translation.activate(get_console_locale())
     admin = TracAdmin()
@@ -49,7 +49,7 @@ from trac.web import HTTPBadRequest, IRequestHandler, RequestDone
 from trac.web.chrome import (INavigationContributor, add_ctxtnav, add_link,
                              add_stylesheet, web_context, add_warning)
 from trac.web.href import Href
-from trac.wiki.api import IWikiSyntaxProvider
+from trac.wiki.api import IWikiSyntaxProvider, WikiSystem
 from trac.wiki.formatter import format_to
 
 
@@ -331,7 +331,11 @@ class Attachment(object):
                    (self.parent_realm, self.parent_id, filename, self.size,
                     to_utimestamp(t), self.description, self.author,
                     self.ipnr))
-                shutil.copyfileobj(fileobj, targetfile)
+                # Uploaded files are moved in place rather than copied
+                move_to = getattr(fileobj, 'move_to', None)
+                path = os.path.join(dir, self._get_hashed_filename(filename))
+                if not (move_to and move_to(path)):
+                    shutil.copyfileobj(fileobj, targetfile)
                 self.resource.id = self.filename = filename
 
                 self.env.log.info("New attachment: %s by %s", self.title,
@@ -427,8 +431,8 @@ class Attachment(object):
 
 class AttachmentModule(Component):
 
-    implements(IRequestHandler, INavigationContributor, IWikiSyntaxProvider,
-               IResourceManager)
+    implements(IAttachmentChangeListener, IRequestHandler,
+               INavigationContributor, IWikiSyntaxProvider, IResourceManager)
 
     change_listeners = ExtensionPoint(IAttachmentChangeListener)
     manipulators = ExtensionPoint(IAttachmentManipulator)
@@ -455,6 +459,18 @@ class AttachmentModule(Component):
         For public sites where anonymous users can create attachments it is
         recommended to leave this option disabled (which is the default).""")
 
+    # IAttachmentChangeListener methods
+
+    def attachment_added(self, attachment):
+        WikiSystem(self.env).invalidate_change_stamp()
+
+    def attachment_deleted(self, attachment):
+        WikiSystem(self.env).invalidate_change_stamp()
+
+    def attachment_reparented(self, attachment, old_parent_realm,
+                              old_parent_id):
+        WikiSystem(self.env).invalidate_change_stamp()
+
     # INavigationContributor methods
 
     def get_active_navigation_item(self, req):
@@ -469,6 +485,13 @@ class AttachmentModule(Component):
         match = re.match(r'/(raw-|zip-)?attachment/([^/]+)(?:/(.*))?$',
                          req.path_info)
         if match:
+            if req.method == 'POST':
+                # Spool the uploaded file next to its final location and
+                # reject it as soon as it exceeds the maximum size
+                req.environ['trac.upload_dir'] = os.path.join(self.env.path,
+                                                              'files')
+                if self.max_size >= 0:
+                    req.environ['trac.upload_max_size'] = self.max_size
             format, realm, path = match.groups()
             if format:
                 req.args['format'] = format[:-1]
@@ -992,6 +1015,13 @@ class LegacyAttachmentPolicy(Component):
                 if decision is not None:
                     return decision
 
+    def check_permissions(self, action, username, resources, perm):
+        if action not in self._perm_maps:
+            return [None] * len(resources)
+        return [self.check_permission(action, username, resource,
+                                      perm(resource) if resource else perm)
+                for resource in resources]
+
 
 class AttachmentAdmin(Component):
     """trac-admin command provider for attachment administration."""
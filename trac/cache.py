@@ -14,6 +14,7 @@
 from __future__ import with_statement
 
 from .core import Component
+from .db.api import DatabaseManager
 from .util import arity
 from .util.concurrency import ThreadLocal, threading
 
@@ -71,11 +72,18 @@ class CachedSingletonProperty(CachedPropertyBase):
         return CacheManager(instance.env).get(id, self.retriever, instance)
 
     def __delete__(self, instance):
+        self.update(instance, None)
+
+    def update(self, instance, updater):
+        """Invalidate the cached attribute of `instance`, updating the
+        data cached in this process with `updater` when possible (see
+        `CacheManager.invalidate`).
+        """
         try:
             id = self.id
         except AttributeError:
             id = self.id = key_to_id(self.make_key(instance.__class__))
-        CacheManager(instance.env).invalidate(id)
+        CacheManager(instance.env).invalidate(id, updater)
 
 
 class CachedProperty(CachedPropertyBase):
@@ -105,11 +113,18 @@ class CachedProperty(CachedPropertyBase):
         return CacheManager(instance.env).get(id, self.retriever, instance)
 
     def __delete__(self, instance):
+        self.update(instance, None)
+
+    def update(self, instance, updater):
+        """Invalidate the cached attribute of `instance`, updating the
+        data cached in this process with `updater` when possible (see
+        `CacheManager.invalidate`).
+        """
         id = getattr(instance, self.key_attr)
         if isinstance(id, str):
             id = key_to_id(self.make_key(instance.__class__) + ':' + id)
             setattr(instance, self.key_attr, id)
-        CacheManager(instance.env).invalidate(id)
+        CacheManager(instance.env).invalidate(id, updater)
 
 
 def cached(fn_or_attr=None):
@@ -159,6 +174,15 @@ def cached(fn_or_attr=None):
     hash of the key on first access, so it should not be used for any
     other purpose.
 
+    When the change to the underlying data is known, the cached value
+    can be updated in place instead of being retrieved again by this
+    process, by passing a function computing the new value from the
+    old one to the ``update()`` method of the descriptor. The function
+    must not modify the value it is given, as it may be in use by
+    other threads::
+
+        WikiSystem.pages.update(self, lambda pages: pages | set([name]))
+
     In either case, this decorator requires that the object on which
     it is used has an ``env`` attribute containing the application
     `~trac.env.Environment`.
@@ -246,8 +270,15 @@ class CacheManager(Component):
                 local_meta[id] = db_generation
                 return data
 
-    def invalidate(self, id):
-        """Invalidate cached data for the given id."""
+    def invalidate(self, id, updater=None):
+        """Invalidate cached data for the given id.
+
+        If `updater` is specified and the data cached in this process
+        is the one of the generation being invalidated, the data is
+        replaced by `updater(data)` once the transaction is committed,
+        instead of being retrieved again by this process. Other
+        processes retrieve the data from the database as usual.
+        """
         with self.env.db_transaction as db:
             with self._lock:
                 # Invalidate in other processes
@@ -261,15 +292,43 @@ class CacheManager(Component):
                 #    and we can safely INSERT a new row.
                 db("UPDATE cache SET generation=generation+1 WHERE id=%s",
                    (id,))
-                if not db("SELECT generation FROM cache WHERE id=%s", (id,)):
+                for generation, in db("SELECT generation FROM cache "
+                                      "WHERE id=%s", (id,)):
+                    break
+                else:
+                    generation = 0
                     db("INSERT INTO cache VALUES (%s, %s, %s)",
-                       (id, 0, _id_to_key.get(id, '<unknown>')))
+                       (id, generation, _id_to_key.get(id, '<unknown>')))
 
                 # Invalidate in this process
-                self._cache.pop(id, None)
+                entry = self._cache.pop(id, None)
 
                 # Invalidate in this thread
                 try:
                     del self._local.cache[id]
                 except (KeyError, TypeError):
                     pass
+
+            # The UPDATE above holds a lock on the row until the end of
+            # the transaction, so the cached data is only one generation
+            # old if no other process changed it since it was retrieved.
+            # The updated data is only cached once the new generation is
+            # committed, as a rollback would make that generation number
+            # refer to another change.
+            if updater is not None and entry is not None and \
+                    entry[1] == generation - 1:
+                data = entry[0]
+                def update():
+                    self._update(id, updater(data), generation)
+                DatabaseManager(self.env).after_commit(update)
+
+    def _update(self, id, data, generation):
+        with self._lock:
+            # Keep data retrieved meanwhile for a newer generation
+            current = self._cache.get(id)
+            if current is not None and current[1] >= generation:
+                return
+            entry = self._cache[id] = (data, generation)
+            if self._local.cache is not None:
+                self._local.cache[id] = entry
+                self._local.meta[id] = generation
@@ -802,12 +802,14 @@ class ConfigurationAdmin(Component):
                self._complete_config, self._do_set)
 
     def _complete_config(self, args):
+        self._load_deferred_components()
         if len(args) == 1:
             return self.config.sections()
         elif len(args) == 2:
             return [name for (name, value) in self.config[args[0]].options()]
 
     def _do_get(self, section, option):
+        self._load_deferred_components()
         if not self.config.has_option(section, option):
             raise AdminCommandError(
                 _("Option '%(option)s' doesn't exist in section '%(section)s'",
@@ -821,6 +823,7 @@ class ConfigurationAdmin(Component):
             self.config.parse_if_needed(force=True) # Full reload
 
     def _do_remove(self, section, option):
+        self._load_deferred_components()
         if not self.config.has_option(section, option):
             raise AdminCommandError(
                 _("Option '%(option)s' doesn't exist in section '%(section)s'",
@@ -829,3 +832,9 @@ class ConfigurationAdmin(Component):
         self.config.save()
         if section == 'inherit' and option == 'file':
             self.config.parse_if_needed(force=True) # Full reload
+
+    def _load_deferred_components(self):
+        # The options declared by the plugins which haven't been loaded
+        # because they are disabled still have a default value
+        from trac.loader import load_deferred_components
+        load_deferred_components(self.env)
@@ -85,7 +85,9 @@ def with_transaction(env, db=None):
                 try:
                     fn(db)
                 finally:
+                    # The caller commits, so callbacks can't be honored
                     _transaction_local.wdb = None
+                    _transaction_local.callbacks = None
             else:
                 assert ldb is db, "Invalid transaction nesting"
                 fn(db)
@@ -99,12 +101,23 @@ def with_transaction(env, db=None):
                 _transaction_local.wdb = None
             except:
                 _transaction_local.wdb = None
+                _transaction_local.callbacks = None
                 ldb.rollback()
                 ldb = None
                 raise
+            _call_commit_callbacks(_transaction_local)
     return transaction_wrapper
 
 
+def _call_commit_callbacks(transaction_local):
+    """Call the functions registered with `DatabaseManager.after_commit`
+    for the transaction that has just been committed."""
+    callbacks = transaction_local.callbacks
+    transaction_local.callbacks = None
+    for callback in callbacks or ():
+        callback()
+
+
 class DbContextManager(object):
     """Database Context Manager
 
@@ -150,13 +163,17 @@ class TransactionContextManager(DbContextManager):
 
     def __exit__(self, et, ev, tb):
         if self.db:
-            self.dbmgr._transaction_local.wdb = None
+            transaction_local = self.dbmgr._transaction_local
+            transaction_local.wdb = None
             if et is None:
                 self.db.commit()
             else:
+                transaction_local.callbacks = None
                 self.db.rollback()
-            if not self.dbmgr._transaction_local.rdb:
+            if not transaction_local.rdb:
                 self.db.close()
+            if et is None:
+                _call_commit_callbacks(transaction_local)
 
 
 class QueryContextManager(DbContextManager):
@@ -242,7 +259,8 @@ class DatabaseManager(Component):
 
     def __init__(self):
         self._cnx_pool = None
-        self._transaction_local = ThreadLocal(wdb=None, rdb=None)
+        self._transaction_local = ThreadLocal(wdb=None, rdb=None,
+                                              callbacks=None)
 
     def init_db(self):
         connector, args = self.get_connector()
@@ -264,6 +282,20 @@ class DatabaseManager(Component):
             db = ConnectionWrapper(db, readonly=True)
         return db
 
+    def after_commit(self, callback):
+        """Call `callback` without arguments once the current
+        transaction has been committed. The callback is discarded if
+        the transaction is rolled back.
+
+        This must be called within a `TransactionContextManager`.
+
+        :since: 1.1.2
+        """
+        assert self._transaction_local.wdb, "No transaction in progress"
+        if self._transaction_local.callbacks is None:
+            self._transaction_local.callbacks = []
+        self._transaction_local.callbacks.append(callback)
+
     def get_exceptions(self):
         return self.get_connector()[0].get_exceptions()
 
@@ -203,6 +203,15 @@ _pool_size = int(os.environ.get('TRAC_DB_POOL_SIZE', 10))
 _backend = ConnectionPoolBackend(_pool_size)
 
 
+def get_pool_size():
+    """Return the maximal number of database connections in the pool,
+    as set by the `TRAC_DB_POOL_SIZE` environment variable.
+
+    :since: 1.1.2
+    """
+    return _pool_size
+
+
 class ConnectionPool(object):
     def __init__(self, maxsize, connector, **kwargs):
         # maxsize not used right now but kept for api compatibility
@@ -42,7 +42,8 @@ def make_env(get_cnx):
     from trac.core import ComponentManager
     return Mock(ComponentManager, components={DatabaseManager:
              Mock(get_connection=get_cnx,
-                  _transaction_local=ThreadLocal(wdb=None, rdb=None))})
+                  _transaction_local=ThreadLocal(wdb=None, rdb=None,
+                                                 callbacks=None))})
 
 
 class WithTransactionTest(unittest.TestCase):
@@ -17,7 +17,7 @@
 from trac.db import Table, Column, Index
 
 # Database version identifier. Used for automatic upgrades.
-db_version = 30
+db_version = 31
 
 def __mkreports(reports):
     """Utility function used to create report data in same syntax as the
@@ -105,7 +105,8 @@ schema = [
         Column('change_type', size=1, key_size=2),
         Column('base_path'),
         Column('base_rev'),
-        Index(['repos', 'rev'])],
+        Index(['repos', 'rev']),
+        Index(['repos', 'path', 'rev'])],
 
     # Ticket system
     Table('ticket', key='id')[
@@ -21,11 +21,12 @@ from __future__ import with_statement
 import os.path
 import setuptools
 import sys
+from bisect import bisect_left
 from urlparse import urlsplit
 
 from trac import db_default
 from trac.admin import AdminCommandError, IAdminCommandProvider
-from trac.cache import CacheManager
+from trac.cache import CacheManager, key_to_id
 from trac.config import *
 from trac.core import Component, ComponentManager, implements, Interface, \
                       ExtensionPoint, TracError
@@ -47,6 +48,10 @@ __all__ = ['Environment', 'IEnvironmentSetupParticipant', 'open_environment']
 # Content of the VERSION file in the environment
 _VERSION = 'Trac Environment Version 1'
 
+# Cache ids of the known users
+_known_users_id = key_to_id('trac.env.Environment._known_users')
+_known_users_dict_id = key_to_id('trac.env.Environment._known_users_dict')
+
 
 class ISystemInfoProvider(Interface):
     """Provider of system information, displayed in the "About Trac"
@@ -638,30 +643,112 @@ class Environment(Component, ComponentManager):
         self.log.info('-' * 32 + ' environment startup [Trac %s] ' + '-' * 32,
                       get_pkginfo(core).get('version', VERSION))
 
-    def get_known_users(self, cnx=None):
-        """Generator that yields information about all known users,
-        i.e. users that have logged in to this Trac environment and
-        possibly set their name and email.
+    def get_known_users(self, cnx=None, as_dict=False):
+        """Returns information about all known users, i.e. users that
+        have logged in to this Trac environment and possibly set their
+        name and email.
+
+        By default this function returns an iterator that yields one
+        tuple for every user, of the form (username, name, email),
+        ordered alpha-numerically by username. When `as_dict` is `True`
+        the function returns a dictionary mapping username to a
+        (name, email) tuple.
 
-        This function generates one tuple for every user, of the form
-        (username, name, email) ordered alpha-numerically by username.
+        The information is cached and only retrieved again from the
+        database after a change of the known users (see
+        `update_known_user` and `invalidate_known_users_cache`).
 
         :param cnx: the database connection; if ommitted, a new
                     connection is retrieved
 
         :since 1.0: deprecation warning: the `cnx` parameter is no
                     longer used and will be removed in version 1.1.1
+
+        :since 1.1.2: the `as_dict` parameter is available.
+        """
+        if as_dict:
+            return self._known_users_dict
+        return iter(self._known_users)
+
+    def find_known_users(self, prefix):
+        """Generator that yields the (username, name, email) tuples
+        of the known users whose username starts with `prefix`, ordered
+        by username, e.g. for completing user names.
+
+        :since 1.1.2:
+        """
+        users = self._known_users
+        for user in users[bisect_left(users, (prefix,)):]:
+            if not user[0].startswith(prefix):
+                break
+            yield user
+
+    def update_known_user(self, username, name=None, email=None):
+        """Record the name and email of the known user `username`,
+        who may not have been known before.
+
+        The known users cached in this process are updated in place
+        rather than retrieved again, while the other processes
+        retrieve them from the database.
+
+        :since 1.1.2:
+        """
+        def update_list(users):
+            users = list(users)
+            idx = bisect_left(users, (username,))
+            if idx < len(users) and users[idx][0] == username:
+                users[idx] = (username, name, email)
+            else:
+                users.insert(idx, (username, name, email))
+            return users
+
+        def update_dict(users):
+            users = users.copy()
+            users[username] = (name, email)
+            return users
+
+        cache = CacheManager(self)
+        with self.db_transaction:
+            cache.invalidate(_known_users_id, update_list)
+            cache.invalidate(_known_users_dict_id, update_dict)
+
+    def invalidate_known_users_cache(self):
+        """Clear the known users cache, e.g. after removing users.
+
+        :since 1.1.2:
         """
-        for username, name, email in self.db_query("""
+        cache = CacheManager(self)
+        with self.db_transaction:
+            cache.invalidate(_known_users_id)
+            cache.invalidate(_known_users_dict_id)
+
+    @property
+    def _known_users(self):
+        return CacheManager(self).get(_known_users_id,
+                                      Environment._retrieve_known_users, self)
+
+    @property
+    def _known_users_dict(self):
+        return CacheManager(self).get(_known_users_dict_id,
+                                      Environment._retrieve_known_users_dict,
+                                      self)
+
+    def _retrieve_known_users(self):
+        # Sort in Python rather than in SQL, as the order must match
+        # the one used by `bisect` regardless of the database collation
+        return sorted(self.db_query("""
                 SELECT DISTINCT s.sid, n.value, e.value
                 FROM session AS s
                  LEFT JOIN session_attribute AS n ON (n.sid=s.sid
                   and n.authenticated=1 AND n.name = 'name')
                  LEFT JOIN session_attribute AS e ON (e.sid=s.sid
                   AND e.authenticated=1 AND e.name = 'email')
-                WHERE s.authenticated=1 ORDER BY s.sid
-                """):
-            yield username, name, email
+                WHERE s.authenticated=1
+                """))
+
+    def _retrieve_known_users_dict(self):
+        return dict((username, (name, email))
+                    for username, name, email in self._known_users)
 
     def backup(self, dest=None):
         """Create a backup of the database.
@@ -784,6 +871,8 @@ class EnvironmentSetup(Component):
         filename = os.path.join(self.env.path, 'conf', 'trac.ini.sample')
         if not os.path.isfile(filename):
             return
+        from trac.loader import load_deferred_components
+        load_deferred_components(self.env)
         config = Configuration(filename)
         for section, default_options in config.defaults().iteritems():
             for name, value in default_options.iteritems():
@@ -860,7 +949,13 @@ class EnvironmentAdmin(Component):
 
     def get_admin_commands(self):
         yield ('deploy', '<directory>',
-               'Extract static resources from Trac and all plugins',
+               """Extract static resources from Trac and all plugins
+
+               Fingerprinted copies of the resources are written as
+               well, along with compressed `.gz` variants of the
+               textual ones, for the web servers able to serve them
+               (e.g. nginx with `gzip_static on`).
+               """,
                None, self._do_deploy)
         yield ('hotcopy', '<backupdir> [--no-database]',
                """Make a hot backup copy of an environment
@@ -898,6 +993,8 @@ class EnvironmentAdmin(Component):
                 if os.path.exists(source):
                     dest = os.path.join(chrome_target, key)
                     copytree(source, dest, overwrite=True)
+        printout(_("Writing fingerprinted and compressed resources."))
+        Chrome(self.env).write_fingerprinted_files(chrome_target)
 
         # Create and copy scripts
         makedirs(script_target, overwrite=True)
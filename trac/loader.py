@@ -25,7 +25,7 @@ import sys
 from trac.util import get_doc, get_module_path, get_sources, get_pkginfo
 from trac.util.text import exception_to_unicode, to_unicode
 
-__all__ = ['load_components']
+__all__ = ['load_components', 'load_deferred_components']
 
 
 def _enable_plugin(env, module):
@@ -33,8 +33,43 @@ def _enable_plugin(env, module):
     if env.is_component_enabled(module) is None:
         env.enable_component(module)
 
+def _log_error(env, item, e):
+    ue = exception_to_unicode(e)
+    if isinstance(e, DistributionNotFound):
+        env.log.debug('Skipping "%s": ("%s" not found)', item, ue)
+    elif isinstance(e, VersionConflict):
+        env.log.error('Skipping "%s": (version conflict "%s")', item, ue)
+    elif isinstance(e, UnknownExtra):
+        env.log.error('Skipping "%s": (unknown extra "%s")', item, ue)
+    else:
+        env.log.error('Skipping "%s": %s', item,
+                      exception_to_unicode(e, traceback=True))
+
+def _may_be_enabled(env, entry):
+    """Return whether the module of the given entry point can contain
+    components that are enabled in `env`.
+
+    Modules of the Trac distribution are self-contained, so only rules on
+    the module itself or its components are considered. Other plugins may
+    spread their components over several modules of their top-level
+    package, so any enabling rule on that package makes them load.
+    """
+    rules = getattr(env, '_component_rules', None)
+    if rules is None or env.is_component_enabled(entry.module_name):
+        return True
+    if entry.dist.project_name.lower() == 'trac':
+        prefix = entry.module_name.lower()
+    else:
+        prefix = entry.module_name.split('.')[0].lower()
+    return any(enabled and (name == prefix or name.startswith(prefix + '.'))
+               for name, enabled in rules.iteritems())
+
 def load_eggs(entry_point_name):
-    """Loader that loads any eggs on the search path and `sys.path`."""
+    """Loader that loads any eggs on the search path and `sys.path`.
+
+    Entry points whose module can't contain any enabled component are
+    not imported; `load_deferred_components()` imports them on demand.
+    """
     def _load_eggs(env, search_path, auto_enable=None):
         # Note that the following doesn't seem to support unicode search_path
         distributions, errors = working_set.find_plugins(
@@ -45,34 +80,44 @@ def load_eggs(entry_point_name):
                 env.log.debug('Adding plugin %s from %s', dist, dist.location)
                 working_set.add(dist)
 
-        def _log_error(item, e):
-            ue = exception_to_unicode(e)
-            if isinstance(e, DistributionNotFound):
-                env.log.debug('Skipping "%s": ("%s" not found)', item, ue)
-            elif isinstance(e, VersionConflict):
-                env.log.error('Skipping "%s": (version conflict "%s")',
-                              item, ue)
-            elif isinstance(e, UnknownExtra):
-                env.log.error('Skipping "%s": (unknown extra "%s")', item, ue)
-            else:
-                env.log.error('Skipping "%s": %s', item,
-                              exception_to_unicode(e, traceback=True))
-
         for dist, e in errors.iteritems():
-            _log_error(dist, e)
+            _log_error(env, dist, e)
 
         for entry in sorted(working_set.iter_entry_points(entry_point_name),
                             key=lambda entry: entry.name):
+            auto = os.path.dirname(entry.dist.location) == auto_enable
+            if not auto and not _may_be_enabled(env, entry):
+                env.log.debug('Deferring %s from %s', entry.name,
+                              entry.dist.location)
+                continue
             env.log.debug('Loading %s from %s', entry.name, entry.dist.location)
             try:
                 entry.load(require=True)
             except Exception, e:
-                _log_error(entry, e)
+                _log_error(env, entry, e)
             else:
-                if os.path.dirname(entry.dist.location) == auto_enable:
+                if auto:
                     _enable_plugin(env, entry.module_name)
     return _load_eggs
 
+def load_deferred_components(env, entry_point_name='trac.plugins'):
+    """Load the plugin modules skipped by `load_components()` because
+    none of their components were enabled (''since 1.1.2'').
+
+    This is needed where all installed components must be known, e.g.
+    for listing plugins or the options declared by the components.
+    """
+    for entry in sorted(working_set.iter_entry_points(entry_point_name),
+                        key=lambda entry: entry.name):
+        if entry.module_name in sys.modules:
+            continue
+        env.log.debug('Loading deferred %s from %s', entry.name,
+                      entry.dist.location)
+        try:
+            entry.load(require=True)
+        except Exception, e:
+            _log_error(env, entry, e)
+
 def load_py_files():
     """Loader that look for Python source files in the plugins directories,
     which simply get imported, thereby registering them with the component
@@ -116,6 +161,7 @@ def load_components(env, extra_path=None, loaders=(load_eggs('trac.plugins'),
 
 def get_plugin_info(env, include_core=False):
     """Return package information about Trac core and installed plugins."""
+    load_deferred_components(env)
     path_sources = {}
 
     def find_distribution(module):
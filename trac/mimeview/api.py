@@ -59,6 +59,7 @@ that can be `read()`.
   corresponding ticket (#3332 as well).
 """
 
+from itertools import chain, islice
 import re
 from StringIO import StringIO
 
@@ -580,7 +581,10 @@ class IContentConverter(Interface):
     def convert_content(req, mimetype, content, key):
         """Convert the given content from mimetype to the output MIME type
         represented by key. Returns a tuple in the form (content,
-        output_mime_type) or None if conversion is not possible."""
+        output_mime_type) or None if conversion is not possible.
+
+        The converted content can also be an iterable of `str` chunks,
+        which is then sent incrementally (''since 1.1.2'')."""
 
 
 class Content(object):
@@ -1016,15 +1020,24 @@ class Mimeview(Component):
                                                          content, selector)
         if isinstance(content, unicode):
             content = content.encode('utf-8')
+        if isinstance(content, basestring):
+            chunks = [content]
+        else:
+            # Produce the first chunk before starting the response, so
+            # that errors raised meanwhile are still reported normally
+            content = iter(content)
+            chunks = chain(list(islice(content, 1)), content)
         req.send_response(200)
         req.send_header('Content-Type', output_type)
-        req.send_header('Content-Length', len(content))
+        if isinstance(content, basestring):
+            req.send_header('Content-Length', len(content))
         if filename:
             req.send_header('Content-Disposition',
                             content_disposition('attachment',
                                                 '%s.%s' % (filename, ext)))
         req.end_headers()
-        req.write(content)
+        for chunk in chunks:
+            req.write(chunk)
         raise RequestDone
 
 
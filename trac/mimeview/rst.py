@@ -22,14 +22,14 @@
 #
 # Inserts `reference` nodes for TracLinks into the document tree.
 
+from __future__ import with_statement
+
 __docformat__ = 'reStructuredText'
 
 from distutils.version import StrictVersion
 try:
-    from docutils import nodes
-    from docutils.core import publish_parts
-    from docutils.parsers import rst
-    from docutils.readers import standalone
+    # The docutils modules used for rendering are only imported by
+    # `_load_docutils`, as they are expensive to import
     from docutils import __version__
     has_docutils = True
 except ImportError:
@@ -40,12 +40,34 @@ from genshi.core import escape
 from trac.core import *
 from trac.env import ISystemInfoProvider
 from trac.mimeview.api import IHTMLPreviewRenderer, content_to_unicode
+from trac.util.concurrency import threading
 from trac.util.html import Element, Fragment, Markup, find_element
 from trac.util.translation import _
 from trac.wiki.api import WikiSystem
 from trac.wiki.formatter import WikiProcessor, Formatter, extract_link
 
-if has_docutils and StrictVersion(__version__) < StrictVersion('0.6'):
+nodes = publish_parts = rst = standalone = None
+_load_lock = threading.Lock()
+
+
+def _load_docutils():
+    """Import the docutils modules and register the Trac roles and
+    directives, on first use."""
+    global nodes, publish_parts, rst, standalone
+    with _load_lock:
+        if rst is not None:
+            return
+        from docutils import nodes
+        from docutils.core import publish_parts
+        from docutils.readers import standalone
+        from docutils.parsers import rst as rst_
+        if StrictVersion(__version__) < StrictVersion('0.6'):
+            _patch_raw_role()
+        _register_trac_extensions(rst_)
+        rst = rst_
+
+
+def _patch_raw_role():
     # Monkey-patch "raw" role handler in docutils to add a missing check
     # See docutils bug #2845002 on SourceForge
     def raw_role(role, rawtext, text, lineno, inliner, options={}, content=[]):
@@ -62,7 +84,8 @@ if has_docutils and StrictVersion(__version__) < StrictVersion('0.6'):
     roles.raw_role = raw_role
     roles.register_canonical_role('raw', raw_role)
 
-if has_docutils:
+
+def _register_trac_extensions(rst):
     # Register "trac" role handler and directive
 
     def trac_get_reference(env, context, rawtext, target, text):
@@ -245,6 +268,8 @@ class ReStructuredTextRenderer(Component):
         return 0
 
     def render(self, context, mimetype, content, filename=None, rev=None):
+        _load_docutils()
+
         # Minimize visual impact of errors
         from docutils.writers import html4css1
         class TracHTMLTranslator(html4css1.HTMLTranslator):
@@ -17,11 +17,12 @@ from StringIO import StringIO
 import sys
 
 from trac.core import *
-from trac.test import EnvironmentStub
+from trac.test import EnvironmentStub, Mock
 from trac.tests import compat
 from trac.mimeview import api
 from trac.mimeview.api import get_mimetype, IContentConverter, Mimeview, \
                               _group_lines
+from trac.web.api import RequestDone
 from genshi import Stream, Namespace
 from genshi.core import Attrs, TEXT, START, END
 from genshi.input import HTMLParser
@@ -76,7 +77,8 @@ class MimeviewTestCase(unittest.TestCase):
     def setUp(self):
         self.env = EnvironmentStub(default_data=False,
             enable=['%s.%s' % (self.__module__, c)
-                    for c in ['Converter0', 'Converter1', 'Converter2']])
+                    for c in ['Converter0', 'Converter1', 'Converter2',
+                              'Converter3']])
 
     def tearDown(self):
         pass
@@ -103,6 +105,42 @@ class MimeviewTestCase(unittest.TestCase):
         self.assertEqual(Converter1(self.env), conversions[1][-1])
         self.assertEqual(Converter2(self.env), conversions[2][-1])
 
+    def test_send_converted_iterable(self):
+        class Converter3(Component):
+            implements(IContentConverter)
+            def get_supported_conversions(self):
+                yield 'key3', 'Format 3', 'c3', 'text/x-sample', 'text/csv', 8
+            def convert_content(self, req, mimetype, content, key):
+                return iter(['a,b\r\n', '1,2\r\n']), 'text/csv'
+
+        headers = []
+        written = []
+        req = Mock(send_response=lambda status: None,
+                   send_header=lambda name, value: headers.append(name),
+                   end_headers=lambda: None, write=written.append)
+        self.assertRaises(RequestDone, Mimeview(self.env).send_converted,
+                          req, 'text/x-sample', 'content', 'key3')
+        self.assertEqual(['a,b\r\n', '1,2\r\n'], written)
+        self.assertNotIn('Content-Length', headers)
+
+    def test_send_converted_iterable_error(self):
+        class Converter4(Component):
+            implements(IContentConverter)
+            def get_supported_conversions(self):
+                yield 'key4', 'Format 4', 'c4', 'text/x-sample', 'text/csv', 8
+            def convert_content(self, req, mimetype, content, key):
+                def generate():
+                    raise TracError('Broken')
+                    yield ''
+                return generate(), 'text/csv'
+
+        started = []
+        req = Mock(send_response=started.append)
+        self.assertRaises(TracError, Mimeview(self.env).send_converted,
+                          req, 'text/x-sample', 'content', 'key4')
+        self.assertEqual([], started)
+
+
 class GroupLinesTestCase(unittest.TestCase):
 
     def test_empty_stream(self):
@@ -286,7 +286,8 @@ class NotifyEmail(Notify):
         # Get the name and email addresses of all known users
         self.name_map = {}
         self.email_map = {}
-        for username, name, email in self.env.get_known_users():
+        known_users = self.env.get_known_users(as_dict=True)
+        for username, (name, email) in known_users.iteritems():
             if name:
                 self.name_map[username] = name
             if email:
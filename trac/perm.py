@@ -19,6 +19,7 @@
 from __future__ import with_statement
 
 import csv
+from itertools import izip
 import os
 from time import time
 
@@ -158,6 +159,25 @@ class IPermissionPolicy(Interface):
         this will probably change in the future (e.g. `'VIEW' in ...`).
         """
 
+    def check_permissions(action, username, resources, perm):
+        """Check that the action can be performed by username on each of
+        the resources.
+
+        Implementing this method is optional. It lets a policy decide
+        for a whole list of resources at once, e.g. when its decision
+        only depends on the realm. For policies not implementing it,
+        `check_permission` is called for each resource.
+
+        :param resources: the list of resources on which the check
+                          applies
+        :param perm: the permission cache for that username
+
+        :return: a list with a decision for each resource, with the
+                 same meaning as the return value of `check_permission`
+
+        :since: 1.1.2
+        """
+
 
 class DefaultPermissionStore(Component):
     """Default implementation of permission storage and group management.
@@ -298,6 +318,10 @@ class DefaultPermissionPolicy(Component):
 
         return action in permissions or None
 
+    def check_permissions(self, action, username, resources, perm):
+        decision = self.check_permission(action, username, None, perm)
+        return [decision] * len(resources)
+
 
 
 class PermissionSystem(Component):
@@ -470,6 +494,51 @@ class PermissionSystem(Component):
                        username, action, resource)
         return False
 
+    def check_permissions(self, action, username, resources, perm):
+        """Return a list telling for each of the `resources` whether
+        permission to perform `action` is allowed.
+
+        Policies implementing `IPermissionPolicy.check_permissions` are
+        asked once for all the resources they haven't decided yet.
+
+        :since: 1.1.2
+        """
+        if username is None:
+            username = 'anonymous'
+        resources = [None if resource and resource.realm is None
+                     else resource for resource in resources]
+        decisions = [False] * len(resources)
+        pending = range(len(resources))
+        for policy in self.policies:
+            if not pending:
+                break
+            check_permissions = getattr(policy, 'check_permissions', None)
+            if check_permissions:
+                policy_decisions = check_permissions(
+                    action, username, [resources[i] for i in pending], perm)
+            else:
+                policy_decisions = [
+                    policy.check_permission(action, username, resources[i],
+                                            perm(resources[i])
+                                            if perm and resources[i]
+                                            else perm)
+                    for i in pending]
+            undecided = []
+            for i, decision in izip(pending, policy_decisions):
+                if decision is None:
+                    undecided.append(i)
+                else:
+                    if not decision:
+                        self.log.debug("%s denies %s performing %s on %r",
+                                       policy.__class__.__name__, username,
+                                       action, resources[i])
+                    decisions[i] = decision
+            pending = undecided
+        if pending:
+            self.log.debug("No policy allowed %s performing %s on %d "
+                           "resources", username, action, len(pending))
+        return decisions
+
     # IPermissionRequestor methods
 
     def get_permission_actions(self):
@@ -573,6 +642,36 @@ class PermissionCache(object):
 
     __contains__ = has_permission
 
+    def filter(self, action, resources):
+        """Return the list of `resources` on which `action` is allowed.
+
+        This is equivalent to keeping the resources for which
+        `action in perm(resource)`, but the permission policies are
+        asked for all the resources not already in the cache at once.
+
+        :since: 1.1.2
+        """
+        resources = list(resources)
+        decisions = [None] * len(resources)
+        missing = []
+        for i, resource in enumerate(resources):
+            cached = self._cache.get((self.username, hash(resource), action))
+            if cached and resource == cached[1]:
+                decisions[i] = cached[0]
+            else:
+                missing.append(i)
+        if missing:
+            decisions_for_missing = PermissionSystem(self.env) \
+                .check_permissions(action, self.username,
+                                   [resources[i] for i in missing], self)
+            for i, decision in izip(missing, decisions_for_missing):
+                resource = resources[i]
+                self._cache[(self.username, hash(resource), action)] = \
+                    (decision, resource)
+                decisions[i] = decision
+        return [resource for resource, decision in izip(resources, decisions)
+                if decision]
+
     def require(self, action, realm_or_resource=None, id=False, version=False):
         resource = self._normalize_resource(realm_or_resource, id, version)
         if not self._has_permission(action, resource):
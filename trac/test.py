@@ -117,6 +117,9 @@ class MockPerm(object):
         pass
     assert_permission = require
 
+    def filter(self, action, resources):
+        return list(resources)
+
 
 class TestSetup(unittest.TestSuite):
     """
@@ -397,8 +400,11 @@ class EnvironmentStub(Environment):
             return True
         return Environment.is_component_enabled(self, cls)
 
-    def get_known_users(self, cnx=None):
-        return self.known_users
+    def get_known_users(self, cnx=None, as_dict=False):
+        if as_dict:
+            return dict((username, (name, email))
+                        for username, name, email in self.known_users)
+        return iter(self.known_users)
 
 
 def locate(fn):
@@ -21,7 +21,7 @@ from trac.attachment import Attachment, AttachmentModule
 from trac.core import Component, implements, TracError
 from trac.perm import IPermissionPolicy, PermissionCache
 from trac.resource import Resource, resource_exists
-from trac.test import EnvironmentStub
+from trac.test import EnvironmentStub, Mock
 
 
 hashes = {
@@ -158,6 +158,13 @@ class AttachmentTestCase(unittest.TestCase):
                          attachment.path)
         self.assertTrue(os.path.exists(attachment.path))
 
+    def test_insert_moves_uploaded_file(self):
+        upload = Mock(read=lambda *args: '', moved=[])
+        upload.move_to = lambda path: upload.moved.append(path) or True
+        attachment = Attachment(self.env, 'ticket', 42)
+        attachment.insert('foo.txt', upload, 0)
+        self.assertEqual([attachment.path], upload.moved)
+
     def test_insert_outside_attachments_dir(self):
         attachment = Attachment(self.env, '../../../../../sth/private', 42)
         self.assertRaises(TracError, attachment.insert, 'foo.txt',
@@ -19,6 +19,7 @@ import unittest
 
 from trac.tests import compat
 from trac import db_default
+from trac.cache import CacheManager
 from trac.core import ComponentManager
 from trac.env import Environment
 
@@ -104,6 +105,70 @@ class EnvironmentTestCase(unittest.TestCase):
         self.assertEqual(('Tom', 'tom@example.com'), users['tom'])
         self.assertEqual((None, 'joe@example.com'), users['joe'])
         self.assertEqual(('Jane', None), users['jane'])
+        self.assertEqual(users, self.env.get_known_users(as_dict=True))
+        self.assertEqual(['jane', 'joe', 'tom'],
+                         [user[0] for user in self.env.get_known_users()])
+
+    def test_find_known_users(self):
+        """Testing env.find_known_users"""
+        with self.env.db_transaction as db:
+            db.executemany("INSERT INTO session VALUES (%s,%s,0)",
+                [('jo', 0), ('tom', 1), ('joe', 1), ('jane', 1),
+                 ('john', 1)])
+        self.assertEqual(['joe', 'john'],
+                         [user[0] for user in self.env.find_known_users('jo')])
+        self.assertEqual(['jane', 'joe', 'john'],
+                         [user[0] for user in self.env.find_known_users('j')])
+        self.assertEqual([], list(self.env.find_known_users('x')))
+
+    def test_update_known_user(self):
+        """Testing env.update_known_user"""
+        self.env.db_transaction("INSERT INTO session VALUES ('tom', 1, 0)")
+        users = list(self.env.get_known_users())
+        self.assertEqual([('tom', None, None)], users)
+        with self.env.db_transaction as db:
+            db("INSERT INTO session VALUES ('jane', 1, 0)")
+            self.env.update_known_user('jane', 'Jane', 'jane@example.com')
+        self.assertEqual([('jane', 'Jane', 'jane@example.com'),
+                          ('tom', None, None)],
+                         list(self.env.get_known_users()))
+        self.assertEqual({'jane': ('Jane', 'jane@example.com'),
+                          'tom': (None, None)},
+                         self.env.get_known_users(as_dict=True))
+        self.assertEqual([('tom', None, None)], users)
+
+    def test_update_known_user_rollback(self):
+        """Testing env.update_known_user in a transaction rolled back"""
+        self.env.db_transaction("INSERT INTO session VALUES ('tom', 1, 0)")
+        self.assertEqual([('tom', None, None)],
+                         list(self.env.get_known_users()))
+        try:
+            with self.env.db_transaction as db:
+                db("INSERT INTO session VALUES ('jane', 1, 0)")
+                self.env.update_known_user('jane', 'Jane', None)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual([('tom', None, None)],
+                         list(self.env.get_known_users()))
+
+        # Another process invalidates the cache, reaching the generation
+        # of the rolled back transaction
+        self.env.db_transaction("UPDATE cache SET generation=generation+1")
+        CacheManager(self.env).reset_metadata()
+        self.assertEqual([('tom', None, None)],
+                         list(self.env.get_known_users()))
+
+    def test_invalidate_known_users_cache(self):
+        """Testing env.invalidate_known_users_cache"""
+        self.env.db_transaction("INSERT INTO session VALUES ('tom', 1, 0)")
+        self.assertEqual(['tom'],
+                         [user[0] for user in self.env.get_known_users()])
+        self.env.db_transaction("DELETE FROM session WHERE sid='tom'")
+        self.assertEqual(['tom'],
+                         [user[0] for user in self.env.get_known_users()])
+        self.env.invalidate_known_users_cache()
+        self.assertEqual([], list(self.env.get_known_users()))
 
 
 def suite():
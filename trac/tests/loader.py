@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Edgewall Software
+# All rights reserved.
+#
+# This software is licensed as described in the file COPYING, which
+# you should have received as part of this distribution. The terms
+# are also available at http://trac.edgewall.org/wiki/TracLicense.
+#
+# This software consists of voluntary contributions made by many
+# individuals. For the exact contribution history, see the revision
+# history and logs, available at http://trac.edgewall.org/log/.
+
+import unittest
+
+from pkg_resources import Distribution, EntryPoint
+
+from trac.loader import _may_be_enabled
+from trac.test import EnvironmentStub
+
+
+class MayBeEnabledTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.env = EnvironmentStub()
+
+    def tearDown(self):
+        self.env.reset_db()
+
+    def _entry(self, module_name, project_name):
+        dist = Distribution(project_name=project_name)
+        return EntryPoint.parse('%s = %s' % (module_name, module_name),
+                                dist=dist)
+
+    def _set_rule(self, name, value):
+        self.env.config.set('components', name, value)
+        self.env.__dict__.pop('_component_rules', None)
+
+    def test_trac_modules(self):
+        self.assertTrue(_may_be_enabled(self.env,
+                                        self._entry('trac.about', 'Trac')))
+        self._set_rule('trac.about.*', 'disabled')
+        self.assertFalse(_may_be_enabled(self.env,
+                                         self._entry('trac.about', 'Trac')))
+
+    def test_tracopt_modules(self):
+        entry = self._entry('tracopt.perm.authz_policy', 'Trac')
+        self.assertFalse(_may_be_enabled(self.env, entry))
+        self._set_rule('tracopt.perm.authz_policy.authzpolicy', 'enabled')
+        self.assertTrue(_may_be_enabled(self.env, entry))
+        self.assertFalse(_may_be_enabled(self.env,
+                         self._entry('tracopt.perm.config_perm_provider',
+                                     'Trac')))
+
+    def test_plugin_modules(self):
+        entry = self._entry('foo.plugin', 'FooPlugin')
+        self.assertFalse(_may_be_enabled(self.env, entry))
+        # Components of the same top-level package may live in another
+        # module than the entry point
+        self._set_rule('foo.core.foocomponent', 'enabled')
+        self.assertTrue(_may_be_enabled(self.env, entry))
+        self._set_rule('foo.core.foocomponent', 'disabled')
+        self.assertFalse(_may_be_enabled(self.env, entry))
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(MayBeEnabledTestCase))
+    return suite
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -13,6 +13,7 @@
 
 from trac import perm
 from trac.core import *
+from trac.resource import Resource
 from trac.test import EnvironmentStub
 
 import unittest
@@ -210,6 +211,20 @@ class PermissionCacheTestCase(unittest.TestCase):
         # Using cached GRANT here (from shared cache)
         perm2.assert_permission('TEST_ADMIN')
 
+    def test_filter(self):
+        resources = [Resource('ticket', 1), Resource('ticket', 2)]
+        self.assertEqual(resources,
+                         self.perm.filter('TEST_MODIFY', iter(resources)))
+        self.assertEqual([], self.perm.filter('TRAC_ADMIN', resources))
+
+    def test_filter_cache(self):
+        resources = [Resource('ticket', 1), Resource('ticket', 2)]
+        self.perm.filter('TEST_ADMIN', resources)
+        self.perm_system.revoke_permission('testuser', 'TEST_ADMIN')
+        # Using cached GRANT here
+        self.perm('ticket', 1).assert_permission('TEST_ADMIN')
+        self.assertEqual(resources, self.perm.filter('TEST_ADMIN', resources))
+
 
 class TestPermissionPolicy(Component):
     implements(perm.IPermissionPolicy)
@@ -274,6 +289,22 @@ class PermissionPolicyTestCase(unittest.TestCase):
         self.assertEqual(self.policy.results,
                          {('testuser', 'TEST_MODIFY'): True,
                           ('testuser', 'TEST_ADMIN'): None})
+
+    def test_filter_policy_chaining(self):
+        self.env.config.set('trac', 'permission_policies',
+                            'TestPermissionPolicy,DefaultPermissionPolicy')
+        self.policy.grant('testuser', ['TEST_MODIFY'])
+        system = perm.PermissionSystem(self.env)
+        system.grant_permission('testuser', 'TEST_ADMIN')
+        resources = [Resource('ticket', 1), Resource('wiki', 'WikiStart')]
+
+        self.assertEqual(resources,
+                         self.perm.filter('TEST_MODIFY', resources))
+        self.assertEqual(resources,
+                         self.perm.filter('TEST_ADMIN', resources))
+        self.assertEqual([], self.perm.filter('TRAC_ADMIN', resources))
+
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(DefaultPermissionStoreTestCase, 'test'))
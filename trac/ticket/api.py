@@ -29,7 +29,7 @@ from trac.resource import IResourceManager
 from trac.util import Ranges, as_int
 from trac.util.text import shorten_line
 from trac.util.translation import _, N_, gettext
-from trac.wiki import IWikiSyntaxProvider, WikiParser
+from trac.wiki import IWikiSyntaxProvider, WikiParser, WikiSystem
 
 
 class TicketFieldList(list):
@@ -182,7 +182,8 @@ class IMilestoneChangeListener(Interface):
 
 
 class TicketSystem(Component):
-    implements(IPermissionRequestor, IWikiSyntaxProvider, IResourceManager)
+    implements(IMilestoneChangeListener, IPermissionRequestor,
+               ITicketChangeListener, IWikiSyntaxProvider, IResourceManager)
 
     change_listeners = ExtensionPoint(ITicketChangeListener)
     milestone_change_listeners = ExtensionPoint(IMilestoneChangeListener)
@@ -448,6 +449,28 @@ class TicketSystem(Component):
             field['options'] = possible_owners
             field['optional'] = 'owner' in self.optional_fields
 
+    # ITicketChangeListener methods
+
+    def ticket_created(self, ticket):
+        WikiSystem(self.env).invalidate_change_stamp()
+
+    def ticket_changed(self, ticket, comment, author, old_values):
+        WikiSystem(self.env).invalidate_change_stamp()
+
+    def ticket_deleted(self, ticket):
+        WikiSystem(self.env).invalidate_change_stamp()
+
+    # IMilestoneChangeListener methods
+
+    def milestone_created(self, milestone):
+        WikiSystem(self.env).invalidate_change_stamp()
+
+    def milestone_changed(self, milestone, old_values):
+        WikiSystem(self.env).invalidate_change_stamp()
+
+    def milestone_deleted(self, milestone):
+        WikiSystem(self.env).invalidate_change_stamp()
+
     # IPermissionRequestor methods
 
     def get_permission_actions(self):
@@ -468,14 +491,48 @@ class TicketSystem(Component):
                 ('ticket', self._format_link),
                 ('comment', self._format_comment_link)]
 
+    def get_link_prefetchers(self):
+        return [('bug', self._prefetch_links),
+                ('ticket', self._prefetch_links)]
+
+    _ticket_link_re = (
+        # matches #... but not &#... (HTML entity)
+        r"!?(?<!&)#"
+        # optional intertrac shorthand #T... + digits
+        r"(?P<it_ticket>%s)%s" % (WikiParser.INTERTRAC_SCHEME,
+                                  Ranges.RE_STR))
+
     def get_wiki_syntax(self):
-        yield (
-            # matches #... but not &#... (HTML entity)
-            r"!?(?<!&)#"
-            # optional intertrac shorthand #T... + digits
-            r"(?P<it_ticket>%s)%s" % (WikiParser.INTERTRAC_SCHEME,
-                                      Ranges.RE_STR),
-            lambda x, y, z: self._format_link(x, 'ticket', y[1:], y, z))
+        yield (self._ticket_link_re,
+               lambda x, y, z: self._format_link(x, 'ticket', y[1:], y, z))
+
+    def get_link_shorthands(self):
+        yield (self._ticket_link_re,
+               lambda y, z: None if z.group('it_ticket')
+                                 else ('ticket', y[1:]))
+
+    def _prefetch_links(self, formatter, ns, targets):
+        from trac.ticket.model import Ticket
+        prefetched = formatter.prefetched('ticket')
+        ids = set()
+        for target in targets:
+            try:
+                r = Ranges(formatter.split_link(target)[0])
+            except ValueError:
+                continue
+            if len(r) == 1 and Ticket.id_is_valid(r.a) and \
+                    r.a not in prefetched:
+                ids.add(r.a)
+        ids = sorted(ids)
+        for idx in xrange(0, len(ids), 100):
+            chunk = ids[idx:idx + 100]
+            for id in chunk:
+                prefetched[id] = None
+            for id, type, summary, status, resolution in self.env.db_query("""
+                    SELECT id, type, summary, status, resolution
+                    FROM ticket WHERE id IN (%s)
+                    """ % ','.join(['%s'] * len(chunk)), chunk):
+                prefetched[id] = (type, summary, status, resolution)
 
     def _format_link(self, formatter, ns, target, label, fullmatch=None):
         intertrac = formatter.shorthand_intertrac_helper(ns, target, label,
@@ -491,13 +548,17 @@ class TicketSystem(Component):
                 from trac.ticket.model import Ticket
                 if Ticket.id_is_valid(num) and \
                         'TICKET_VIEW' in formatter.perm(ticket):
-                    # TODO: attempt to retrieve ticket view directly,
-                    #       something like: t = Ticket.view(num)
-                    for type, summary, status, resolution in \
-                            self.env.db_query("""
+                    prefetched = formatter.prefetched('ticket')
+                    if num in prefetched:
+                        rows = [prefetched[num]] if prefetched[num] else []
+                    else:
+                        # TODO: attempt to retrieve ticket view directly,
+                        #       something like: t = Ticket.view(num)
+                        rows = self.env.db_query("""
                             SELECT type, summary, status, resolution
                             FROM ticket WHERE id=%s
-                            """, (str(num),)):
+                            """, (str(num),))
+                    for type, summary, status, resolution in rows:
                         title = self.format_summary(summary, status,
                                                     resolution, type)
                         href = formatter.href.ticket(num) + params + fragment
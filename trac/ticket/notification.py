@@ -81,6 +81,45 @@ def get_ticket_notification_recipients(env, config, tktid, prev_cc):
 
     :since 1.0.3: the `config` parameter is no longer used.
     """
+    fields = _get_recipient_fields(env, [tktid])
+    return _select_recipients(env, fields.get(int(tktid)), prev_cc)
+
+
+def _get_recipient_fields(env, tktids):
+    """Return the fields relevant for computing the recipients of the
+    notifications for the tickets `tktids`.
+
+    The result is a dictionary mapping ticket ids to a
+    `(cc, reporter, owner, authors, updater)` tuple, where `authors` is
+    the list of distinct change authors and `updater` the author of the
+    last change, or the reporter if the ticket has no change. The
+    tickets are queried in batches so that notifying a large batch of
+    tickets doesn't cost several queries per ticket.
+    """
+    fields = {}
+    tktids = [int(tktid) for tktid in tktids]
+    with env.db_query as db:
+        for i in xrange(0, len(tktids), 100):
+            ids = tktids[i:i + 100]
+            holders = ','.join(['%s'] * len(ids))
+            for id, cc, reporter, owner in db("""
+                    SELECT id, cc, reporter, owner FROM ticket
+                    WHERE id IN (%s)
+                    """ % holders, ids):
+                fields[id] = (cc, reporter, owner, [], reporter)
+            for id, author in db("""
+                    SELECT ticket, author FROM ticket_change
+                    WHERE ticket IN (%s) ORDER BY ticket, time
+                    """ % holders, ids):
+                if id in fields:
+                    cc, reporter, owner, authors, updater = fields[id]
+                    if author not in authors:
+                        authors.append(author)
+                    fields[id] = (cc, reporter, owner, authors, author)
+    return fields
+
+
+def _select_recipients(env, fields, prev_cc):
     section = env.config['notification']
     notify_reporter = section.getbool('always_notify_reporter')
     notify_owner = section.getbool('always_notify_owner')
@@ -88,51 +127,33 @@ def get_ticket_notification_recipients(env, config, tktid, prev_cc):
 
     ccrecipients = prev_cc
     torecipients = []
-    with env.db_query as db:
+    reporter = owner = updater = None
+    if fields:
+        cc, reporter, owner, authors, updater = fields
         # Harvest email addresses from the cc, reporter, and owner fields
-        for row in db("SELECT cc, reporter, owner FROM ticket WHERE id=%s",
-                      (tktid,)):
-            if row[0]:
-                ccrecipients += row[0].replace(',', ' ').split()
-            reporter = row[1]
-            owner = row[2]
-            if notify_reporter:
-                torecipients.append(row[1])
-            if notify_owner:
-                torecipients.append(row[2])
-            break
+        if cc:
+            ccrecipients += cc.replace(',', ' ').split()
+        if notify_reporter:
+            torecipients.append(reporter)
+        if notify_owner:
+            torecipients.append(owner)
 
         # Harvest email addresses from the author field of ticket_change(s)
         if notify_updater:
-            for author, ticket in db("""
-                    SELECT DISTINCT author, ticket FROM ticket_change
-                    WHERE ticket=%s
-                    """, (tktid,)):
-                torecipients.append(author)
-
-        # Suppress the updater from the recipients
-        updater = None
-        for updater, in db("""
-                SELECT author FROM ticket_change WHERE ticket=%s
-                ORDER BY time DESC LIMIT 1
-                """, (tktid,)):
-            break
-        else:
-            for updater, in db("SELECT reporter FROM ticket WHERE id=%s",
-                               (tktid,)):
-                break
-
-        if not notify_updater:
-            filter_out = True
-            if notify_reporter and (updater == reporter):
-                filter_out = False
-            if notify_owner and (updater == owner):
-                filter_out = False
-            if filter_out:
-                torecipients = [r for r in torecipients
-                                if r and r != updater]
-        elif updater:
-            torecipients.append(updater)
+            torecipients.extend(authors)
+
+    # Suppress the updater from the recipients
+    if not notify_updater:
+        filter_out = True
+        if notify_reporter and (updater == reporter):
+            filter_out = False
+        if notify_owner and (updater == owner):
+            filter_out = False
+        if filter_out:
+            torecipients = [r for r in torecipients
+                            if r and r != updater]
+    elif updater:
+        torecipients.append(updater)
 
     return (torecipients, ccrecipients, reporter, owner)
 
@@ -525,10 +546,10 @@ class BatchTicketNotifyEmail(NotifyEmail):
     def get_recipients(self, tktids):
         alltorecipients = []
         allccrecipients = []
+        fields = _get_recipient_fields(self.env, tktids)
         for t in tktids:
             (torecipients, ccrecipients, reporter, owner) = \
-                get_ticket_notification_recipients(self.env, self.config,
-                                                   t, [])
+                _select_recipients(self.env, fields.get(int(t)), [])
             alltorecipients.extend(torecipients)
             allccrecipients.extend(ccrecipients)
         return (list(set(alltorecipients)), list(set(allccrecipients)))
@@ -18,7 +18,7 @@
 from __future__ import with_statement
 
 import csv
-from itertools import groupby
+from itertools import groupby, islice, izip
 from math import ceil
 from datetime import datetime, timedelta
 import re
@@ -66,6 +66,8 @@ class Query(object):
     substitutions = ['$USER']
     clause_re = re.compile(r'(?P<clause>\d+)_(?P<field>.+)$')
 
+    _batch_size = 100   # number of tickets fetched at once by `iterate()`
+
     def __init__(self, env, report=None, constraints=None, cols=None,
                  order=None, desc=0, group=None, groupdesc=0, verbose=0,
                  rows=None, page=None, max=None, format=None):
@@ -295,56 +297,117 @@ class Query(object):
         """
         if req is not None:
             href = req.href
-        with self.env.db_query as db:
-            cursor = db.cursor()
-
-            self.num_items = 0
-            sql, args = self.get_sql(req, cached_ids, authname, tzinfo, locale)
-            self.num_items = self._count(sql, args)
-
-            if self.num_items <= self.max:
-                self.has_more_pages = False
+        sql, args = self._get_paged_sql(req, cached_ids, authname, tzinfo,
+                                        locale)
+        return self._fetch_rows(sql, args, href)
+
+    def iterate(self, req=None, cached_ids=None, authname=None, tzinfo=None,
+                href=None, locale=None):
+        """Retrieve the matching tickets as an iterator.
+
+        The tickets are counted right away, so that `num_items` and
+        `has_more_pages` are set when this method returns. The ids of
+        the matching tickets are retrieved when the iteration starts,
+        then the rows are fetched by batches of ids as the iterator is
+        consumed. The database connection isn't held between the
+        batches.
+
+        :since: 1.1.2
+        """
+        if req is not None:
+            href = req.href
+        sql, args = self._get_paged_sql(req, cached_ids, authname, tzinfo,
+                                        locale)
+        if self.has_more_pages or self.num_items <= self._batch_size:
+            # A page of results is read at once
+            return iter(self._fetch_rows(sql, args, href))
+        return self._iterate_rows(sql, args, href)
+
+    def _get_paged_sql(self, req, cached_ids, authname, tzinfo, locale):
+        self.num_items = 0
+        sql, args = self.get_sql(req, cached_ids, authname, tzinfo, locale)
+        self.num_items = self._count(sql, args)
 
-            if self.has_more_pages:
-                max = self.max
-                if self.group:
-                    max += 1
-                sql = sql + " LIMIT %d OFFSET %d" % (max, self.offset)
-                if (self.page > int(ceil(float(self.num_items) / self.max)) and
-                    self.num_items != 0):
-                    raise TracError(_("Page %(page)s is beyond the number of "
-                                      "pages in the query", page=self.page))
+        if self.num_items <= self.max:
+            self.has_more_pages = False
 
+        if self.has_more_pages:
+            max = self.max
+            if self.group:
+                max += 1
+            sql = sql + " LIMIT %d OFFSET %d" % (max, self.offset)
+            if (self.page > int(ceil(float(self.num_items) / self.max)) and
+                self.num_items != 0):
+                raise TracError(_("Page %(page)s is beyond the number of "
+                                  "pages in the query", page=self.page))
+        return sql, args
+
+    def _fetch_rows(self, sql, args, href):
+        with self.env.db_query as db:
+            cursor = db.cursor()
             # self.env.log.debug("SQL: " + sql % tuple([repr(a) for a in args]))
             cursor.execute(sql, args)
             columns = get_column_names(cursor)
-            fields = [self.fields.by_name(column, None) for column in columns]
-            results = []
-
-            column_indices = range(len(columns))
-            for row in cursor:
-                result = {}
-                for i in column_indices:
-                    name, field, val = columns[i], fields[i], row[i]
-                    if name == 'reporter':
-                        val = val or 'anonymous'
-                    elif name == 'id':
-                        val = int(val)
-                        if href is not None:
-                            result['href'] = href.ticket(val)
-                    elif name in self.time_fields:
-                        val = from_utimestamp(long(val)) if val else ''
-                    elif field and field['type'] == 'checkbox':
-                        try:
-                            val = bool(int(val))
-                        except (TypeError, ValueError):
-                            val = False
-                    elif val is None:
-                        val = ''
-                    result[name] = val
-                results.append(result)
-            cursor.close()
-            return results
+            to_result = self._get_row_converter(columns, href)
+            return [to_result(row) for row in cursor]
+
+    def _iterate_rows(self, sql, args, href):
+        # The query built by `get_sql` is made of a select list, a
+        # FROM clause with the joins, an optional WHERE clause and an
+        # ORDER BY clause, each starting on a new line. Only the ids are
+        # selected by the user's query, the rows are then retrieved by
+        # their primary key.
+        select, rest = sql.split('\nFROM ', 1)
+        from_ = rest.split('\nWHERE ', 1)[0].split('\nORDER BY ', 1)[0]
+        ids = [id for id, in self.env.db_query(
+                    "SELECT t.id\nFROM " + rest, args)]
+        columns = to_result = None
+        for i in xrange(0, len(ids), self._batch_size):
+            batch = ids[i:i + self._batch_size]
+            rows = {}
+            with self.env.db_query as db:
+                cursor = db.cursor()
+                cursor.execute("%s\nFROM %s\nWHERE t.id IN (%s)"
+                               % (select, from_,
+                                  ','.join(['%s'] * len(batch))), batch)
+                if columns is None:
+                    columns = get_column_names(cursor)
+                    id_index = columns.index('id')
+                    to_result = self._get_row_converter(columns, href)
+                for row in cursor:
+                    rows[row[id_index]] = row
+            # tickets deleted in the meantime are skipped
+            for id in batch:
+                if id in rows:
+                    yield to_result(rows[id])
+
+    def _get_row_converter(self, columns, href):
+        """Return a function converting a row of the query results to
+        a dictionary."""
+        fields = [self.fields.by_name(column, None) for column in columns]
+        column_indices = range(len(columns))
+        def to_result(row):
+            result = {}
+            for i in column_indices:
+                name, field, val = columns[i], fields[i], row[i]
+                if name == 'reporter':
+                    val = val or 'anonymous'
+                elif name == 'id':
+                    val = int(val)
+                    if href is not None:
+                        result['href'] = href.ticket(val)
+                elif name in self.time_fields:
+                    val = from_utimestamp(long(val)) if val else ''
+                elif field and field['type'] == 'checkbox':
+                    try:
+                        val = bool(int(val))
+                    except (TypeError, ValueError):
+                        val = False
+                elif val is None:
+                    val = ''
+                result[name] = val
+            return result
+        return to_result
 
     def get_href(self, href, id=None, order=None, desc=None, format=None,
                  max=None, page=None):
@@ -1082,6 +1145,10 @@ class QueryModule(Component):
                 add_warning(req, error)
 
         context = web_context(req, 'query')
+        # Fill the permission cache for the checks done on each row of
+        # the results
+        req.perm.filter('TICKET_VIEW', (Resource('ticket', t['id'])
+                                        for t in tickets))
         owner_field = query.fields.by_name('owner', None)
         if owner_field:
             TicketSystem(self.env).eventually_restrict_owner(owner_field)
@@ -1142,46 +1209,84 @@ class QueryModule(Component):
         return 'query.html', data, None
 
     def export_csv(self, req, query, sep=',', mimetype='text/plain'):
-        content = StringIO()
-        content.write('\xef\xbb\xbf')   # BOM
-        cols = query.get_columns()
-        writer = csv.writer(content, delimiter=sep, quoting=csv.QUOTE_MINIMAL)
-        writer.writerow([unicode(c).encode('utf-8') for c in cols])
+        """Export the results of the `query` as CSV.
 
+        The content is returned as an iterable of `str` chunks, each
+        covering a batch of tickets, so that the export is sent while
+        it is being produced.
+        """
+        cols = query.get_columns()
+        chrome = Chrome(self.env)
         context = web_context(req)
-        results = query.execute(req)
-        for result in results:
-            ticket = Resource('ticket', result['id'])
-            if 'TICKET_VIEW' in req.perm(ticket):
-                values = []
-                for col in cols:
-                    value = result[col]
-                    if col in ('cc', 'reporter'):
-                        value = Chrome(self.env).format_emails(
-                                    context.child(ticket), value)
-                    elif col in query.time_fields:
-                        format = query.fields.by_name(col).get('format')
-                        value = user_time(req, format_date_or_datetime,
-                                          format, value) if value else ''
-                    values.append(unicode(value).encode('utf-8'))
-                writer.writerow(values)
-        return (content.getvalue(), '%s;charset=utf-8' % mimetype)
+        formats = dict((col, query.fields.by_name(col).get('format'))
+                       for col in cols if col in query.time_fields)
+        results = iter(query.iterate(req))
+
+        def generate():
+            content = StringIO()
+            content.write('\xef\xbb\xbf')   # BOM
+            writer = csv.writer(content, delimiter=sep,
+                                quoting=csv.QUOTE_MINIMAL)
+            writer.writerow([unicode(c).encode('utf-8') for c in cols])
+            while True:
+                batch = list(islice(results, 100))
+                if not batch:
+                    break
+                for result, ticket in self._filter_viewable(req, batch):
+                    values = []
+                    for col in cols:
+                        value = result[col]
+                        if col in ('cc', 'reporter'):
+                            value = chrome.format_emails(
+                                        context.child(ticket), value)
+                        elif col in formats:
+                            value = user_time(req, format_date_or_datetime,
+                                              formats[col], value) \
+                                    if value else ''
+                        values.append(unicode(value).encode('utf-8'))
+                    writer.writerow(values)
+                yield content.getvalue()
+                content.seek(0)
+                content.truncate()
+            if content.tell():
+                yield content.getvalue()
+
+        return generate(), '%s;charset=utf-8' % mimetype
 
     def export_rss(self, req, query):
         context = web_context(req, 'query', absurls=True)
         query_href = query.get_href(context.href)
         if 'description' not in query.rows:
             query.rows.append('description')
-        results = query.execute(req)
+        results = (result for result, ticket
+                   in self._filter_viewable(req, query.iterate(req)))
         data = {
             'context': context,
             'results': results,
             'query_href': query_href
         }
         output = Chrome(self.env).render_template(req, 'query.rss', data,
-                                                  'application/rss+xml')
+                                                  'application/rss+xml',
+                                                  iterable=True)
         return output, 'application/rss+xml'
 
+    def _filter_viewable(self, req, results):
+        """Yield the `(result, resource)` pairs of the tickets in
+        `results` that the user is allowed to view.
+
+        The permissions are checked by batches of 100 tickets.
+        """
+        results = iter(results)
+        while True:
+            batch = list(islice(results, 100))
+            if not batch:
+                break
+            tickets = [Resource('ticket', result['id']) for result in batch]
+            allowed = set(req.perm.filter('TICKET_VIEW', tickets))
+            for result, ticket in izip(batch, tickets):
+                if ticket in allowed:
+                    yield result, ticket
+
     # IWikiSyntaxProvider methods
 
     def get_wiki_syntax(self):
@@ -1404,8 +1509,11 @@ class TicketQueryMacro(WikiMacroBase):
         # Formats above had their own permission checks, here we need to
         # do it explicitly:
 
-        tickets = [t for t in tickets
-                   if 'TICKET_VIEW' in req.perm('ticket', t['id'])]
+        allowed = set(resource.id for resource in
+                      req.perm.filter('TICKET_VIEW',
+                                      (Resource('ticket', t['id'])
+                                       for t in tickets)))
+        tickets = [t for t in tickets if t['id'] in allowed]
 
         if not tickets:
             return tag.span(_("No results"), class_='query_no_results')
@@ -524,6 +524,20 @@ class ReportModule(Component):
                 header_groups.append([])
             header_group.append(header)
 
+        if format == 'csv':
+            filename = 'report_%s.csv' % id if id else 'report.csv'
+            self._send_csv(req, cols,
+                           self._iter_authorized_rows(req, context, cols,
+                                                      results),
+                           mimetype='text/csv', filename=filename)
+        elif format == 'tab':
+            filename = 'report_%s.tsv' % id if id else 'report.tsv'
+            self._send_csv(req, cols,
+                           self._iter_authorized_rows(req, context, cols,
+                                                      results),
+                           '\t', mimetype='text/tab-separated-values',
+                           filename=filename)
+
         # Structure the rows and cells:
         #  - group rows according to __group__ value, if defined
         #  - group cells the same way headers are grouped
@@ -531,6 +545,14 @@ class ReportModule(Component):
         row_groups = []
         authorized_results = []
         prev_group_value = None
+        # Check the permissions on all the rows at once when they are
+        # tickets, i.e. when no realm column is given
+        id_idx = [idx for idx, col in enumerate(cols)
+                  if col in ('report', 'ticket', 'id', '_id')]
+        if id_idx and 'realm' not in [col.strip('_') for col in cols]:
+            req.perm.filter('TICKET_VIEW',
+                            (Resource('ticket', cell_value(result[id_idx[-1]]))
+                             for result in results))
         for row_idx, result in enumerate(results):
             col_idx = 0
             cell_groups = []
@@ -601,15 +623,6 @@ class ReportModule(Component):
             data['context'] = web_context(req, report_resource,
                                           absurls=True)
             return 'report.rss', data, 'application/rss+xml'
-        elif format == 'csv':
-            filename = 'report_%s.csv' % id if id else 'report.csv'
-            self._send_csv(req, cols, authorized_results, mimetype='text/csv',
-                           filename=filename)
-        elif format == 'tab':
-            filename = 'report_%s.tsv' % id if id else 'report.tsv'
-            self._send_csv(req, cols, authorized_results, '\t',
-                           mimetype='text/tab-separated-values',
-                           filename=filename)
         else:
             p = page if max is not None else None
             add_link(req, 'alternate',
@@ -830,6 +843,58 @@ class ReportModule(Component):
             del args[name]
         return sql_io.getvalue(), values, missing_args
 
+    def _iter_authorized_rows(self, req, context, cols, results):
+        """Generate the `results` rows the user is allowed to view, with
+        the e-mail addresses formatted as in the HTML view.
+
+        The permissions are checked by batches of 100 rows, and no
+        other data is built for the rows.
+        """
+        chrome = Chrome(self.env)
+        indexes = {}
+        for idx, col in enumerate(cols):
+            if col in ('report', 'ticket', 'id', '_id'):
+                indexes['id'] = idx
+            col = col.strip('_')
+            if col in ('realm', 'parent_realm', 'parent_id'):
+                indexes[col] = idx
+        email_indexes = [idx for idx, col in enumerate(cols)
+                         if col.strip('_') in ('reporter', 'cc', 'owner')]
+
+        def get_value(result, name, default):
+            idx = indexes.get(name)
+            return cell_value(result[idx]) if idx is not None else default
+
+        def get_resource(result):
+            id = get_value(result, 'id', None)
+            realm = get_value(result, 'realm', 'ticket')
+            parent_realm = get_value(result, 'parent_realm', '')
+            if parent_realm:
+                return Resource(realm, id, parent=Resource(
+                    parent_realm, get_value(result, 'parent_id', '')))
+            return Resource(realm, id)
+
+        for start in xrange(0, len(results), 100):
+            batch = [(result, get_resource(result))
+                     for result in results[start:start + 100]]
+            allowed = set()
+            for realm in set(resource.realm for result, resource in batch):
+                # FIXME: for now, we still need to hardcode the realm in
+                #        the action
+                allowed.update(req.perm.filter(realm.upper() + '_VIEW',
+                                               [resource for result, resource
+                                                in batch
+                                                if resource.realm == realm]))
+            for result, resource in batch:
+                if resource not in allowed:
+                    continue
+                if email_indexes:
+                    result = list(result)
+                    for idx in email_indexes:
+                        result[idx] = chrome.format_emails(
+                            context.child(resource), cell_value(result[idx]))
+                yield result
+
     def _send_csv(self, req, cols, rows, sep=',', mimetype='text/plain',
                   filename=None):
         def iso_time(t):
@@ -850,25 +915,39 @@ class ReportModule(Component):
         converters = [col_conversions.get(c.strip('_'), cell_value)
                       for c in cols]
 
+        def send_headers():
+            req.send_response(200)
+            req.send_header('Content-Type', mimetype + ';charset=utf-8')
+            if filename:
+                req.send_header('Content-Disposition',
+                                content_disposition('attachment', filename))
+            req.end_headers()
+
+        # Send the rows by batches, as the length of the whole content
+        # isn't known beforehand. The response only starts once the first
+        # batch is ready, so that errors raised meanwhile are still
+        # reported normally.
         out = StringIO()
         out.write('\xef\xbb\xbf')       # BOM
         writer = csv.writer(out, delimiter=sep)
         writer.writerow([unicode(c).encode('utf-8') for c in cols
                          if c not in self._html_cols])
-        for row in rows:
+        started = False
+        for idx, row in enumerate(rows):
             writer.writerow([converters[i](cell).encode('utf-8')
                              for i, cell in enumerate(row)
                              if cols[i] not in self._html_cols])
-        data = out.getvalue()
-
-        req.send_response(200)
-        req.send_header('Content-Type', mimetype + ';charset=utf-8')
-        req.send_header('Content-Length', len(data))
-        if filename:
-            req.send_header('Content-Disposition',
-                            content_disposition('attachment', filename))
-        req.end_headers()
-        req.write(data)
+            if idx % 100 == 99:
+                if not started:
+                    send_headers()
+                    started = True
+                req.write(out.getvalue())
+                out.seek(0)
+                out.truncate()
+        if not started:
+            send_headers()
+        if out.tell():
+            req.write(out.getvalue())
         raise RequestDone
 
     def _send_sql(self, req, id, title, description, sql):
@@ -898,20 +977,50 @@ class ReportModule(Component):
     def get_link_resolvers(self):
         yield ('report', self._format_link)
 
+    def get_link_prefetchers(self):
+        yield ('report', self._prefetch_links)
+
+    _report_link_re = r"!?\{(?P<it_report>%s\s*)[0-9]+\}" % \
+                      WikiParser.INTERTRAC_SCHEME
+
     def get_wiki_syntax(self):
-        yield (r"!?\{(?P<it_report>%s\s*)[0-9]+\}" %
-                   WikiParser.INTERTRAC_SCHEME,
+        yield (self._report_link_re,
                lambda x, y, z: self._format_link(x, 'report', y[1:-1], y, z))
 
+    def get_link_shorthands(self):
+        yield (self._report_link_re,
+               lambda y, z: None if z.group('it_report')
+                                 else ('report', y[1:-1]))
+
+    def _prefetch_links(self, formatter, ns, targets):
+        prefetched = formatter.prefetched('report')
+        ids = set(formatter.split_link(target)[0] for target in targets)
+        ids = sorted(id for id in ids
+                     if id not in prefetched and str(as_int(id, None)) == id)
+        for idx in xrange(0, len(ids), 100):
+            chunk = ids[idx:idx + 100]
+            for id in chunk:
+                prefetched[id] = False
+            for id, in self.env.db_query("""
+                    SELECT id FROM report WHERE id IN (%s)
+                    """ % ','.join(['%s'] * len(chunk)),
+                    [int(id) for id in chunk]):
+                prefetched[str(id)] = True
+
     def _format_link(self, formatter, ns, target, label, fullmatch=None):
         intertrac = formatter.shorthand_intertrac_helper(ns, target, label,
                                                          fullmatch)
         if intertrac:
             return intertrac
         id, args, fragment = formatter.split_link(target)
-        try:
-            self.get_report(id)
-        except ResourceNotFound:
+        exists = formatter.prefetched('report').get(id)
+        if exists is None:
+            try:
+                self.get_report(id)
+                exists = True
+            except ResourceNotFound:
+                exists = False
+        if not exists:
             return tag.a(label, class_='missing report',
                          title=_("report does not exist"))
         else:
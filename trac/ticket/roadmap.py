@@ -319,8 +319,11 @@ def get_tickets_for_milestone(env, db=None, milestone=None, field='component'):
 def apply_ticket_permissions(env, req, tickets):
     """Apply permissions to a set of milestone tickets as returned by
     `get_tickets_for_milestone()`."""
-    return [t for t in tickets
-            if 'TICKET_VIEW' in req.perm('ticket', t['id'])]
+    allowed = set(resource.id for resource in
+                  req.perm.filter('TICKET_VIEW',
+                                  (Resource('ticket', t['id'])
+                                   for t in tickets)))
+    return [t for t in tickets if t['id'] in allowed]
 
 def milestone_stats_data(env, req, stat, name, grouped_by='component',
                          group=None):
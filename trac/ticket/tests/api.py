@@ -11,10 +11,15 @@
 # individuals. For the exact contribution history, see the revision
 # history and logs, available at http://trac.edgewall.org/log/.
 
+from StringIO import StringIO
+
 from trac.perm import PermissionCache, PermissionSystem
 from trac.ticket.api import TicketSystem
 from trac.ticket.model import Ticket
-from trac.test import EnvironmentStub, Mock
+from trac.test import EnvironmentStub, Mock, MockPerm
+from trac.web.chrome import web_context
+from trac.web.href import Href
+from trac.wiki.formatter import Formatter
 
 import unittest
 
@@ -145,6 +150,37 @@ class TicketSystemTestCase(unittest.TestCase):
         self.assertEqual(['leave'], self._get_actions({'status': 'reopened'}))
         self.assertEqual(['leave'], self._get_actions({'status': 'closed'}))
 
+    def test_prefetch_ticket_links(self):
+        for summary in ('One', 'Two'):
+            ticket = Ticket(self.env)
+            ticket.populate({'summary': summary, 'status': 'new'})
+            ticket.insert()
+        req = Mock(href=Href('/trac.cgi'), perm=MockPerm(),
+                   authname='anonymous')
+        formatter = Formatter(self.env, web_context(req, 'wiki', 'WikiStart'))
+        out = StringIO()
+        formatter.format("#1, ticket:2, [ticket:3 three], #4-5, !#6\n"
+                         "{{{\n#7\n}}}\n"
+                         "{{{#!div\n{{{\n#8\n}}}\n}}}\n", out)
+
+        self.assertEqual({1: (None, 'One', 'new', None),
+                          2: (None, 'Two', 'new', None),
+                          3: None},
+                         formatter.prefetched('ticket'))
+        html = out.getvalue()
+        self.assertIn('href="/trac.cgi/ticket/1"', html)
+        self.assertIn('href="/trac.cgi/ticket/2"', html)
+        self.assertIn('class="missing ticket"', html)
+
+    def test_wiki_syntax_pairs(self):
+        """The link shorthands are given separately from the syntax."""
+        ts = TicketSystem(self.env)
+        rules = list(ts.get_wiki_syntax())
+        self.assertEqual([2] * len(rules), [len(rule) for rule in rules])
+        self.assertEqual([regexp for regexp, handler in rules],
+                         [regexp for regexp, link
+                          in ts.get_link_shorthands()])
+
 
 def suite():
     return unittest.makeSuite(TicketSystemTestCase, 'test')
@@ -28,7 +28,8 @@ from trac.tests import compat
 from trac.tests.notification import SMTPThreadedServer, parse_smtp_message, \
                                     smtp_address
 from trac.ticket.model import Ticket
-from trac.ticket.notification import TicketNotifyEmail
+from trac.ticket.notification import BatchTicketNotifyEmail, \
+                                    TicketNotifyEmail
 from trac.ticket.web_ui import TicketModule
 from trac.util.datefmt import utc
 
@@ -1105,6 +1106,31 @@ Security sensitive:  0                           |          Blocking:
             lines.append(line)
         self.assertEqual(expected, '\n'.join(lines))
 
+    def test_batch_recipients(self):
+        """Recipients of a batch notification are harvested from all
+        the tickets"""
+        self.env.config.set('notification', 'always_notify_owner', 'true')
+        self.env.config.set('notification', 'always_notify_reporter', 'false')
+        self.env.config.set('notification', 'always_notify_updater', 'true')
+        ids = []
+        for i in xrange(3):
+            ticket = Ticket(self.env)
+            ticket['summary'] = 'Ticket %d' % i
+            ticket['owner'] = 'owner%d@example.org' % i
+            ticket['cc'] = 'cc%d@example.org' % i
+            ticket.insert()
+            ticket['component'] = 'New value'
+            ticket.save_changes('updater%d@example.org' % i, 'comment')
+            ids.append(ticket.id)
+        tn = BatchTicketNotifyEmail(self.env)
+        torcpts, ccrcpts = tn.get_recipients(ids)
+        self.assertEqual(['owner0@example.org', 'owner1@example.org',
+                          'owner2@example.org', 'updater0@example.org',
+                          'updater1@example.org', 'updater2@example.org'],
+                         sorted(torcpts))
+        self.assertEqual(['cc0@example.org', 'cc1@example.org',
+                          'cc2@example.org'], sorted(ccrcpts))
+
     def test_notification_does_not_alter_ticket_instance(self):
         ticket = Ticket(self.env)
         ticket['summary'] = 'My Summary'
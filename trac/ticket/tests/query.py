@@ -570,16 +570,61 @@ ORDER BY COALESCE(t.id,0)=0,t.id""")
         self.assertEqual(['anonymous'], args)
         tickets = query.execute(self.req)
 
+    def test_iterate(self):
+        for i in xrange(250):
+            ticket = Ticket(self.env)
+            ticket['reporter'] = 'joe'
+            ticket['summary'] = 'Ticket %d' % i
+            ticket.insert()
+
+        query = Query.from_string(self.env, 'reporter=joe&order=id&max=0')
+        tickets = query.iterate(self.req)
+        self.assertEqual(250, query.num_items)
+        self.assertEqual('Ticket 0', tickets.next()['summary'])
+        # the connection is released between the batches
+        Ticket(self.env, 150).delete()
+        self.assertEqual(range(2, 150) + range(151, 251),
+                         [t['id'] for t in tickets])
+        self.assertEqual(query.execute(self.req),
+                         list(query.iterate(self.req)))
+
+    def test_iterate_custom_field_and_order(self):
+        self.env.config.set('ticket-custom', 'foo', 'text')
+        priorities = ['major', 'minor', 'critical']
+        for i in xrange(250):
+            ticket = Ticket(self.env)
+            ticket['reporter'] = 'joe'
+            ticket['summary'] = 'Ticket %d' % i
+            ticket['priority'] = priorities[i % 3]
+            ticket['foo'] = 'Foo %d' % (i % 7)
+            ticket.insert()
+
+        query = Query.from_string(self.env, 'reporter=joe&foo=~Foo&'
+                                            'col=foo&order=priority&max=0')
+        results = list(query.iterate(self.req))
+        self.assertEqual(250, len(results))
+        self.assertEqual(query.execute(self.req), results)
+
+    def test_filter_viewable(self):
+        class Perm(object):
+            def filter(self, action, resources):
+                return [r for r in resources if r.id % 3]
+        req = Mock(perm=Perm())
+        results = [{'id': id} for id in xrange(1, 251)]
+        viewable = QueryModule(self.env)._filter_viewable(req, results)
+        self.assertEqual([id for id in xrange(1, 251) if id % 3],
+                         [result['id'] for result, ticket in viewable])
+
     def test_csv_escape(self):
         query = Mock(get_columns=lambda: ['col1'],
-                     execute=lambda r: [{'id': 1,
+                     iterate=lambda r: [{'id': 1,
                                          'col1': 'value, needs escaped'}],
                      time_fields=['time', 'changetime'])
         content, mimetype = QueryModule(self.env).export_csv(
                                 Mock(href=self.env.href, perm=MockPerm()),
                                 query)
         self.assertEqual('\xef\xbb\xbfcol1\r\n"value, needs escaped"\r\n',
-                         content)
+                         ''.join(content))
 
     def test_template_data(self):
         req = Mock(href=self.env.href, perm=MockPerm(), authname='anonymous',
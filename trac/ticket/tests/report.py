@@ -13,10 +13,14 @@
 
 import doctest
 
+from trac.core import TracError
 from trac.db.mysql_backend import MySQLConnection
 from trac.ticket.report import ReportModule
-from trac.test import EnvironmentStub, Mock
+from trac.test import EnvironmentStub, Mock, MockPerm
 from trac.web.api import Request, RequestDone
+from trac.web.chrome import web_context
+from trac.web.href import Href
+from trac.wiki.formatter import Formatter
 import trac
 
 import unittest
@@ -73,6 +77,23 @@ class ReportTestCase(unittest.TestCase):
         self.assertEqual(['value', '', ''], values)
         self.assertEqual(['PARAM', 'MISSING'], missing_args)
 
+    def test_prefetch_report_links(self):
+        self.env.db_transaction("""
+            INSERT INTO report (id, author, title, query, description)
+            VALUES (1, 'joe', 'Report', 'SELECT 1', '')""")
+        req = Mock(href=Href('/trac.cgi'), perm=MockPerm(),
+                   authname='anonymous')
+        formatter = Formatter(self.env, web_context(req, 'wiki', 'WikiStart'))
+        out = StringIO()
+        formatter.format("{1}, report:2, [report:1 one], !{3}\n"
+                         "{{{\n{4}\n}}}\n", out)
+
+        self.assertEqual({'1': True, '2': False},
+                         formatter.prefetched('report'))
+        html = out.getvalue()
+        self.assertIn('href="/trac.cgi/report/1"', html)
+        self.assertIn('class="missing report"', html)
+
     def test_csv_escape(self):
         buf = StringIO()
         def start_response(status, headers):
@@ -88,6 +109,27 @@ class ReportTestCase(unittest.TestCase):
         self.assertEqual('\xef\xbb\xbfTEST_COL,TEST_ZERO\r\n"value, needs escaped",0\r\n',
                          buf.getvalue())
 
+    def test_csv_error_before_response(self):
+        def rows():
+            raise TracError('Broken')
+            yield ()
+        started = []
+        req = Mock(send_response=started.append)
+        self.assertRaises(TracError, self.report_module._send_csv, req,
+                          ['TEST_COL'], rows())
+        self.assertEqual([], started)
+
+    def test_csv_authorized_rows(self):
+        checked = []
+        def filter(action, resources):
+            checked.append((action, [r.id for r in resources]))
+            return [r for r in resources if r.id != '2']
+        req = Mock(perm=Mock(filter=filter))
+        rows = self.report_module._iter_authorized_rows(
+            req, None, ['ticket', 'summary'], [(1, 'a'), (2, 'b'), (3, 'c')])
+        self.assertEqual([(1, 'a'), (3, 'c')], list(rows))
+        self.assertEqual([('TICKET_VIEW', ['1', '2', '3'])], checked)
+
     def test_saved_custom_query_redirect(self):
         query = u'query:?type=résumé'
         db = self.env.get_db_cnx()
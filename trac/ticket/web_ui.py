@@ -25,7 +25,7 @@ from StringIO import StringIO
 from genshi.core import Markup
 from genshi.builder import tag
 
-from trac.attachment import AttachmentModule
+from trac.attachment import Attachment, AttachmentModule
 from trac.config import BoolOption, Option, IntOption
 from trac.core import *
 from trac.mimeview.api import Mimeview, IContentConverter
@@ -41,7 +41,8 @@ from trac.timeline.api import ITimelineEventProvider
 from trac.util import as_bool, as_int, get_reporter_id
 from trac.util.datefmt import (
     format_date_or_datetime, from_utimestamp, get_date_format_hint,
-    get_datetime_format_hint, parse_date, to_utimestamp, user_time, utc
+    get_datetime_format_hint, parse_date, pretty_timedelta, to_utimestamp,
+    user_time, utc
 )
 from trac.util.html import to_fragment
 from trac.util.text import (
@@ -59,6 +60,7 @@ from trac.web.chrome import (
     add_ctxtnav, add_link, add_notice, add_script, add_script_data,
     add_stylesheet, add_warning, auth_link, prevnext_nav, web_context
 )
+from trac.wiki.api import WikiSystem
 from trac.wiki.formatter import format_to, format_to_html, format_to_oneliner
 import time
 
@@ -213,22 +215,26 @@ class TicketModule(Component):
             sql2, args2 = search_to_sql(db, ['newvalue'], terms)
             sql3, args3 = search_to_sql(db, ['value'], terms)
             ticketsystem = TicketSystem(self.env)
+            rows = db("""SELECT summary, description, reporter, type, id,
+                               time, status, resolution
+                        FROM ticket
+                        WHERE id IN (
+                            SELECT id FROM ticket WHERE %s
+                          UNION
+                            SELECT ticket FROM ticket_change
+                            WHERE field='comment' AND %s
+                          UNION
+                            SELECT ticket FROM ticket_custom WHERE %s
+                        )
+                        """ % (sql, sql2, sql3),
+                        args + args2 + args3)
+            allowed = set(req.perm.filter('TICKET_VIEW',
+                                          (ticket_realm(id=row[4])
+                                           for row in rows)))
             for summary, desc, author, type, tid, ts, status, resolution in \
-                    db("""SELECT summary, description, reporter, type, id,
-                                 time, status, resolution
-                          FROM ticket
-                          WHERE id IN (
-                              SELECT id FROM ticket WHERE %s
-                            UNION
-                              SELECT ticket FROM ticket_change
-                              WHERE field='comment' AND %s
-                            UNION
-                              SELECT ticket FROM ticket_custom WHERE %s
-                          )
-                          """ % (sql, sql2, sql3),
-                          args + args2 + args3):
+                    rows:
                 t = ticket_realm(id=tid)
-                if 'TICKET_VIEW' in req.perm(t):
+                if t in allowed:
                     yield (req.href.ticket(tid),
                            tag_("%(title)s: %(message)s",
                                 title=tag.span(
@@ -271,9 +277,9 @@ class TicketModule(Component):
         def produce_event((id, ts, author, type, summary, description,
                            component),
                           status, fields, comment, cid):
-            ticket = ticket_realm(id=id)
-            if 'TICKET_VIEW' not in req.perm(ticket):
+            if id not in viewable:
                 return None
+            ticket = ticket_realm(id=id)
             resolution = fields.get('resolution')
             info = ''
             if status == 'edit':
@@ -300,17 +306,10 @@ class TicketModule(Component):
                     (ticket, verb, info, summary, status, resolution, type,
                      description, component, comment, cid))
 
-        def produce_ticket_change_events(db):
+        def produce_ticket_change_events(changes):
             data = None
             for (id, t, author, type, summary,
-                 component, field, oldvalue, newvalue) in db("""
-                    SELECT t.id, tc.time, tc.author, t.type, t.summary,
-                           t.component, tc.field, tc.oldvalue, tc.newvalue
-                    FROM ticket_change tc
-                        INNER JOIN ticket t ON t.id = tc.ticket
-                            AND tc.time>=%s AND tc.time<=%s
-                    ORDER BY tc.time, tc.ticket
-                    """ % (ts_start, ts_stop)):
+                 component, field, oldvalue, newvalue) in changes:
                 if not (oldvalue or newvalue):
                     # ignore empty change corresponding to custom field
                     # created (None -> '') or deleted ('' -> None)
@@ -342,10 +341,31 @@ class TicketModule(Component):
         # Ticket changes
         with self.env.db_query as db:
             if 'ticket' in filters or 'ticket_details' in filters:
+                changes = db("""
+                    SELECT t.id, tc.time, tc.author, t.type, t.summary,
+                           t.component, tc.field, tc.oldvalue, tc.newvalue
+                    FROM ticket_change tc
+                        INNER JOIN ticket t ON t.id = tc.ticket
+                            AND tc.time>=%s AND tc.time<=%s
+                    ORDER BY tc.time, tc.ticket
+                    """ % (ts_start, ts_stop))
+                new_tickets = []
+                if 'ticket' in filters:
+                    new_tickets = db("""
+                        SELECT id, time, reporter, type, summary,
+                               description, component
+                        FROM ticket WHERE time>=%s AND time<=%s
+                        """, (ts_start, ts_stop))
+                # Check the permissions on all the tickets at once
+                ids = set(row[0] for row in changes)
+                ids.update(row[0] for row in new_tickets)
+                viewable = set(ticket.id for ticket in req.perm.filter(
+                    'TICKET_VIEW', [ticket_realm(id=id) for id in ids]))
+
                 prev_t = None
                 prev_ev = None
                 batch_ev = None
-                for (ev, t) in produce_ticket_change_events(db):
+                for (ev, t) in produce_ticket_change_events(changes):
                     if batch_ev:
                         if prev_t == t:
                             ticket = ev[3][0]
@@ -372,14 +392,10 @@ class TicketModule(Component):
                     yield prev_ev
 
                 # New tickets
-                if 'ticket' in filters:
-                    for row in db("""SELECT id, time, reporter, type, summary,
-                                            description, component
-                                     FROM ticket WHERE time>=%s AND time<=%s
-                                     """, (ts_start, ts_stop)):
-                        ev = produce_event(row, 'new', {}, None, None)
-                        if ev:
-                            yield ev
+                for row in new_tickets:
+                    ev = produce_event(row, 'new', {}, None, None)
+                    if ev:
+                        yield ev
 
             # Attachments
             if 'ticket_details' in filters:
@@ -548,6 +564,17 @@ class TicketModule(Component):
         action = req.args.get('action', ('history' in req.args and 'history' or
                                          'view'))
 
+        if req.method == 'GET' and action == 'view' and \
+                'preview_comment' not in req.args:
+            req.check_modified(ticket['changetime'], [
+                ticket.id, version, req.query_string, xhr,
+                [(attachment.filename, attachment.date, attachment.description)
+                 for attachment in Attachment.select(self.env, 'ticket',
+                                                     ticket.id)],
+                TicketSystem(self.env).fields,
+                WikiSystem(self.env).get_change_stamp(),
+                pretty_timedelta(ticket['changetime'])])
+
         data = self._prepare_data(req, ticket)
 
         if action in ('history', 'diff'):
@@ -57,6 +57,12 @@ class ITimelineEventProvider(Interface):
         be tuples of the form `(kind, href, title, date, author, markup)`.
         This is still supported but less flexible, as `href`, `title` and
         `markup` are not context dependent.
+
+        Since 1.1.2, `req.timeline_max_events` is the number of events
+        the timeline displays at most, or 0 if there's no limit. Only the
+        most recent events are displayed, so a provider can stop after
+        that many events. The attribute may be missing when the method
+        is called from elsewhere.
         """
 
     def render_timeline_event(context, field, event):
@@ -186,7 +186,9 @@ class TimelineModule(Component):
             else:
                 include.add(name)
 
-        # gather all events for the given period of time
+        # gather all events for the given period of time; the providers
+        # can't know which events the author filter removes
+        req.timeline_max_events = 0 if include or exclude else maxrows
         events = []
         for provider in self.event_providers:
             try:
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Edgewall Software
+# All rights reserved.
+#
+# This software is licensed as described in the file COPYING, which
+# you should have received as part of this distribution. The terms
+# are also available at http://trac.edgewall.com/license.html.
+#
+# This software consists of voluntary contributions made by many
+# individuals. For the exact contribution history, see the revision
+# history and logs, available at http://trac.edgewall.org/.
+
+from trac.db import Table, Column, Index, DatabaseManager
+
+def do_upgrade(env, ver, cursor):
+    """Add an index on the path of the node_change table, for retrieving
+    the history of a path from the repository cache."""
+    table = Table('node_change', key=('repos', 'rev', 'path', 'change_type'))[
+        Column('repos', type='int'),
+        Column('rev', key_size=20),
+        Column('path', key_size=255),
+        Column('node_type', size=1),
+        Column('change_type', size=1, key_size=2),
+        Column('base_path'),
+        Column('base_rev'),
+        Index(['repos', 'path', 'rev'])]
+
+    db_connector, _ = DatabaseManager(env).get_connector()
+    for stmt in db_connector.to_sql(table):
+        # Only create the index, the table already exists
+        if not stmt.startswith('CREATE TABLE'):
+            cursor.execute(stmt)
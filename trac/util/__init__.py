@@ -35,6 +35,7 @@ import time
 from urllib import quote, unquote, urlencode
 
 from .compat import any, md5, sha1, sorted
+from .concurrency import threading
 from .datefmt import to_datetime, to_timestamp, utc
 from .text import exception_to_unicode, to_unicode, getpreferredencoding
 
@@ -1079,6 +1080,81 @@ def to_ranges(revs):
     return ','.join(ranges)
 
 
+class LRUCache(object):
+    """A thread-safe mapping keeping at most `capacity` items, discarding
+    the least recently used ones first.
+
+    :since: 1.1.2
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._items = {}
+        # circular doubly-linked list of [prev, next, key, value] links,
+        # from the least to the most recently used
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            link = self._items.get(key)
+            if link is None:
+                return default
+            self._unlink(link)
+            self._append(link)
+            return link[3]
+
+    def __getitem__(self, key):
+        marker = []
+        value = self.get(key, marker)
+        if value is marker:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            link = self._items.get(key)
+            if link is not None:
+                self._unlink(link)
+                link[3] = value
+            else:
+                if len(self._items) >= self.capacity:
+                    oldest = self._root[1]
+                    self._unlink(oldest)
+                    del self._items[oldest[2]]
+                link = [None, None, key, value]
+                self._items[key] = link
+            self._append(link)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._unlink(self._items.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _append(self, link):
+        root = self._root
+        last = root[0]
+        link[0], link[1] = last, root
+        last[1] = root[0] = link
+
+    def _unlink(self, link):
+        prev, next = link[0], link[1]
+        prev[1], next[0] = next, prev
+
+
 class lazy(object):
     """A lazily-evaluated attribute"""
 
@@ -18,6 +18,8 @@ import errno
 import os
 import signal
 import sys
+import time
+import traceback
 
 def daemonize(pidfile=None, progname=None, stdin='/dev/null',
               stdout='/dev/null', stderr='/dev/null', umask=022):
@@ -94,3 +96,104 @@ def daemonize(pidfile=None, progname=None, stdin='/dev/null',
 def handle_signal(signum, frame):
     """Handle signals sent to the daemonized process."""
     sys.exit()
+
+
+def prefork(func, processes, restart_delay=1):
+    """Run `func` in `processes` forked child processes, until the
+    calling process receives SIGTERM or SIGINT, which are forwarded as
+    SIGTERM to the children.
+
+    The children exiting unexpectedly are replaced after
+    `restart_delay` seconds. On SIGHUP, the children are replaced one
+    at a time, each new process being started before the old one is
+    terminated. The new children are forked from the calling process,
+    so they run the code it has already imported: SIGHUP doesn't
+    reload the code.
+
+    In the children, SIGTERM and SIGINT raise `SystemExit`.
+
+    :since: 1.1.2
+    """
+    children = set()
+    retiring = set()
+    to_restart = []
+    stopping = []
+
+    def spawn():
+        for stream in sys.stdout, sys.stderr:
+            stream.flush()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(_run_child(func))
+        children.add(pid)
+
+    def restart(signum, frame):
+        to_restart.extend(children - retiring)
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGHUP, restart)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for idx in xrange(processes):
+        spawn()
+    while children and not stopping:
+        if to_restart and not retiring:
+            pid = to_restart.pop(0)
+            if pid in children:
+                spawn()
+                retiring.add(pid)
+                _kill(pid)
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        children.discard(pid)
+        if pid in retiring:
+            retiring.discard(pid)
+        elif not stopping:
+            print >> sys.stderr, 'Process %d exited unexpectedly ' \
+                                 '(status %d), restarting' % (pid, status)
+            time.sleep(restart_delay)
+            spawn()
+
+    for pid in children:
+        _kill(pid)
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                continue
+            if e.errno == errno.ECHILD:
+                break
+            raise
+        children.discard(pid)
+
+
+def _run_child(func):
+    for signum in [signal.SIGTERM, signal.SIGINT]:
+        signal.signal(signum, handle_signal)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    try:
+        func()
+    except SystemExit, e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    except:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def _kill(pid):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError, e:
+        if e.errno != errno.ESRCH:
+            raise
@@ -21,8 +21,8 @@ import tempfile
 import unittest
 
 from trac import util
-from trac.util.tests import concurrency, datefmt, presentation, text, \
-                            translation, html
+from trac.util.tests import concurrency, daemon, datefmt, presentation, \
+                            text, translation, html
 
 
 class AtomicFileTestCase(unittest.TestCase):
@@ -169,6 +169,34 @@ class SafeReprTestCase(unittest.TestCase):
                          "type(s) for +: 'int' and 'str')>", sr)
 
 
+class LRUCacheTestCase(unittest.TestCase):
+    def test_discard_least_recently_used(self):
+        cache = util.LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(1, cache['a'])
+        cache['c'] = 3
+        self.assertEqual(2, len(cache))
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertEqual(None, cache.get('b'))
+        self.assertRaises(KeyError, cache.__getitem__, 'b')
+
+    def test_update_and_delete(self):
+        cache = util.LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache['a'] = 3
+        cache['c'] = 4
+        self.assertEqual(3, cache['a'])
+        self.assertFalse('b' in cache)
+        del cache['a']
+        self.assertEqual(1, len(cache))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(None, cache.get('c'))
+
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -177,7 +205,9 @@ def suite():
     suite.addTest(unittest.makeSuite(RandomTestCase, 'test'))
     suite.addTest(unittest.makeSuite(ContentDispositionTestCase, 'test'))
     suite.addTest(unittest.makeSuite(SafeReprTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(LRUCacheTestCase, 'test'))
     suite.addTest(concurrency.suite())
+    suite.addTest(daemon.suite())
     suite.addTest(datefmt.suite())
     suite.addTest(presentation.suite())
     suite.addTest(doctest.DocTestSuite(util))
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2013 Edgewall Software
+# All rights reserved.
+#
+# This software is licensed as described in the file COPYING, which
+# you should have received as part of this distribution. The terms
+# are also available at http://trac.edgewall.org/wiki/TracLicense.
+#
+# This software consists of voluntary contributions made by many
+# individuals. For the exact contribution history, see the revision
+# history and logs, available at http://trac.edgewall.org/log/.
+
+import errno
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from trac.util import daemon
+
+
+class PreforkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='trac-prefork-')
+        self.master = None
+
+    def tearDown(self):
+        if self.master is not None:
+            self._kill(self.master, signal.SIGKILL)
+            self._reap(self.master, 5)
+        shutil.rmtree(self.dir)
+
+    def _child(self):
+        """Function run in the children: the first one crashes, the
+        others wait to be terminated."""
+        path = os.path.join(self.dir, str(os.getpid()))
+        open(path, 'w').close()
+        try:
+            os.mkdir(os.path.join(self.dir, 'crashed'))
+        except OSError:
+            while True:
+                time.sleep(0.05)
+        raise ValueError('crash')
+
+    def _start_master(self, processes):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, 2)
+                daemon.prefork(self._child, processes, restart_delay=0.1)
+            finally:
+                os._exit(0)
+        self.master = pid
+
+    def _get_children(self, count, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            pids = [int(name) for name in os.listdir(self.dir)
+                    if name.isdigit()]
+            if len(pids) >= count:
+                return pids
+            time.sleep(0.05)
+        self.fail('%d children started, %d expected' % (len(pids), count))
+
+    def _kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+            return True
+        except OSError, e:
+            if e.errno != errno.ESRCH:
+                raise
+            return False
+
+    def _reap(self, pid, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _wait_exited(self, pids, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            pids = [pid for pid in pids if self._kill(pid, 0)]
+            if not pids:
+                break
+            time.sleep(0.05)
+        return pids
+
+    def test_crashed_child_replaced_and_children_reaped(self):
+        self._start_master(2)
+        pids = self._get_children(3)
+        self.assertEqual(3, len(pids))
+        time.sleep(0.2)
+        alive = [pid for pid in pids if self._kill(pid, 0)]
+        self.assertEqual(2, len(alive))
+
+        self._kill(self.master, signal.SIGTERM)
+        self.assertTrue(self._reap(self.master, 10))
+        self.master = None
+        self.assertEqual([], self._wait_exited(pids))
+
+
+def suite():
+    suite = unittest.TestSuite()
+    if os.name == 'posix':
+        suite.addTest(unittest.makeSuite(PreforkTestCase, 'test'))
+    return suite
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -23,7 +23,7 @@ from trac.perm import IPermissionRequestor
 from trac.util import as_bool, is_path_below
 from trac.util.compat import any
 from trac.util.text import breakable_path, normalize_whitespace, print_table, \
-                           printout
+                           printout, to_unicode
 from trac.util.translation import _, ngettext, tag_
 from trac.versioncontrol import DbRepositoryProvider, RepositoryManager, \
                                 is_default
@@ -342,6 +342,11 @@ class RepositoryAdminPanel(Component):
                 info['display_rev'] = repos.display_rev(youngest_rev)
             except Exception:
                 pass
+            state = RepositoryManager(self.env).get_sync_state(reponame)
+            if state:
+                info['sync_time'] = state['time']
+                if state['error'] is not None:
+                    info['sync_error'] = to_unicode(state['error'])
         return info
 
     def _check_dir(self, req, dir):
@@ -18,12 +18,16 @@ from __future__ import with_statement
 
 import os.path
 import time
+from datetime import datetime
+from Queue import Queue, Empty
 
 from trac.admin import AdminCommandError, IAdminCommandProvider, get_dir_list
-from trac.config import ConfigSection, ListOption, Option
+from trac.cache import CacheManager
+from trac.config import ConfigSection, IntOption, ListOption, Option
 from trac.core import *
 from trac.resource import IResourceManager, Resource, ResourceNotFound
 from trac.util.concurrency import threading
+from trac.util.datefmt import utc
 from trac.util.text import printout, to_unicode, exception_to_unicode
 from trac.util.translation import _
 from trac.web.api import IRequestFilter
@@ -58,6 +62,16 @@ class IRepositoryConnector(Interface):
         """Return a Repository instance for the given repository type and dir.
         """
 
+    def shutdown():
+        """Release the resources kept by the connector, like opened
+        repositories, when the environment is shut down.
+
+        Implementing this method is optional. It is only called for the
+        connectors which have been used.
+
+        :since: 1.1.2
+        """
+
 
 class IRepositoryProvider(Interface):
     """Provide known named instances of Repository."""
@@ -333,53 +347,58 @@ class RepositoryManager(Component):
         repositories specified here. The default is to synchronize the default
         repository, for backward compatibility. (''since 0.12'')""")
 
+    repository_sync_interval = IntOption('trac', 'repository_sync_interval',
+                                         0,
+        """Interval in seconds at which the repositories listed in
+        `repository_sync_per_request` are synchronized by a background
+        thread.
+
+        When set to a positive value, the repositories are no longer
+        synchronized at the start of each request, so that requests
+        never wait for the repositories. The state of the last
+        synchronization is shown in the "Repositories" admin panel.
+        (''since 1.1.2'')""")
+
     def __init__(self):
         self._cache = {}
         self._lock = threading.Lock()
         self._connectors = None
         self._all_repositories = None
+        self._sync_states = {}
+        self._sync_queue = Queue()
+        self._sync_thread = None
 
     # IRequestFilter methods
 
     def pre_process_request(self, req, handler):
         from trac.web.chrome import Chrome, add_warning
         if handler is not Chrome(self.env):
-            for reponame in self.repository_sync_per_request:
-                start = time.time()
+            if self.repository_sync_interval > 0:
+                self._start_sync_thread()
+                errors = []
+                for reponame in self.repository_sync_per_request:
+                    state = self.get_sync_state(reponame)
+                    if state and state['error']:
+                        errors.append((reponame, state['error']))
+            else:
+                errors = ((reponame, self._sync_repository(reponame))
+                          for reponame in self.repository_sync_per_request)
+            for reponame, e in errors:
                 if is_default(reponame):
                     reponame = ''
-                try:
-                    repo = self.get_repository(reponame)
-                    if repo:
-                        repo.sync()
-                    else:
-                        self.log.warning("Unable to find repository '%s' for "
-                                         "synchronization",
-                                         reponame or '(default)')
-                        continue
-                except TracError, e:
+                if isinstance(e, TracError):
                     add_warning(req,
                         _("Can't synchronize with repository \"%(name)s\" "
                           "(%(error)s). Look in the Trac log for more "
                           "information.", name=reponame or '(default)',
                           error=to_unicode(e)))
-                except Exception, e:
+                elif e is not None:
                     add_warning(req,
                         _("Failed to sync with repository \"%(name)s\": "
                           "%(error)s; repository information may be out of "
                           "date. Look in the Trac log for more information "
                           "including mitigation strategies.",
                           name=reponame or '(default)', error=to_unicode(e)))
-                    self.log.error(
-                        "Failed to sync with repository \"%s\"; You may be "
-                        "able to reduce the impact of this issue by "
-                        "configuring [trac] repository_sync_per_request; see "
-                        "http://trac.edgewall.org/wiki/TracRepositoryAdmin"
-                        "#ExplicitSync for more detail: %s",
-                        reponame or '(default)',
-                        exception_to_unicode(e, traceback=True))
-                self.log.info("Synchronized '%s' repository in %0.2f seconds",
-                              reponame or '(default)', time.time() - start)
         return handler
 
     def post_process_request(self, req, template, data, content_type):
@@ -702,16 +721,149 @@ class RepositoryManager(Component):
                     getattr(listener, event)(repos, changeset, *args)
 
     def shutdown(self, tid=None):
-        """Free `Repository` instances bound to a given thread identifier"""
+        """Free `Repository` instances bound to a given thread identifier,
+        or stop the background synchronization thread if `tid` is
+        `None`."""
         if tid:
             assert tid == threading._get_ident()
             with self._lock:
                 repositories = self._cache.pop(tid, {})
                 for reponame, repos in repositories.iteritems():
                     repos.close()
+        else:
+            with self._lock:
+                if self._sync_thread is not None:
+                    self._sync_queue.put(None)
+                    self._sync_thread = None
+                connectors = set(connector for connector, prio
+                                 in (self._connectors or {}).itervalues())
+            for connector in connectors:
+                shutdown = getattr(connector, 'shutdown', None)
+                if shutdown:
+                    shutdown()
+
+    def get_sync_state(self, reponame):
+        """Return the state of the last synchronization of the
+        repository `reponame` in this process.
+
+        The state is a dictionary with a `time` key for the `datetime`
+        at which the synchronization ended, a `duration` key for the
+        time it took in seconds, and an `error` key for the exception
+        raised by the synchronization, or `None` if it succeeded. If
+        the repository hasn't been synchronized yet, `None` is returned.
+
+        :since 1.1.2:
+        """
+        if is_default(reponame):
+            reponame = ''
+        return self._sync_states.get(reponame)
+
+    def request_sync(self, reponame):
+        """Schedule the synchronization of the repository `reponame`
+        by the background synchronization thread, and return
+        immediately.
+
+        This can be used by components notified of repository changes
+        within the web server process, e.g. by a web hook.
+
+        :since 1.1.2:
+        """
+        self._start_sync_thread()
+        self._sync_queue.put(reponame)
 
     # private methods
 
+    def _sync_repository(self, reponame):
+        """Synchronize the repository `reponame` and record the state
+        of the synchronization.
+
+        Return the exception raised by the synchronization, if any.
+        """
+        start = time.time()
+        if is_default(reponame):
+            reponame = ''
+        error = None
+        try:
+            repo = self.get_repository(reponame)
+            if repo:
+                repo.sync()
+            else:
+                self.log.warning("Unable to find repository '%s' for "
+                                 "synchronization", reponame or '(default)')
+                return None
+        except TracError, e:
+            error = e
+        except Exception, e:
+            error = e
+            self.log.error(
+                "Failed to sync with repository \"%s\"; You may be "
+                "able to reduce the impact of this issue by "
+                "configuring [trac] repository_sync_per_request; see "
+                "http://trac.edgewall.org/wiki/TracRepositoryAdmin"
+                "#ExplicitSync for more detail: %s",
+                reponame or '(default)',
+                exception_to_unicode(e, traceback=True))
+        duration = time.time() - start
+        self.log.info("Synchronized '%s' repository in %0.2f seconds",
+                      reponame or '(default)', duration)
+        self._sync_states[reponame] = {'time': datetime.now(utc),
+                                       'duration': duration, 'error': error}
+        return error
+
+    def _start_sync_thread(self):
+        """Start the background synchronization thread, unless it's
+        already running."""
+        if self._sync_thread is not None:
+            return
+        with self._lock:
+            if self._sync_thread is None:
+                thread = threading.Thread(target=self._sync_loop,
+                                          name='Repository sync')
+                thread.setDaemon(True)
+                thread.start()
+                self._sync_thread = thread
+
+    def _sync_loop(self):
+        """Synchronize the repositories listed in
+        `repository_sync_per_request` right away and then every
+        `repository_sync_interval` seconds, and the repositories
+        scheduled by `request_sync` as soon as possible, until
+        `shutdown` is called."""
+        tid = threading._get_ident()
+        interval = self.repository_sync_interval
+        next_sync = time.time()
+        while True:
+            timeout = None
+            if interval > 0:
+                timeout = next_sync - time.time()
+            if timeout is not None and timeout <= 0:
+                # The periodic synchronization follows a fixed schedule,
+                # so that requested synchronizations can't delay it
+                reponames = self.repository_sync_per_request
+                now = time.time()
+                while next_sync <= now:
+                    next_sync += interval
+            else:
+                try:
+                    reponame = self._sync_queue.get(True, timeout)
+                except Empty:
+                    continue
+                if reponame is None:
+                    break
+                reponames = [reponame]
+            # Like for a request, start with fresh cache metadata and
+            # release the repositories and connections of this thread
+            # when done.
+            CacheManager(self.env).reset_metadata()
+            try:
+                for reponame in reponames:
+                    self._sync_repository(reponame)
+            except Exception, e:
+                self.log.error("Repository synchronization failed: %s",
+                               exception_to_unicode(e, traceback=True))
+            finally:
+                self.env.shutdown(tid)
+
     def _get_connector(self, rtype):
         """Retrieve the appropriate connector for the given repository type.
 
@@ -1051,6 +1203,21 @@ class Node(object):
         """
         raise NotImplementedError
 
+    def get_entries_info(self):
+        """Return the metadata of the immediate child entries of a
+        directory, as a list of `(name, path, kind, rev, created_rev,
+        content_length)` tuples.
+
+        This is the same information as given by the nodes returned by
+        `get_entries()`, including the last change of each entry, but
+        backends can override this method to retrieve it in bulk.
+
+        :since: 1.1.2
+        """
+        return [(node.name, node.path, node.kind, node.rev,
+                 node.created_rev, node.content_length)
+                for node in self.get_entries()]
+
     def get_history(self, limit=None):
         """Provide backward history for this Node.
 
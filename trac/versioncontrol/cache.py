@@ -67,21 +67,29 @@ class CachedRepository(Repository):
         return self.repos.get_path_url(path, rev)
 
     def get_changeset(self, rev):
-        return CachedChangeset(self, self.normalize_rev(rev), self.env)
+        return self._create_changeset(self.normalize_rev(rev))
+
+    def _create_changeset(self, rev, data=None):
+        """Return the changeset `rev`, which is already normalized.
+
+        Subclasses returning their own changeset class override this
+        method rather than `get_changeset()`, so that the changesets
+        read in bulk by `get_changesets()` are created the same way.
+        When only `get_changeset()` is overridden, the changesets are
+        retrieved through it, one at a time.
+
+        :param data: the `(time, author, message)` columns of the
+                     changeset in the `revision` table, if they have
+                     already been read
+        :since: 1.1.2
+        """
+        return CachedChangeset(self, rev, self.env, data)
 
     def get_changeset_uid(self, rev):
         return self.repos.get_changeset_uid(rev)
 
     def get_changesets(self, start, stop):
-        for rev, in self.env.db_query("""
-                SELECT rev FROM revision
-                WHERE repos=%s AND time >= %s AND time < %s
-                ORDER BY time DESC, rev DESC
-                """, (self.id, to_utimestamp(start), to_utimestamp(stop))):
-            try:
-                yield self.get_changeset(rev)
-            except NoSuchChangeset:
-                pass # skip changesets currently being resync'ed
+        return get_cached_changesets(self.env, [self], start, stop)[self]
 
     def sync_changeset(self, rev):
         cset = self.repos.get_changeset(rev)
@@ -314,6 +322,105 @@ class CachedRepository(Repository):
                     (self.id, sfirst, slast, path,
                      db.like_escape(path + '/') + '%'))]
 
+    def get_node_history(self, path, rev=None, limit=None):
+        """Provide backward history for the node at `path` and `rev`.
+
+        This yields the same `(path, rev, chg)` tuples as
+        `Node.get_history()`, following copies and moves of the node or
+        of its parent directories, but reads them from the cache.
+
+        The revisions are retrieved by range queries on the ordered
+        `rev` column, so this is only available for repositories with
+        `has_linear_changesets`.
+
+        :param limit: if given, yield at most ``limit`` results.
+
+        :since: 1.1.2
+        """
+        if not self.has_linear_changesets:
+            raise TracError(_("Node history is only available from the "
+                              "cache for repositories with linear "
+                              "changesets"))
+        rev = self.normalize_rev(rev)
+        self.get_node(path, rev)    # Check node existence
+        path = path.strip('/')
+        newer = None
+        numrevs = 0
+        for older in self._iter_node_revs(path, rev, (limit or 99) + 1):
+            if newer:
+                yield (newer[0], newer[1], Changeset.EDIT
+                       if newer[0] == older[0] else Changeset.COPY)
+                numrevs += 1
+                if limit and numrevs >= limit:
+                    return
+            newer = older
+        if newer:
+            yield newer[0], newer[1], Changeset.ADD
+
+    def _iter_node_revs(self, path, rev, page_size):
+        """Generate the `(path, rev)` pairs of the revisions in which the
+        node changed, from the newest to the oldest."""
+        srev = self.db_rev(rev)
+        op = '<='
+        with self.env.db_query as db:
+            while True:
+                sql = """SELECT DISTINCT rev FROM node_change
+                         WHERE repos=%%s AND rev%s%%s""" % op
+                args = [self.id, srev]
+                parents = []
+                if path:
+                    # changes on path itself or its children
+                    sql += " AND (path=%s OR path " + db.like()
+                    args.extend((path, db.like_escape(path + '/') + '%'))
+                    # creation of path ancestors
+                    components = path.split('/')
+                    parents = ['/'.join(components[:i])
+                               for i in range(1, len(components))]
+                    if parents:
+                        sql += " OR (path IN (%s)" \
+                               " AND change_type IN ('A','C','M'))" \
+                               % ','.join(['%s'] * len(parents))
+                        args.extend(parents)
+                    sql += ")"
+                sql += " ORDER BY rev DESC LIMIT %d" % page_size
+                revs = [srev for srev, in db(sql, args)]
+                if not revs:
+                    return
+
+                # Additions and copies of the node or of its ancestors at
+                # these revisions, the closest ancestor first
+                origins = {}
+                if path:
+                    for orev, opath, change, base_path, base_rev in db("""
+                            SELECT rev, path, change_type, base_path,
+                                   base_rev
+                            FROM node_change
+                            WHERE repos=%%s AND rev>=%%s AND rev<=%%s
+                              AND path IN (%s)
+                              AND change_type IN ('A','C','M')
+                            ORDER BY path DESC
+                            """ % ','.join(['%s'] * (len(parents) + 1)),
+                            [self.id, revs[-1], revs[0]] + parents + [path]):
+                        origins.setdefault(orev, (opath, change, base_path,
+                                                  base_rev))
+
+                for srev in revs:
+                    yield path, self.rev_db(srev)
+                    if srev in origins:
+                        opath, change, base_path, base_rev = origins[srev]
+                        if change == 'A' or not base_path:
+                            return
+                        # continue from the source of the copy
+                        path = (base_path.strip('/') +
+                                path[len(opath):]).strip('/')
+                        srev = self.db_rev(self.rev_db(base_rev))
+                        op = '<='
+                        break
+                else:
+                    if len(revs) < page_size:
+                        return
+                    op = '<'
+
     def has_node(self, path, rev=None):
         return self.repos.has_node(path, self.normalize_rev(rev))
 
@@ -406,14 +513,86 @@ class CachedRepository(Repository):
                                       ignore_ancestry)
 
 
+def get_cached_changesets(env, repositories, start, stop, limit=None):
+    """Return a dictionary mapping each of the cached `repositories` to
+    the iterator of its changesets in the given time period, like
+    `Repository.get_changesets()`.
+
+    Without a `limit`, the revisions of all the repositories are
+    retrieved with a single query. Otherwise, the revisions of each
+    repository are retrieved `limit` at a time, and further ones only
+    when its iterator is consumed that far.
+
+    :since: 1.1.2
+    """
+    start = to_utimestamp(start)
+    stop = to_utimestamp(stop)
+
+    def query(ids, after=None):
+        sql = """
+            SELECT repos, rev, time, author, message FROM revision
+            WHERE repos IN (%s) AND time >= %%s AND time < %%s
+            """ % ','.join(['%s'] * len(ids))
+        args = list(ids) + [start, stop]
+        if after:
+            sql += " AND (time < %s OR (time = %s AND rev < %s))"
+            args += [after[0], after[0], after[1]]
+        sql += " ORDER BY time DESC, rev DESC"
+        if limit:
+            sql += " LIMIT %d" % limit
+        return env.db_query(sql, args)
+
+    def create(repos, rev, data):
+        if type(repos).get_changeset == CachedRepository.get_changeset:
+            return repos._create_changeset(repos.rev_db(rev), data)
+        try:
+            return repos.get_changeset(repos.rev_db(rev))
+        except NoSuchChangeset:
+            pass # skip changesets currently being resync'ed
+
+    def changesets(repos, rows):
+        while True:
+            for rev, time, author, message in rows:
+                cset = create(repos, rev, (time, author, message))
+                if cset:
+                    yield cset
+            if not limit or len(rows) < limit:
+                break
+            rows = [row[1:] for row in query([repos.id],
+                                             (rows[-1][1], rows[-1][0]))]
+
+    rows = dict((repos.id, []) for repos in repositories)
+    if limit:
+        for repos in repositories:
+            rows[repos.id] = [row[1:] for row in query([repos.id])]
+    else:
+        ids = list(rows)
+        for i in xrange(0, len(ids), 100):
+            for row in query(ids[i:i + 100]):
+                rows[row[0]].append(row[1:])
+
+    return dict((repos, changesets(repos, rows[repos.id]))
+                for repos in repositories)
+
+
 class CachedChangeset(Changeset):
 
-    def __init__(self, repos, rev, env):
+    def __init__(self, repos, rev, env, data=None):
+        """Create the changeset `rev` of the cached `repos`.
+
+        :param data: the `(time, author, message)` columns of the
+                     changeset in the `revision` table, if they have
+                     already been read
+        """
         self.env = env
-        for _date, author, message in self.env.db_query("""
+        if data is None:
+            data = self.env.db_query("""
                 SELECT time, author, message FROM revision
                 WHERE repos=%s AND rev=%s
-                """, (repos.id, repos.db_rev(rev))):
+                """, (repos.id, repos.db_rev(rev)))
+        else:
+            data = [data]
+        for _date, author, message in data:
             date = from_utimestamp(_date)
             Changeset.__init__(self, repos, repos.rev_db(rev), message, author,
                                date)
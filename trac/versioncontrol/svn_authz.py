@@ -16,12 +16,13 @@
 # Author: Francois Harvey <fharvey@securiweb.net>
 #         Matthew Good <trac@matt-good.net>
 
+import itertools
 import os.path
 
 from trac.config import Option, PathOption
 from trac.core import *
 from trac.perm import IPermissionPolicy
-from trac.util import read_file
+from trac.util import LRUCache, read_file
 from trac.util.text import exception_to_unicode, to_unicode
 from trac.util.translation import _
 from trac.versioncontrol.api import RepositoryManager
@@ -43,6 +44,74 @@ def join(*args):
     return '/'.join(arg for arg in args if arg)
 
 
+class PathTrie(object):
+    """The decisions of an authz file for a given list of users and
+    modules, arranged as a tree of path components.
+
+    Checking a path then only walks down the tree along the path.
+
+    :since: 1.1.2
+    """
+
+    def __init__(self, authz, usernames, modules):
+        # Each node is [decision for "path/", decision for "path",
+        #               whether access is granted below, children]
+        self.root = [None, None, False, {}]
+        for spath in set(spath for module in modules
+                               for spath in authz.get(module, {})):
+            if not spath.startswith('/'):
+                continue
+            sections = [authz[module][spath] for module in modules
+                        if spath in authz.get(module, {})]
+            decision = None
+            for section in sections:
+                for user in usernames:
+                    decision = section.get(user)
+                    if decision is not None:
+                        break
+                if decision is not None:
+                    break
+            granted = any(section.get(user) is True
+                          for section in sections
+                          for user in usernames)
+            slash = spath.endswith('/')
+            node = self.root
+            ancestors = []
+            for name in spath.strip('/').split('/'):
+                if name:
+                    ancestors.append(node)
+                    node = node[3].setdefault(name, [None, None, False, {}])
+            if decision is not None:
+                node[0 if slash else 1] = decision
+            if granted:
+                # Allow access to parent directories of allowed resources
+                for each in ancestors:
+                    each[2] = True
+                if slash:
+                    node[2] = True
+
+    def check(self, path):
+        """Return the decision for `path`, or `None` if the authz file
+        doesn't specify one."""
+        node = self.root
+        nodes = [node]
+        for name in path.strip('/').split('/'):
+            if name:
+                node = node[3].get(name)
+                if node is None:
+                    break
+                nodes.append(node)
+        else:
+            if node[2]:
+                return True
+        # Walk from resource up parent directories
+        for node in reversed(nodes):
+            if node[0] is not None:
+                return node[0]
+            if node[1] is not None:
+                return node[1]
+
+
 class ParseError(Exception):
     """Exception thrown for parse errors in authz files"""
 
@@ -134,8 +203,13 @@ class AuthzSourcePolicy(Component):
         """)
 
     _mtime = 0
-    _authz = {}
-    _users = set()
+    # The parsed authz file, the users granted some access in it and a
+    # generation number identifying the parse, replaced all at once
+    _authz_info = ({}, set(), 0)
+    _generations = itertools.count(1)
+
+    # Number of path tries kept between two reloads of the authz file
+    path_tries_cache_size = 100
 
     _handled_perms = frozenset([(None, 'BROWSER_VIEW'),
                                 (None, 'CHANGESET_VIEW'),
@@ -146,75 +220,85 @@ class AuthzSourcePolicy(Component):
                                 ('source', 'LOG_VIEW'),
                                 ('changeset', 'CHANGESET_VIEW')])
 
+    def __init__(self):
+        self._path_tries = LRUCache(self.path_tries_cache_size)
+
     # IPermissionPolicy methods
 
     def check_permission(self, action, username, resource, perm):
-        realm = resource.realm if resource else None
-        if (realm, action) in self._handled_perms:
-            authz, users = self._get_authz_info()
-            if authz is None:
-                return False
-
-            if username == 'anonymous':
-                usernames = ('$anonymous', '*')
-            else:
-                usernames = (username, '$authenticated', '*')
+        return self.check_permissions(action, username, [resource], perm)[0]
+
+    def check_permissions(self, action, username, resources, perm):
+        decisions = [None] * len(resources)
+        handled = [i for i, resource in enumerate(resources)
+                   if (resource.realm if resource else None,
+                       action) in self._handled_perms]
+        if not handled:
+            return decisions
+        authz, users, generation = self._get_authz_info()
+        if authz is None:
+            for i in handled:
+                decisions[i] = False
+            return decisions
+
+        if username == 'anonymous':
+            usernames = ('$anonymous', '*')
+        else:
+            usernames = (username, '$authenticated', '*')
+        rm = RepositoryManager(self.env)
+        repositories = {}
+        for i in handled:
+            resource = resources[i]
             if resource is None:
-                return True if users & set(usernames) else None
-
-            rm = RepositoryManager(self.env)
-            try:
-                repos = rm.get_repository(resource.parent.id)
-            except TracError:
-                return True # Allow error to be displayed in the repo index
+                decisions[i] = True if users & set(usernames) else None
+                continue
+            reponame = resource.parent.id
+            if reponame not in repositories:
+                try:
+                    repositories[reponame] = rm.get_repository(reponame)
+                except TracError:
+                    repositories[reponame] = None
+            repos = repositories[reponame]
             if repos is None:
-                return True
-            modules = [resource.parent.id or self.authz_module_name]
-            if modules[0]:
-                modules.append('')
+                # Allow error to be displayed in the repo index
+                decisions[i] = True
+                continue
+            trie = self._get_path_trie(authz, generation, usernames,
+                                       reponame or self.authz_module_name)
 
             def check_path(path):
-                path = '/' + join(repos.scope, path)
-                if path != '/':
-                    path += '/'
+                return trie.check('/' + join(repos.scope, path))
 
-                # Allow access to parent directories of allowed resources
-                if any(section.get(user) is True
-                       for module in modules
-                       for spath, section in authz.get(module, {}).iteritems()
-                       if spath.startswith(path)
-                       for user in usernames):
-                    return True
-
-                # Walk from resource up parent directories
-                for spath in parent_iter(path):
-                    for module in modules:
-                        section = authz.get(module, {}).get(spath)
-                        if section:
-                            for user in usernames:
-                                result = section.get(user)
-                                if result is not None:
-                                    return result
-
-            if realm == 'source':
-                return check_path(resource.id)
-
-            elif realm == 'changeset':
+            if resource.realm == 'source':
+                decisions[i] = check_path(resource.id)
+
+            elif resource.realm == 'changeset':
                 changes = list(repos.get_changeset(resource.id).get_changes())
                 if not changes or any(check_path(change[0])
                                       for change in changes):
-                    return True
+                    decisions[i] = True
+        return decisions
+
+    def _get_path_trie(self, authz, generation, usernames, module):
+        modules = (module, '') if module else ('',)
+        # The generation keeps a trie built by a thread still holding a
+        # previous authz from being used for the new one
+        key = (generation, usernames, modules)
+        trie = self._path_tries.get(key)
+        if trie is None:
+            trie = self._path_tries[key] = PathTrie(authz, usernames,
+                                                    modules)
+        return trie
 
     def _get_authz_info(self):
         try:
             mtime = os.path.getmtime(self.authz_file)
         except OSError, e:
-            if self._authz is not None:
+            if self._authz_info[0] is not None:
                 self.log.error('Error accessing authz file: %s',
                                exception_to_unicode(e))
             self._mtime = mtime = 0
-            self._authz = None
-            self._users = set()
+            self._authz_info = (None, set(), self._generations.next())
         if mtime > self._mtime:
             self._mtime = mtime
             rm = RepositoryManager(self.env)
@@ -225,14 +309,16 @@ class AuthzSourcePolicy(Component):
             modules.add('')
             self.log.info('Parsing authz file: %s' % self.authz_file)
             try:
-                self._authz = parse(read_file(self.authz_file), modules)
-                self._users = set(user for paths in self._authz.itervalues()
-                                  for path in paths.itervalues()
-                                  for user, result in path.iteritems()
-                                  if result)
+                authz = parse(read_file(self.authz_file), modules)
+                users = set(user for paths in authz.itervalues()
+                            for path in paths.itervalues()
+                            for user, result in path.iteritems()
+                            if result)
             except Exception, e:
-                self._authz = None
-                self._users = set()
+                authz = None
+                users = set()
                 self.log.error('Error parsing authz file: %s',
                                exception_to_unicode(e))
-        return self._authz, self._users
+            self._authz_info = (authz, users, self._generations.next())
+            self._path_tries.clear()
+        return self._authz_info
@@ -14,11 +14,15 @@
 #
 # Author: Eli Carter <eli.carter@commprove.com>
 
+import time
 import unittest
 
+from trac.core import Component, ComponentMeta, TracError, implements
 from trac.resource import Resource, get_resource_description, get_resource_url
-from trac.test import EnvironmentStub
-from trac.versioncontrol.api import Repository
+from trac.test import EnvironmentStub, Mock
+from trac.util.concurrency import threading
+from trac.versioncontrol.api import IRepositoryConnector, Repository, \
+                                    RepositoryManager
 
 
 class ApiTestCase(unittest.TestCase):
@@ -112,10 +116,113 @@ class ResourceManagerTestCase(unittest.TestCase):
                          get_resource_url(self.env, res, self.env.href))
 
 
+class RepositorySyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.env = EnvironmentStub()
+        self.rm = RepositoryManager(self.env)
+        self.synced = threading.Event()
+        self.sync_error = None
+        def sync():
+            self.synced.set()
+            if self.sync_error:
+                raise self.sync_error
+        self.repos = Mock(sync=sync)
+        self.rm.get_repository = lambda reponame: self.repos
+        self.req = Mock(chrome={'warnings': []})
+
+    def tearDown(self):
+        self.rm.shutdown()
+        self.env.reset_db()
+
+    def test_sync_per_request(self):
+        self.assertEqual(None, self.rm.get_sync_state(''))
+        self.rm.pre_process_request(self.req, None)
+        self.assertTrue(self.synced.isSet())
+        state = self.rm.get_sync_state('(default)')
+        self.assertEqual(None, state['error'])
+        self.assertEqual([], self.req.chrome['warnings'])
+
+    def test_sync_per_request_error(self):
+        self.sync_error = TracError('Broken')
+        self.rm.pre_process_request(self.req, None)
+        self.assertEqual(self.sync_error, self.rm.get_sync_state('')['error'])
+        self.assertEqual(1, len(self.req.chrome['warnings']))
+
+    def test_sync_in_background(self):
+        self.env.config.set('trac', 'repository_sync_interval', 3600)
+        self.rm.pre_process_request(self.req, None)
+        self.synced.wait(10)
+        self.assertTrue(self.synced.isSet())
+        self.synced.clear()
+        self.rm.request_sync('(default)')
+        self.synced.wait(10)
+        self.assertTrue(self.synced.isSet())
+
+    def test_sync_in_background_on_schedule(self):
+        synced = []
+        def get_repository(reponame):
+            synced.append(reponame)
+            return self.repos
+        self.rm.get_repository = get_repository
+        self.env.config.set('trac', 'repository_sync_interval', 1)
+        self.rm.request_sync('other')
+        start = time.time()
+        while time.time() - start < 2.5:
+            self.rm.request_sync('other')
+            time.sleep(0.05)
+        # Requested synchronizations don't delay the periodic ones,
+        # the first of which happens as soon as the thread starts
+        self.assertTrue(synced.count('') >= 2, synced.count(''))
+        self.assertEqual('', synced[0])
+
+
+class RepositoryManagerShutdownTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.old_registry = ComponentMeta._registry
+        ComponentMeta._registry = dict((interface, list(classes))
+                                       for interface, classes
+                                       in self.old_registry.iteritems())
+        self.shutdowns = shutdowns = []
+
+        class TestConnector(Component):
+            implements(IRepositoryConnector)
+            def get_supported_types(self):
+                yield ('test-shutdown', 1)
+            def get_repository(self, repos_type, repos_dir, params):
+                return Mock(close=lambda: None)
+            def shutdown(self):
+                shutdowns.append(self)
+
+        self.env = EnvironmentStub(enable=[TestConnector, RepositoryManager])
+        self.env.config.set('trac', 'repository_type', 'test-shutdown')
+        self.env.config.set('trac', 'repository_dir', '/var/test-shutdown')
+        self.rm = RepositoryManager(self.env)
+
+    def tearDown(self):
+        ComponentMeta._registry = self.old_registry
+        self.env.reset_db()
+
+    def test_unused_connectors_not_shut_down(self):
+        self.rm.shutdown()
+        self.assertEqual([], self.shutdowns)
+
+    def test_used_connectors_shut_down(self):
+        self.assertNotEqual(None, self.rm.get_repository(''))
+        self.rm.shutdown(threading._get_ident())
+        self.assertEqual([], self.shutdowns)
+        self.rm.shutdown()
+        self.assertEqual(1, len(self.shutdowns))
+
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(ApiTestCase, 'test'))
     suite.addTest(unittest.makeSuite(ResourceManagerTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(RepositorySyncTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(RepositoryManagerShutdownTestCase,
+                                     'test'))
     return suite
 
 
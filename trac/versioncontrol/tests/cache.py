@@ -22,7 +22,7 @@ from trac.test import EnvironmentStub, Mock
 from trac.tests import compat
 from trac.util.datefmt import to_utimestamp, utc
 from trac.versioncontrol import Repository, Changeset, Node, NoSuchChangeset
-from trac.versioncontrol.cache import CachedRepository
+from trac.versioncontrol.cache import CachedRepository, get_cached_changesets
 
 import unittest
 
@@ -306,6 +306,133 @@ class CacheTestCase(unittest.TestCase):
                          changes.next())
         self.assertRaises(StopIteration, changes.next)
 
+    def _preset_node_history(self):
+        self.preset_cache(*[
+            (('%010d' % rev, 0, 'joe', ''), changes)
+            for rev, changes in [
+                (1, [('trunk', 'D', 'A', None, None),
+                     ('trunk/README', 'F', 'A', None, None)]),
+                (2, [('trunk/README', 'F', 'E', 'trunk/README', 1)]),
+                (3, [('trunk/src', 'D', 'A', None, None),
+                     ('trunk/src/a.c', 'F', 'A', None, None)]),
+                (4, [('branches', 'D', 'A', None, None),
+                     ('branches/b1', 'D', 'C', 'trunk', 3)]),
+                (5, [('branches/b1/src/a.c', 'F', 'E',
+                      'branches/b1/src/a.c', 4)]),
+                (6, [('branches/b1/README.txt', 'F', 'M',
+                      'branches/b1/README', 5)]),
+                (7, [('trunk/README', 'F', 'E', 'trunk/README', 2)])]])
+
+        class LinearCachedRepository(CachedRepository):
+            has_linear_changesets = True
+
+            def db_rev(self, rev):
+                return '%010d' % rev
+
+            def rev_db(self, rev):
+                return int(rev or 0)
+
+        repos = self.get_repos()
+        repos.get_node = lambda path, rev: None
+        return LinearCachedRepository(self.env, repos, self.log)
+
+    def test_get_node_history(self):
+        cache = self._preset_node_history()
+        self.assertEqual([('trunk/README', 7, Changeset.EDIT),
+                          ('trunk/README', 2, Changeset.EDIT),
+                          ('trunk/README', 1, Changeset.ADD)],
+                         list(cache.get_node_history('/trunk/README')))
+        self.assertEqual([('trunk/README', 2, Changeset.EDIT),
+                          ('trunk/README', 1, Changeset.ADD)],
+                         list(cache.get_node_history('/trunk/README', 6)))
+        self.assertEqual([('trunk', 7, Changeset.EDIT),
+                          ('trunk', 3, Changeset.EDIT)],
+                         list(cache.get_node_history('/trunk', None, 2)))
+
+    def test_get_node_history_follow_copies(self):
+        cache = self._preset_node_history()
+        self.assertEqual([('branches/b1/README.txt', 6, Changeset.COPY),
+                          ('branches/b1/README', 4, Changeset.COPY),
+                          ('trunk/README', 2, Changeset.EDIT),
+                          ('trunk/README', 1, Changeset.ADD)],
+                         list(cache.get_node_history(
+                             '/branches/b1/README.txt')))
+        self.assertEqual([('branches/b1', 6, Changeset.EDIT),
+                          ('branches/b1', 5, Changeset.EDIT),
+                          ('branches/b1', 4, Changeset.COPY),
+                          ('trunk', 3, Changeset.EDIT),
+                          ('trunk', 2, Changeset.EDIT),
+                          ('trunk', 1, Changeset.ADD)],
+                         list(cache.get_node_history('/branches/b1')))
+
+    def test_get_node_history_pages(self):
+        cache = self._preset_node_history()
+        self.assertEqual([('', 7), ('', 6), ('', 5), ('', 4), ('', 3),
+                          ('', 2), ('', 1)],
+                         list(cache._iter_node_revs('', 7, 2)))
+        self.assertEqual([('branches/b1/src/a.c', 5),
+                          ('branches/b1/src/a.c', 4),
+                          ('trunk/src/a.c', 3)],
+                         list(cache._iter_node_revs('branches/b1/src/a.c',
+                                                    7, 1)))
+
+    def test_get_cached_changesets(self):
+        t1 = datetime(2001, 1, 1, 1, 1, 1, 0, utc)
+        t2 = datetime(2002, 1, 1, 1, 1, 1, 0, utc)
+        t3 = datetime(2003, 1, 1, 1, 1, 1, 0, utc)
+        t4 = datetime(2004, 1, 1, 1, 1, 1, 0, utc)
+        self.preset_cache(
+            (('0', to_utimestamp(t1), '', ''), []),
+            (('1', to_utimestamp(t2), 'joe', 'Import'), []),
+            (('2', to_utimestamp(t3), 'jane', 'Fix'), []))
+        self.env.db_transaction("""
+            INSERT INTO revision (repos, rev, time, author, message)
+            VALUES (2, '1', %s, 'jim', 'Other')
+            """, (to_utimestamp(t2),))
+        cache = CachedRepository(self.env, self.get_repos(), self.log)
+        changesets = get_cached_changesets(self.env, [cache], t1, t3)
+        self.assertEqual([cache], changesets.keys())
+        self.assertEqual([('1', 'joe', 'Import', t2), ('0', '', '', t1)],
+                         [(cset.rev, cset.author, cset.message, cset.date)
+                          for cset in changesets[cache]])
+        self.assertEqual(['2', '1'],
+                         [cset.rev for cset in cache.get_changesets(t2, t4)])
+
+    def test_get_cached_changesets_limit(self):
+        t1 = datetime(2001, 1, 1, 1, 1, 1, 0, utc)
+        t2 = datetime(2002, 1, 1, 1, 1, 1, 0, utc)
+        t3 = datetime(2003, 1, 1, 1, 1, 1, 0, utc)
+        self.preset_cache(
+            (('0', to_utimestamp(t1), '', ''), []),
+            (('1', to_utimestamp(t2), 'joe', 'Import'), []),
+            (('2', to_utimestamp(t2), 'jane', 'Fix'), []),
+            (('3', to_utimestamp(t3), 'joe', 'More'), []))
+        t4 = datetime(2004, 1, 1, 1, 1, 1, 0, utc)
+        cache = CachedRepository(self.env, self.get_repos(), self.log)
+        # The second page starts in the middle of the changesets of t2
+        changesets = get_cached_changesets(self.env, [cache], t1, t4, 2)
+        self.assertEqual(['3', '2', '1', '0'],
+                         [cset.rev for cset in changesets[cache]])
+
+    def test_get_changesets_overridden_get_changeset(self):
+        t1 = datetime(2001, 1, 1, 1, 1, 1, 0, utc)
+        t2 = datetime(2002, 1, 1, 1, 1, 1, 0, utc)
+        t3 = datetime(2003, 1, 1, 1, 1, 1, 0, utc)
+        self.preset_cache(
+            (('0', to_utimestamp(t1), '', ''), []),
+            (('1', to_utimestamp(t2), 'joe', 'Import'), []))
+        retrieved = []
+
+        class TestCachedRepository(CachedRepository):
+            def get_changeset(self, rev):
+                retrieved.append(rev)
+                return CachedRepository.get_changeset(self, rev)
+
+        cache = TestCachedRepository(self.env, self.get_repos(), self.log)
+        self.assertEqual([1, 0],
+                         [cset.rev for cset in cache.get_changesets(t1, t3)])
+        self.assertEqual(['1', '0'], retrieved)
+
 
 def suite():
     return unittest.makeSuite(CacheTestCase, 'test')
@@ -387,6 +387,37 @@ unknown = r
         self.assertRevPerm(None, 'user', 'scoped', 456)
         self.assertRevPerm(True, 'user', 'scoped', 789)
 
+    def test_check_permissions(self):
+        # Checking a list of resources at once gives the same decisions
+        resources = [Resource('source', path,
+                              parent=Resource('repository', reponame))
+                     for reponame, path in [('', '/readonly'),
+                                            ('', '/writeonly'),
+                                            ('', '/not_defined'),
+                                            ('module', '/module_d'),
+                                            ('scoped', '/dir1')]]
+        resources.append(Resource('wiki', 'WikiStart'))
+        self.assertEqual([True, False, None, False, None, None],
+                         self.policy.check_permissions('FILE_VIEW', 'user',
+                                                       resources, None))
+        self.assertEqual([None, None, None, None, True, None],
+                         self.policy.check_permissions('FILE_VIEW', 'joe',
+                                                       resources, None))
+
+    def test_reload_during_check(self):
+        # A check still holding the previous authz doesn't leave its trie
+        # for the new one
+        authz, users, generation = self.policy._get_authz_info()
+        self.policy._mtime = 0
+        create_file(self.authz, """\
+[/readonly]
+user =
+""")
+        self.policy._get_authz_info()
+        self.policy._get_path_trie(authz, generation,
+                                   ('user', '$authenticated', '*'), '')
+        self.assertPathPerm(False, 'user', '', '/readonly')
+
 
 def suite():
     suite = unittest.TestSuite()
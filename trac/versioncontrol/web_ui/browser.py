@@ -15,20 +15,28 @@
 #
 # Author: Jonas Borgström <jonas@edgewall.com>
 
+from __future__ import with_statement
+
+import cPickle
 from datetime import datetime, timedelta
+from difflib import SequenceMatcher
 from fnmatch import fnmatchcase
+import os
 import re
 
 from genshi.builder import tag
 
-from trac.config import ListOption, BoolOption, Option
+from trac.config import (BoolOption, IntOption, ListOption, Option,
+                         PathOption)
 from trac.core import *
 from trac.mimeview.api import IHTMLPreviewAnnotator, Mimeview, is_binary
 from trac.perm import IPermissionRequestor
 from trac.resource import Resource, ResourceNotFound
-from trac.util import as_bool, embedded_numbers
+from trac.util import AtomicFile, as_bool, embedded_numbers, sha1
 from trac.util.compat import cleandoc
-from trac.util.datefmt import http_date, to_datetime, utc
+from trac.util.concurrency import threading
+from trac.util.datefmt import from_utimestamp, http_date, pretty_timedelta, \
+                              to_datetime, to_utimestamp, utc
 from trac.util.html import escape, Markup
 from trac.util.text import exception_to_unicode, shorten_line
 from trac.util.translation import _, cleandoc_
@@ -36,10 +44,11 @@ from trac.web.api import IRequestHandler, Request, RequestDone
 from trac.web.chrome import (INavigationContributor, add_ctxtnav, add_link,
                              add_script, add_stylesheet, prevnext_nav,
                              web_context)
-from trac.wiki.api import IWikiSyntaxProvider, IWikiMacroProvider, parse_args
+from trac.wiki.api import IWikiSyntaxProvider, IWikiMacroProvider, \
+                          WikiSystem, parse_args
 from trac.wiki.formatter import format_to_html, format_to_oneliner
 
-from ..api import NoSuchChangeset, RepositoryManager
+from ..api import Changeset, Node, NoSuchChangeset, RepositoryManager
 from trac.versioncontrol.web_ui.util import * # `from .util import *` FIXME 2.6
 
 
@@ -248,6 +257,45 @@ class BrowserModule(Component):
         the repository browser.
         (''since 0.9'')""")
 
+    listing_cache_dir = PathOption('browser', 'listing_cache_dir', '',
+        """Directory in which the directory listings are saved, so that
+        the entries of a directory and their last change are only
+        retrieved once from the repository for each change of the
+        directory. The listings are kept in its `listing` subdirectory,
+        so it can be the same as the `blame_cache_dir`. Relative paths are resolved relative to the `conf`
+        directory of the environment. Leave empty to disable the cache.
+        (''since 1.1.2'')""")
+
+    listing_cache_size = IntOption('browser', 'listing_cache_size', 10000,
+        """Maximum number of directory listings kept in the
+        `listing_cache_dir`. When there are more, the least recently
+        used ones are removed.
+        (''since 1.1.2'')""")
+
+    blame_cache_dir = PathOption('browser', 'blame_cache_dir', '',
+        """Directory in which the annotations computed by the ''blame''
+        annotator are saved. When the annotations of the previous
+        version of a file are in the cache, those of the new version
+        are derived from them and from the differences between the two
+        versions. The annotations are kept in its `blame` subdirectory.
+        Relative paths are resolved relative to the `conf`
+        directory of the environment. Leave empty to disable the cache.
+        (''since 1.1.2'')""")
+
+    max_concurrent_blames = IntOption('browser', 'max_concurrent_blames', 2,
+        """Maximum number of annotations computed from the repository at
+        the same time by the ''blame'' annotator. Further requests for
+        annotating a file display a warning instead, so that long
+        computations can't occupy all the threads serving requests.
+        (''since 1.1.2'')""")
+
+    def __init__(self):
+        self._blame_slots = threading.BoundedSemaphore(
+            max(1, self.max_concurrent_blames))
+        self._listing_writes = 0
+        self._prune_lock = threading.Lock()
+        self._prune_thread = None
+
     # public methods
 
     def get_custom_colorizer(self):
@@ -555,19 +603,29 @@ class BrowserModule(Component):
 
         # Entries metadata
         class entry(object):
-            _copy = 'name rev created_rev kind isdir path content_length' \
-                    .split()
+            _copy = 'name path kind rev created_rev content_length'.split()
             __slots__ = _copy + ['raw_href']
 
-            def __init__(self, node):
-                for f in entry._copy:
-                    setattr(self, f, getattr(node, f))
-                self.raw_href = download_href(req.href, repos, node, rev)
-
-        entries = [entry(n) for n in node.get_entries()
-                   if n.is_viewable(req.perm)]
-        changes = get_changes(repos, [i.created_rev for i in entries],
-                              self.log)
+            def __init__(self, info):
+                for f, value in zip(entry._copy, info):
+                    setattr(self, f, value)
+                self.raw_href = download_href(req.href, repos, self, rev)
+
+            isdir = property(lambda self: self.kind == Node.DIRECTORY)
+            isfile = property(lambda self: self.kind == Node.FILE)
+            resource = property(lambda self: Resource('source', self.path,
+                                                      version=self.rev,
+                                                      parent=repos.resource))
+
+        entries_info, changes = self._get_listing(repos, node)
+        entries = [entry(info) for info in entries_info]
+        viewable = set(req.perm.filter('BROWSER_VIEW',
+                                       [e.resource for e in entries
+                                        if e.isdir]))
+        viewable.update(req.perm.filter('FILE_VIEW',
+                                        [e.resource for e in entries
+                                         if not e.isdir]))
+        entries = [e for e in entries if e.resource in viewable]
 
         if rev:
             newest = repos.get_changeset(rev).date
@@ -624,6 +682,186 @@ class BrowserModule(Component):
                                    timerange.to_seconds(timerange.oldest)),
                 }
 
+    # Each cache is kept in its own subdirectory, so that pruning the
+    # listings never removes annotations
+    _listing_dir = property(lambda self: self.listing_cache_dir and
+                            os.path.join(self.listing_cache_dir, 'listing'))
+    _blame_dir = property(lambda self: self.blame_cache_dir and
+                          os.path.join(self.blame_cache_dir, 'blame'))
+
+    def _get_listing(self, repos, node):
+        """Return the `Node.get_entries_info()` of the directory `node`
+        and a dictionary of the last changeset of each entry, indexed by
+        revision, from the listing cache if possible.
+
+        The listing only changes when the directory does, so it is saved
+        for the last change of the directory, together with the revision
+        it was retrieved at and the date, author and message of the
+        changesets. The entries at that revision are given the revision
+        of `node` when read back.
+        """
+        if not self._listing_dir:
+            entries = node.get_entries_info()
+            return entries, get_changes(repos, [info[4] for info in entries],
+                                        self.log)
+        key = (repos.name, repos.reponame, node.path, node.created_rev)
+        cached = self._read_cache(self._listing_dir, key)
+        if cached is None:
+            entries = node.get_entries_info()
+            changes = get_changes(repos, [info[4] for info in entries],
+                                  self.log)
+            self._write_cache(self._listing_dir, key, (node.rev, entries,
+                dict((rev, (c.message, c.author, to_utimestamp(c.date)))
+                     for rev, c in changes.iteritems())))
+            # Check the size of the cache on the first write and then
+            # every 100 writes
+            if self._listing_writes % 100 == 0:
+                self._start_pruning(self._listing_dir,
+                                    self.listing_cache_size)
+            self._listing_writes += 1
+            return entries, changes
+        cached_rev, entries, changes = cached
+        return ([info[:3] + (node.rev,) + info[4:]
+                 if info[3] == cached_rev else info
+                 for info in entries],
+                dict((rev, Changeset(repos, rev, message, author,
+                                     from_utimestamp(ts)))
+                     for rev, (message, author, ts) in changes.iteritems()))
+
+    def _get_annotations(self, repos, node):
+        """Return the revision in which each line of the file `node` was
+        last changed, from the blame cache if possible."""
+        if not self._blame_dir:
+            return self._compute_annotations(node)
+        key = (repos.name, repos.reponame, node.path, node.created_rev)
+        annotations = self._read_cache(self._blame_dir, key)
+        if annotations is None:
+            if repos.has_linear_changesets:
+                annotations = self._update_annotations(repos, node)
+            if annotations is None:
+                annotations = self._compute_annotations(node)
+            self._write_cache(self._blame_dir, key, annotations)
+        return annotations
+
+    def _update_annotations(self, repos, node):
+        """Derive the annotations of `node` from the cached annotations
+        of its previous version, or return `None` if they're not in the
+        cache."""
+        previous = node.get_previous()
+        if not previous:
+            return None
+        prev_path, prev_rev, chg = previous
+        prev_annotations = self._read_cache(self._blame_dir,
+                                            (repos.name, repos.reponame,
+                                             prev_path, prev_rev))
+        if prev_annotations is None:
+            return None
+        def get_lines(node):
+            lines = node.get_content().read().split('\n')
+            if lines[-1] == '':
+                del lines[-1]
+            return lines
+        prev_lines = get_lines(repos.get_node(prev_path, prev_rev))
+        if len(prev_lines) != len(prev_annotations):
+            return None
+        annotations = []
+        matcher = SequenceMatcher()
+        matcher.autojunk = False    # keep the frequent lines (Python 2.7.1)
+        matcher.set_seqs(prev_lines, get_lines(node))
+        for op, i1, i2, j1, j2 in matcher.get_opcodes():
+            if op == 'equal':
+                annotations.extend(prev_annotations[i1:i2])
+            else:
+                annotations.extend([node.created_rev] * (j2 - j1))
+        return annotations
+
+    def _compute_annotations(self, node):
+        if not self._blame_slots.acquire(False):
+            raise TracError(_("Too many files are being annotated at the "
+                              "moment, please try again later."))
+        try:
+            return node.get_annotations()
+        finally:
+            self._blame_slots.release()
+
+    def _read_cache(self, cache_dir, key):
+        """Return the value saved for `key` in `cache_dir`, or `None`."""
+        key = repr(key)
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        digest = sha1(key).hexdigest()
+        path = os.path.join(cache_dir, digest[:2], digest)
+        try:
+            with open(path, 'rb') as f:
+                cached_key, value = cPickle.load(f)
+            if cached_key == key:
+                # Keep track of the last use for pruning the cache
+                os.utime(path, None)
+                return value
+        except (IOError, OSError, EOFError, cPickle.UnpicklingError,
+                ValueError), e:
+            if os.path.exists(path):
+                self.log.warning("Can't read cache file %s: %s",
+                                 path, exception_to_unicode(e))
+
+    def _write_cache(self, cache_dir, key, value):
+        """Save `value` for `key` in `cache_dir`."""
+        key = repr(key)
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        digest = sha1(key).hexdigest()
+        path = os.path.join(cache_dir, digest[:2], digest)
+        try:
+            dir = os.path.dirname(path)
+            if not os.path.isdir(dir):
+                os.makedirs(dir)
+            f = AtomicFile(path, 'wb')
+            try:
+                cPickle.dump((key, value), f, cPickle.HIGHEST_PROTOCOL)
+            except:
+                f.rollback()
+                raise
+            f.commit()
+        except (IOError, OSError), e:
+            self.log.warning("Can't write cache file %s: %s",
+                             path, exception_to_unicode(e))
+
+    def _start_pruning(self, cache_dir, max_files):
+        """Prune `cache_dir` in a background thread, so that the request
+        doesn't wait for it, unless it's already being pruned."""
+        with self._prune_lock:
+            if self._prune_thread is not None and \
+                    self._prune_thread.isAlive():
+                return
+            thread = threading.Thread(target=self._prune_cache,
+                                      args=(cache_dir, max_files),
+                                      name='Cache pruning')
+            thread.setDaemon(True)
+            thread.start()
+            self._prune_thread = thread
+
+    def _prune_cache(self, cache_dir, max_files):
+        """Remove the least recently used files of `cache_dir` so that at
+        most `max_files` remain."""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(cache_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass # removed in the meantime
+        if len(files) <= max_files:
+            return
+        files.sort()
+        for mtime, path in files[:len(files) - max(0, max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.log.debug("Removed %d files from %s",
+                       len(files) - max(0, max_files), cache_dir)
+
     def _iter_nodes(self, node):
         stack = [node]
         while stack:
@@ -649,6 +887,20 @@ class BrowserModule(Component):
     def _render_file(self, req, context, repos, node, rev=None):
         req.perm(node.resource).require('FILE_VIEW')
 
+        format = req.args.get('format')
+        if format in ('raw', 'txt'):
+            # The content of a node at a given revision never changes
+            req.check_etag('"%s"' % sha1(repr((
+                repos.name, sorted(repos.params.items()), node.path,
+                node.created_rev, format, self.render_unsafe_content)))
+                .hexdigest())
+        else:
+            req.check_modified(node.last_modified, [
+                repos.name, node.path, node.created_rev, rev,
+                repos.youngest_rev, req.query_string,
+                WikiSystem(self.env).get_change_stamp(),
+                pretty_timedelta(node.last_modified)])
+
         mimeview = Mimeview(self.env)
 
         # MIME type detection
@@ -660,7 +912,6 @@ class BrowserModule(Component):
                         mime_type or 'text/plain'
 
         # Eventually send the file directly
-        format = req.args.get('format')
         if format in ('raw', 'txt'):
             req.send_response(200)
             req.send_header('Content-Type',
@@ -670,6 +921,12 @@ class BrowserModule(Component):
                 req.send_header('Pragma', 'no-cache')
                 req.send_header('Cache-Control', 'no-cache')
                 req.send_header('Expires', 'Fri, 01 Jan 1999 00:00:00 GMT')
+            elif unicode(rev) == req.args.get('rev'):
+                # An explicit revision designates immutable content, which
+                # can be kept by the browser (but not by shared caches, as
+                # the permissions may differ between users)
+                req.send_header('Cache-Control', 'private, max-age=%d'
+                                                 % (365 * 24 * 3600))
             if not self.render_unsafe_content:
                 # Force browser to download files instead of rendering
                 # them, since they might contain malicious code enabling
@@ -974,7 +1231,8 @@ class BlameAnnotator(object):
         node = self.repos.get_node(self.path, rev)
         # FIXME: get_annotations() should be in the Resource API
         # -- get revision numbers for each line
-        self.annotations = node.get_annotations()
+        browser = BrowserModule(self.env)
+        self.annotations = browser._get_annotations(self.repos, node)
         # -- from the annotations, retrieve changesets and
         # determine the span of dates covered, for the color code.
         # Note: changesets[i].rev can differ from annotations[i]
@@ -998,7 +1256,6 @@ class BlameAnnotator(object):
         for path, rev, chg in node.get_history():
             self.paths[rev] = path
         # -- get custom colorize function
-        browser = BrowserModule(self.env)
         self.colorize_age = browser.get_custom_colorizer()
 
     def annotate(self, row, lineno):
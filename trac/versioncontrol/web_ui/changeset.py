@@ -21,7 +21,7 @@
 from __future__ import with_statement
 
 from functools import partial
-from itertools import groupby
+from itertools import groupby, islice
 import os
 import posixpath
 import re
@@ -43,6 +43,8 @@ from trac.util.text import exception_to_unicode, to_unicode, \
 from trac.util.translation import _, ngettext
 from trac.versioncontrol.api import RepositoryManager, Changeset, Node, \
                                     NoSuchChangeset
+from trac.versioncontrol.cache import CachedRepository, \
+                                     get_cached_changesets
 from trac.versioncontrol.diff import get_diff_options, diff_blocks, \
                                      unified_diff
 from trac.versioncontrol.web_ui.browser import BrowserModule
@@ -874,9 +876,13 @@ class ChangesetModule(Component):
             else:
                 collapse_changesets = lambda c: c.rev
 
+            # No repository needs to contribute more events than the
+            # timeline displays
+            maxrows = getattr(req, 'timeline_max_events', 0)
+
             uids_seen = {}
-            def generate_changesets(repos):
-                for _, changesets in groupby(repos.get_changesets(start, stop),
+            def generate_changesets(repos, changesets):
+                for _, changesets in groupby(changesets,
                                              key=collapse_changesets):
                     viewable_changesets = []
                     for cset in changesets:
@@ -900,16 +906,31 @@ class ChangesetModule(Component):
                                 show_location, show_files))
 
             rm = RepositoryManager(self.env)
-            for repos in sorted(rm.get_real_repositories(),
-                                key=lambda repos: repos.reponame):
-                if all_repos or ('repo-' + repos.reponame) in repo_filters:
-                    try:
-                        for event in generate_changesets(repos):
-                            yield event
-                    except TracError, e:
-                        self.log.error("Timeline event provider for repository"
-                                       " '%s' failed: %r",
-                                       repos.reponame, exception_to_unicode(e))
+            repositories = [repos for repos
+                            in sorted(rm.get_real_repositories(),
+                                      key=lambda repos: repos.reponame)
+                            if all_repos or
+                               ('repo-' + repos.reponame) in repo_filters]
+            # Retrieve the changesets of the cached repositories from
+            # the `revision` table, `maxrows` at a time
+            cached_changesets = get_cached_changesets(
+                self.env, [repos for repos in repositories
+                           if isinstance(repos, CachedRepository)],
+                start, stop, maxrows or None)
+            for repos in repositories:
+                try:
+                    changesets = cached_changesets.get(repos)
+                    if changesets is None:
+                        changesets = repos.get_changesets(start, stop)
+                    events = generate_changesets(repos, changesets)
+                    if maxrows:
+                        events = islice(events, maxrows)
+                    for event in events:
+                        yield event
+                except TracError, e:
+                    self.log.error("Timeline event provider for repository"
+                                   " '%s' failed: %r",
+                                   repos.reponame, exception_to_unicode(e))
 
     def render_timeline_event(self, context, field, event):
         changesets, show_location, show_files = event[3]
@@ -1015,24 +1036,75 @@ class ChangesetModule(Component):
 
     CHANGESET_ID = r"(?:[0-9]+|[a-fA-F0-9]{8,})" # only "long enough" hexa ids
 
+    _changeset_link_re = (
+        # [...] form: start with optional intertrac: [T... or [trac ...
+        r"!?\[(?P<it_changeset>%s\s*)" % WikiParser.INTERTRAC_SCHEME +
+        # hex digits + optional /path for the restricted changeset
+        # + optional query and fragment
+        r"%s(?:/[^\]]*)?(?:\?[^\]]*)?(?:#[^\]]*)?\]|" % CHANGESET_ID +
+        # r... form: allow r1 but not r1:2 (handled by the log syntax)
+        r"(?:\b|!)r[0-9]+\b(?!:[0-9])(?:/[a-zA-Z0-9_/+-]+)?")
+
     def get_wiki_syntax(self):
         yield (
-            # [...] form: start with optional intertrac: [T... or [trac ...
-            r"!?\[(?P<it_changeset>%s\s*)" % WikiParser.INTERTRAC_SCHEME +
-            # hex digits + optional /path for the restricted changeset
-            # + optional query and fragment
-            r"%s(?:/[^\]]*)?(?:\?[^\]]*)?(?:#[^\]]*)?\]|" % self.CHANGESET_ID +
-            # r... form: allow r1 but not r1:2 (handled by the log syntax)
-            r"(?:\b|!)r[0-9]+\b(?!:[0-9])(?:/[a-zA-Z0-9_/+-]+)?",
+            self._changeset_link_re,
             lambda x, y, z:
             self._format_changeset_link(x, 'changeset',
                                         y[1:] if y[0] == 'r' else y[1:-1],
                                         y, z))
 
+    def get_link_shorthands(self):
+        yield (self._changeset_link_re,
+               lambda y, z: None if z.group('it_changeset') else
+                            ('changeset', y[1:] if y[0] == 'r' else y[1:-1]))
+
     def get_link_resolvers(self):
         yield ('changeset', self._format_changeset_link)
         yield ('diff', self._format_diff_link)
 
+    def get_link_prefetchers(self):
+        yield ('changeset', self._prefetch_changeset_links)
+
+    def _prefetch_changeset_links(self, formatter, ns, targets):
+        """Retrieve the changesets of cached repositories in bulk."""
+        rm = RepositoryManager(self.env)
+        prefetched = formatter.prefetched('changeset')
+        revs = {}
+        for target in targets:
+            chgset = formatter.split_link(target)[0]
+            sep = chgset.find('/')
+            if sep > 0:
+                rev, path = chgset[:sep], chgset[sep:]
+            else:
+                rev, path = chgset, '/'
+            try:
+                reponame, repos, path = rm.get_repository_by_path(path)
+                if not reponame:
+                    reponame = rm.get_default_repository(formatter.context)
+                    if reponame is not None:
+                        repos = rm.get_repository(reponame)
+                if not isinstance(repos, CachedRepository) or \
+                        (repos.reponame, rev) in prefetched:
+                    continue
+                db_rev = repos.db_rev(repos.normalize_rev(rev))
+            except TracError:
+                continue
+            revs.setdefault(repos, {}).setdefault(db_rev, []).append(rev)
+        for repos, repos_revs in revs.iteritems():
+            db_revs = sorted(repos_revs)
+            for idx in xrange(0, len(db_revs), 100):
+                chunk = db_revs[idx:idx + 100]
+                for db_rev, time, author, message in self.env.db_query("""
+                        SELECT rev, time, author, message FROM revision
+                        WHERE repos=%%s AND rev IN (%s)
+                        """ % ','.join(['%s'] * len(chunk)),
+                        [repos.id] + chunk):
+                    changeset = Changeset(repos, repos.rev_db(db_rev),
+                                          message, author,
+                                          from_utimestamp(time))
+                    for rev in repos_revs[db_rev]:
+                        prefetched[(repos.reponame, rev)] = changeset
+
     def _format_changeset_link(self, formatter, ns, chgset, label,
                                fullmatch=None):
         intertrac = formatter.shorthand_intertrac_helper(ns, chgset, label,
@@ -1059,7 +1131,10 @@ class ChangesetModule(Component):
 
             # rendering changeset link
             if repos:
-                changeset = repos.get_changeset(rev)
+                changeset = formatter.prefetched('changeset') \
+                                     .get((repos.reponame, rev))
+                if changeset is None:
+                    changeset = repos.get_changeset(rev)
                 if changeset.is_viewable(formatter.perm):
                     href = formatter.href.changeset(rev,
                                                     repos.reponame or None,
@@ -30,6 +30,7 @@ from trac.util.text import to_unicode, wrap
 from trac.util.translation import _
 from trac.versioncontrol.api import (RepositoryManager, Changeset,
                                      NoSuchChangeset)
+from trac.versioncontrol.cache import CachedRepository
 from trac.versioncontrol.web_ui.changeset import ChangesetModule
 from trac.versioncontrol.web_ui.util import *
 from trac.web import IRequestHandler
@@ -120,6 +121,14 @@ class LogModule(Component):
         #   `Repository.get_path_history()`
         cset_resource = repos.resource.child('changeset')
         show_graph = False
+
+        def get_node_history(path, rev, limit=None):
+            node = get_existing_node(req, repos, path, rev)
+            if isinstance(repos, CachedRepository) and \
+                    repos.has_linear_changesets:
+                return repos.get_node_history(node.path, node.rev, limit)
+            return node.get_history(limit)
+
         if mode == 'path_history':
             def history():
                 for h in repos.get_path_history(path, rev):
@@ -135,8 +144,7 @@ class LogModule(Component):
                     a = repos.normalize_rev(a)
                     b = repos.normalize_rev(b)
                     while not repos.rev_older_than(b, a):
-                        node = get_existing_node(req, repos, prevpath, b)
-                        node_history = list(node.get_history(2))
+                        node_history = list(get_node_history(prevpath, b, 2))
                         p, rev, chg = node_history[0]
                         if repos.rev_older_than(rev, a):
                             break # simply skip, no separator
@@ -160,8 +168,7 @@ class LogModule(Component):
             show_graph = path == '/' and not verbose \
                          and not repos.has_linear_changesets
             def history():
-                node = get_existing_node(req, repos, path, rev)
-                for h in node.get_history():
+                for h in get_node_history(path, rev):
                     if 'CHANGESET_VIEW' in req.perm(cset_resource(id=h[1])):
                         yield h
 
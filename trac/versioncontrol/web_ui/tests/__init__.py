@@ -13,10 +13,12 @@
 
 import unittest
 
-from trac.versioncontrol.web_ui.tests import wikisyntax
+from trac.versioncontrol.web_ui.tests import browser, changeset, wikisyntax
 
 def suite():
     suite = unittest.TestSuite()
+    suite.addTest(browser.suite())
+    suite.addTest(changeset.suite())
     suite.addTest(wikisyntax.suite())
     return suite
 
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Edgewall Software
+# All rights reserved.
+#
+# This software is licensed as described in the file COPYING, which
+# you should have received as part of this distribution. The terms
+# are also available at http://trac.edgewall.com/license.html.
+#
+# This software consists of voluntary contributions made by many
+# individuals. For the exact contribution history, see the revision
+# history and logs, available at http://trac.edgewall.org/.
+
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
+import unittest
+from datetime import datetime
+
+from trac.core import TracError
+from trac.test import EnvironmentStub, Mock
+from trac.util.datefmt import utc
+from trac.versioncontrol.api import Changeset, Node
+from trac.versioncontrol.web_ui.browser import BrowserModule
+
+
+class ListingCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.env = EnvironmentStub()
+        self.cache_dir = tempfile.mkdtemp()
+        self.env.config.set('browser', 'listing_cache_dir', self.cache_dir)
+        self.browser = BrowserModule(self.env)
+        self.repos = Mock(name='svn:1234:/var/svn', reponame='',
+                          get_changeset=self._changeset)
+        self.calls = []
+        self.changesets = []
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _changeset(self, rev):
+        self.changesets.append(rev)
+        return Changeset(self.repos, rev, 'Change %d' % rev, 'joe',
+                         datetime(2014, 1, rev, tzinfo=utc))
+
+    def _node(self, path, rev, created_rev, entries):
+        def get_entries_info():
+            self.calls.append((path, rev))
+            return entries
+        return Mock(path=path, rev=rev, created_rev=created_rev,
+                    get_entries_info=get_entries_info)
+
+    def _entries(self, rev):
+        return [(u'file.txt', u'trunk/file.txt', Node.FILE, rev, 20, 12),
+                (u'sub', u'trunk/sub', Node.DIRECTORY, rev, 21, None)]
+
+    def _get_entries_info(self, node):
+        entries, changes = self.browser._get_listing(self.repos, node)
+        self.assertEqual(set(info[4] for info in entries), set(changes))
+        for rev, changeset in changes.iteritems():
+            self.assertEqual(rev, changeset.rev)
+            self.assertEqual('Change %d' % rev, changeset.message)
+            self.assertEqual('joe', changeset.author)
+            self.assertEqual(datetime(2014, 1, rev, tzinfo=utc),
+                             changeset.date)
+        return entries
+
+    def _set_mtimes(self, mtime):
+        """Set the modification time of the files written since the
+        previous call."""
+        for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if os.path.getmtime(path) > 100000:
+                    os.utime(path, (mtime, mtime))
+
+    def test_listing_cached(self):
+        node = self._node(u'trunk', 42, 41, self._entries(42))
+        self.assertEqual(self._entries(42), self._get_entries_info(node))
+        self.assertEqual(self._entries(42), self._get_entries_info(node))
+        # Same listing at a later revision without changes below trunk
+        node = self._node(u'trunk', 43, 41, self._entries(43))
+        self.assertEqual(self._entries(43), self._get_entries_info(node))
+        self.assertEqual([(u'trunk', 42)], self.calls)
+        self.assertEqual([20, 21], sorted(self.changesets))
+        self.assertEqual(['listing'], os.listdir(self.cache_dir))
+        self.assertEqual(1, len(os.listdir(os.path.join(self.cache_dir,
+                                                        'listing'))))
+
+    def test_listing_per_change(self):
+        self._get_entries_info(self._node(u'trunk', 42, 41, []))
+        self._get_entries_info(self._node(u'trunk', 43, 43, []))
+        self.assertEqual([(u'trunk', 42), (u'trunk', 43)], self.calls)
+
+    def test_listing_cache_pruned(self):
+        self.env.config.set('browser', 'listing_cache_size', 2)
+        # Annotations in the same directory are left alone
+        self.env.config.set('browser', 'blame_cache_dir', self.cache_dir)
+        self.browser._write_cache(self.browser._blame_dir, 'blame', [1])
+        for rev, mtime in [(1, 1000), (2, 3000), (3, 2000)]:
+            self._get_entries_info(self._node(u'trunk', rev, rev, []))
+            self._set_mtimes(mtime)
+        self.browser._prune_thread.join()
+        # Force the size check on the next write
+        self.browser._listing_writes = 0
+        self._get_entries_info(self._node(u'trunk', 4, 4, []))
+        self.browser._prune_thread.join()
+        del self.calls[:]
+        for rev in (1, 2, 3, 4):
+            self._get_entries_info(self._node(u'trunk', rev, rev, []))
+        self.assertEqual([(u'trunk', 1), (u'trunk', 3)], self.calls)
+        self.assertEqual([1], self.browser._read_cache(
+            self.browser._blame_dir, 'blame'))
+
+    def test_listing_cache_disabled(self):
+        self.env.config.set('browser', 'listing_cache_dir', '')
+        node = self._node(u'trunk', 42, 41, self._entries(42))
+        self._get_entries_info(node)
+        self._get_entries_info(node)
+        self.assertEqual([(u'trunk', 42), (u'trunk', 42)], self.calls)
+        self.assertEqual([20, 20, 21, 21], sorted(self.changesets))
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+
+class BlameCacheTestCase(unittest.TestCase):
+
+    contents = {1: 'a\nb\nc\n', 2: 'a\nB\nc\nd\n', 3: 'z\na\nB\nd\n'}
+
+    def setUp(self):
+        self.env = EnvironmentStub()
+        self.cache_dir = tempfile.mkdtemp()
+        self.env.config.set('browser', 'blame_cache_dir', self.cache_dir)
+        self.browser = BrowserModule(self.env)
+        self.blamed = []
+        self.repos = Mock(name='svn:1234:/var/svn', reponame='',
+                          has_linear_changesets=True,
+                          get_node=lambda path, rev: self._node(path, rev))
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _node(self, path, rev):
+        full = {1: [1, 1, 1], 2: [1, 2, 1, 2], 3: [3, 1, 2, 2]}
+        history = [(path, 3, Changeset.EDIT), (path, 2, Changeset.EDIT),
+                   (path, 1, Changeset.ADD)]
+        test = self
+
+        class TestNode(Node):
+            created_rev = rev
+            def get_annotations(self):
+                test.blamed.append(rev)
+                return full[rev]
+            def get_content(self):
+                return StringIO(test.contents[rev])
+            def get_history(self, limit=None):
+                entries = [h for h in history if h[1] <= rev]
+                return iter(entries[:limit])
+
+        return TestNode(self.repos, path, rev, Node.FILE)
+
+    def _annotations(self, rev):
+        return self.browser._get_annotations(self.repos,
+                                             self._node(u'trunk/f', rev))
+
+    def test_annotations_cached(self):
+        self.assertEqual([1, 2, 1, 2], self._annotations(2))
+        self.assertEqual([1, 2, 1, 2], self._annotations(2))
+        self.assertEqual([2], self.blamed)
+
+    def test_annotations_from_previous(self):
+        # r1 adds the file, r2 and r3 edit it: only r1 is blamed in the
+        # repository, r2 and r3 are derived from the cached annotations
+        self.assertEqual([1, 1, 1], self._annotations(1))
+        self.assertEqual([1, 2, 1, 2], self._annotations(2))
+        self.assertEqual([3, 1, 2, 2], self._annotations(3))
+        self.assertEqual([1], self.blamed)
+
+    def test_annotations_previous_not_cached(self):
+        self.assertEqual([1, 2, 1, 2], self._annotations(2))
+        self.assertEqual([2], self.blamed)
+
+    def test_annotations_not_linear(self):
+        self.repos.has_linear_changesets = False
+        self._annotations(1)
+        self._annotations(2)
+        self.assertEqual([1, 2], self.blamed)
+
+    def test_concurrent_annotations_limited(self):
+        self.env.config.set('browser', 'blame_cache_dir', '')
+        self.browser._blame_slots.acquire()
+        self.browser._blame_slots.acquire()
+        try:
+            self.assertRaises(TracError, self._annotations, 1)
+        finally:
+            self.browser._blame_slots.release()
+        self.assertEqual([1, 1, 1], self._annotations(1))
+        self.browser._blame_slots.release()
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(ListingCacheTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(BlameCacheTestCase, 'test'))
+    return suite
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
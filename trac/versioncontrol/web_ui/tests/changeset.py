@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Edgewall Software
+# All rights reserved.
+#
+# This software is licensed as described in the file COPYING, which
+# you should have received as part of this distribution. The terms
+# are also available at http://trac.edgewall.com/license.html.
+#
+# This software consists of voluntary contributions made by many
+# individuals. For the exact contribution history, see the revision
+# history and logs, available at http://trac.edgewall.org/.
+
+from datetime import datetime
+from StringIO import StringIO
+import unittest
+
+from trac.test import EnvironmentStub, Mock, MockPerm
+from trac.util.datefmt import to_utimestamp, utc
+from trac.versioncontrol.api import NoSuchChangeset, Repository, \
+                                    RepositoryManager
+from trac.versioncontrol.cache import CachedRepository
+from trac.versioncontrol.web_ui.changeset import ChangesetModule
+from trac.web.chrome import web_context
+from trac.web.href import Href
+from trac.wiki.formatter import Formatter
+
+
+class ChangesetLinksTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.env = EnvironmentStub(enable=['trac.*'])
+        t = to_utimestamp(datetime(2014, 1, 1, tzinfo=utc))
+        with self.env.db_transaction as db:
+            db.executemany("""
+                INSERT INTO repository (id, name, value) VALUES (%s,%s,%s)
+                """, [(1, 'name', ''), (1, 'youngest_rev', '2')])
+            db.executemany("""
+                INSERT INTO revision (repos, rev, time, author, message)
+                VALUES (1,%s,%s,%s,%s)
+                """, [('1', t, 'joe', 'First'), ('2', t, 'jane', 'Second')])
+        def get_changeset(rev):
+            raise NoSuchChangeset(rev)
+        repos = Mock(Repository, '', {'name': '', 'id': 1}, self.env.log,
+                     get_changeset=get_changeset,
+                     get_youngest_rev=lambda: 2)
+        self.repos = CachedRepository(self.env, repos, self.env.log)
+        rm = RepositoryManager(self.env)
+        rm.get_repository_by_path = lambda path: ('', self.repos, path)
+        rm.get_repository = lambda reponame: self.repos
+
+    def tearDown(self):
+        self.env.reset_db()
+
+    def test_prefetch_changeset_links(self):
+        ChangesetModule(self.env)
+        req = Mock(href=Href('/trac.cgi'), perm=MockPerm(),
+                   authname='anonymous')
+        formatter = Formatter(self.env, web_context(req, 'wiki', 'WikiStart'))
+        out = StringIO()
+        formatter.format("r1, [2], changeset:1, !r3\n"
+                         "{{{\nr2\n}}}\n", out)
+
+        prefetched = formatter.prefetched('changeset')
+        self.assertEqual([('', '1'), ('', '2')], sorted(prefetched))
+        self.assertEqual('First', prefetched[('', '1')].message)
+        self.assertEqual('Second', prefetched[('', '2')].message)
+        html = out.getvalue()
+        self.assertIn('href="/trac.cgi/changeset/1"', html)
+        self.assertIn('title="Second"', html)
+
+
+def suite():
+    return unittest.makeSuite(ChangesetLinksTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
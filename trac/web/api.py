@@ -24,15 +24,17 @@ import new
 import mimetypes
 import os
 import re
+import shutil
 import socket
 from StringIO import StringIO
 import sys
+import tempfile
 import urlparse
 
 from trac.core import Interface, TracError
 from trac.util import get_last_traceback, unquote
 from trac.util.datefmt import http_date, localtz
-from trac.util.text import empty, to_unicode
+from trac.util.text import empty, pretty_size, to_unicode
 from trac.util.translation import _
 from trac.web.href import Href
 from trac.web.wsgi import _FileWrapper
@@ -166,9 +168,93 @@ for code in [code for code in HTTP_STATUS if code >= 400]:
 del code, exc_name
 
 
+class _UploadFile(object):
+    """Temporary file receiving the content of an uploaded file.
+
+    The file is created in `dir` and writing more than `max_size` bytes
+    to it raises a `HTTPRequestEntityTooLarge` error, so that oversized
+    uploads are rejected while they are being received. The file is
+    removed when closed, unless it has been moved with `move_to`.
+
+    :since: 1.1.2
+    """
+
+    file = name = None
+
+    def __init__(self, dir=None, max_size=None):
+        fd, self.name = tempfile.mkstemp(prefix='upload-', dir=dir)
+        self.file = os.fdopen(fd, 'w+b')
+        self.max_size = max_size
+        self.size = 0
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __del__(self):
+        self.close()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise HTTPRequestEntityTooLarge(
+                _("Maximum upload size: %(num)s",
+                  num=pretty_size(self.max_size)))
+        self.file.write(data)
+
+    def move_to(self, path):
+        """Move the file to `path` instead of copying its content. An
+        existing file at `path` is replaced and its mode is preserved.
+
+        Return `False` if the file can't be renamed, e.g. when `path` is
+        on another filesystem, in which case the caller has to copy it.
+        """
+        if self.name is None:
+            return False
+        self.file.flush()
+        try:
+            if os.path.exists(path):
+                shutil.copymode(path, self.name)
+            os.rename(self.name, path)
+        except OSError:
+            return False
+        self.name = None
+        return True
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if self.name is not None:
+            try:
+                os.remove(self.name)
+            except OSError:
+                pass
+            self.name = None
+
+
 class _FieldStorage(cgi.FieldStorage):
     """Our own version of cgi.FieldStorage, with tweaks."""
 
+    def __init__(self, fp=None, headers=None, outerboundary='',
+                 environ=os.environ, *args, **kwargs):
+        # The environment is needed by `make_file`, which is called while
+        # the base class constructor parses the input
+        self.environ = environ
+        cgi.FieldStorage.__init__(self, fp, headers, outerboundary, environ,
+                                  *args, **kwargs)
+
+    def make_file(self, binary=None):
+        """Spool uploaded files in the `trac.upload_dir` directory, if
+        set, and enforce the `trac.upload_max_size` limit while the
+        content is received.
+        """
+        if self.filename is None:
+            return cgi.FieldStorage.make_file(self, binary)
+        upload_dir = self.environ.get('trac.upload_dir')
+        if upload_dir and not os.path.isdir(upload_dir):
+            upload_dir = None
+        return _UploadFile(upload_dir,
+                           self.environ.get('trac.upload_max_size'))
+
     def read_multi(self, *args, **kwargs):
         try:
             cgi.FieldStorage.read_multi(self, *args, **kwargs)
@@ -240,6 +326,11 @@ def arg_list_to_args(arg_list):
     return args
 
 
+def _weak_etag(etag):
+    """Return the opaque part of an entity tag, for weak comparison."""
+    return etag[2:] if etag.startswith('W/') else etag
+
+
 class RequestDone(Exception):
     """Marker exception that indicates whether request processing has completed
     and a response was sent.
@@ -438,6 +529,11 @@ class Request(object):
         That `extra` parameter can also be a list, in which case the MD5 sum
         of the list content will be used.
 
+        The entity tag also covers the `etag_variant` of the request, if
+        the dispatcher provides one: a digest of what the rendering of
+        any page depends upon besides the resource itself, like the
+        user permissions and session preferences (''since 1.1.2'').
+
         If the generated tag matches the "If-None-Match" header of the request,
         this method sends a "304 Not Modified" response to the client.
         Otherwise, it adds the entity tag as an "ETag" header to the response
@@ -448,15 +544,33 @@ class Request(object):
             for elt in extra:
                 m.update(repr(elt))
             extra = m.hexdigest()
-        etag = 'W/"%s/%s/%s"' % (self.authname, http_date(datetime), extra)
+        variant = self.etag_variant if 'etag_variant' in self.callbacks \
+                  else ''
+        m = md5()
+        m.update(repr((self.authname, http_date(datetime), extra, variant)))
+        self.check_etag('W/"%s"' % m.hexdigest())
+
+    def check_etag(self, etag):
+        """Check the request "If-None-Match" header against the given
+        entity tag.
+
+        If it matches, using the weak comparison, a "304 Not Modified"
+        response is sent to the client. Otherwise, the entity tag is
+        added as an "ETag" header to the response.
+
+        :since: 1.1.2
+        """
         inm = self.get_header('If-None-Match')
-        if (not inm or inm != etag):
-            self.send_header('ETag', etag)
-        else:
+        if inm and self.method in ('GET', 'HEAD') and \
+                (inm.strip() == '*' or
+                 _weak_etag(etag) in [_weak_etag(tag.strip())
+                                      for tag in inm.split(',')]):
             self.send_response(304)
+            self.send_header('ETag', etag)
             self.send_header('Content-Length', 0)
             self.end_headers()
             raise RequestDone
+        self.send_header('ETag', etag)
 
     def redirect(self, url, permanent=False):
         """Send a redirect to the client, forwarding to the specified URL.
@@ -601,11 +715,10 @@ class Request(object):
         """Read the specified number of bytes from the request body."""
         fileobj = self.environ['wsgi.input']
         if size is None:
-            size = self.get_header('Content-Length')
-            if size is None:
+            try:
+                size = int(self.get_header('Content-Length'))
+            except (TypeError, ValueError):
                 size = -1
-            else:
-                size = int(size)
         data = fileobj.read(size)
         return data
 
@@ -644,20 +757,35 @@ class Request(object):
         """Parse the supplied request parameters into a list of
         `(name, value)` tuples.
         """
-        fp = self.environ['wsgi.input']
-
-        # Avoid letting cgi.FieldStorage consume the input stream when the
-        # request does not contain form data
         ctype = self.get_header('Content-Type')
         if ctype:
             ctype, options = cgi.parse_header(ctype)
-        if ctype not in ('application/x-www-form-urlencoded',
-                         'multipart/form-data'):
-            fp = StringIO('')
+
+        # Only multipart requests need cgi.FieldStorage, other requests are
+        # parsed directly from the query string or the request body
+        if ctype != 'multipart/form-data':
+            if self.method in ('GET', 'HEAD'):
+                qs = self.query_string
+            elif ctype == 'application/x-www-form-urlencoded':
+                qs = self.read()
+                # The query string is ignored for POST requests, like below
+                if self.method != 'POST' and self.query_string:
+                    qs = '&'.join(filter(None, (qs, self.query_string)))
+            elif ctype is None and self.method == 'POST':
+                # A POST body without a Content-Type is form data
+                qs = self.read()
+            else:
+                qs = ''
+            args = []
+            for name, value in urlparse.parse_qsl(qs,
+                                                  keep_blank_values=True):
+                args.append((name, unicode(value, 'utf-8')))
+            return args
 
         # Python 2.6 introduced a backwards incompatible change for
         # FieldStorage where QUERY_STRING is no longer ignored for POST
         # requests. We'll keep the pre 2.6 behaviour for now...
+        fp = self.environ['wsgi.input']
         if self.method == 'POST':
             qs_on_post = self.environ.pop('QUERY_STRING', '')
         fs = _FieldStorage(fp, environ=self.environ, keep_blank_values=True)
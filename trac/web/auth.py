@@ -31,6 +31,7 @@ import urlparse
 
 from genshi.builder import tag
 
+from trac.cache import cached
 from trac.config import BoolOption, IntOption, Option
 from trac.core import *
 from trac.web.api import IAuthenticator, IRequestHandler
@@ -80,6 +81,18 @@ class LoginModule(Component):
         base path of several Trac instances if you want them to share
         the cookie.  (''since 0.12'')""")
 
+    # Lifetime of the entries of the authentication cookie cache, in
+    # seconds, in case the `auth_cookie` table is modified without
+    # invalidating the cache
+    auth_cookie_cache_ttl = 60
+
+    # Interval between two purges of the old authentication cookies,
+    # in seconds
+    auth_cookie_purge_interval = 3600
+
+    def __init__(self):
+        self._last_purge = 0
+
     # IAuthenticator methods
 
     def authenticate(self, req):
@@ -130,6 +143,28 @@ class LoginModule(Component):
 
     # Internal methods
 
+    @cached
+    def _auth_cookies(self):
+        """Cache of the recently used authentication cookies, as a
+        `dict` mapping each cookie to a `(rows, time)` tuple, with
+        `rows` the list of `(name, ipnr)` tuples from the `auth_cookie`
+        table. The entries are only added on demand.
+        """
+        return {}
+
+    def _purge_cookies(self, db):
+        """Delete the cookies older than 10 days, at most once per
+        `auth_cookie_purge_interval` in this process."""
+        now = time.time()
+        if now - self._last_purge < self.auth_cookie_purge_interval:
+            return
+        self._last_purge = now
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM auth_cookie WHERE time < %s",
+                       (int(now) - 86400 * 10,))
+        if cursor.rowcount:
+            del self._auth_cookies
+
     def _do_login(self, req):
         """Log the remote user in.
 
@@ -163,9 +198,7 @@ class LoginModule(Component):
                               user=req.authname))
 
         with self.env.db_transaction as db:
-            # Delete cookies older than 10 days
-            db("DELETE FROM auth_cookie WHERE time < %s",
-               (int(time.time()) - 86400 * 10,))
+            self._purge_cookies(db)
             # Insert a new cookie if we haven't already got one
             cookie = None
             trac_auth = req.incookie.get('trac_auth')
@@ -202,12 +235,14 @@ class LoginModule(Component):
             # Not logged in
             return
 
-        if 'trac_auth' in req.incookie:
-            self.env.db_transaction("DELETE FROM auth_cookie WHERE cookie=%s",
-                                    (req.incookie['trac_auth'].value,))
-        else:
-            self.env.db_transaction("DELETE FROM auth_cookie WHERE name=%s",
-                                    (req.authname,))
+        with self.env.db_transaction as db:
+            if 'trac_auth' in req.incookie:
+                db("DELETE FROM auth_cookie WHERE cookie=%s",
+                   (req.incookie['trac_auth'].value,))
+            else:
+                db("DELETE FROM auth_cookie WHERE name=%s", (req.authname,))
+            # Drop the cached cookies in all processes
+            del self._auth_cookies
         self._expire_cookie(req)
         custom_redirect = self.config['metanav'].get('logout.redirect')
         if custom_redirect:
@@ -231,14 +266,20 @@ class LoginModule(Component):
     def _cookie_to_name(self, req, cookie):
         # This is separated from _get_name_for_cookie(), because the
         # latter is overridden in AccountManager.
-        if self.check_ip:
-            sql = "SELECT name FROM auth_cookie WHERE cookie=%s AND ipnr=%s"
-            args = (cookie.value, req.remote_addr)
-        else:
-            sql = "SELECT name FROM auth_cookie WHERE cookie=%s"
-            args = (cookie.value,)
-        for name, in self.env.db_query(sql, args):
-            return name
+        auth_cookies = self._auth_cookies
+        now = time.time()
+        entry = auth_cookies.get(cookie.value)
+        if entry is None or entry[1] < now - self.auth_cookie_cache_ttl:
+            rows = self.env.db_query("""
+                SELECT name, ipnr FROM auth_cookie WHERE cookie=%s
+                """, (cookie.value,))
+            if not rows:
+                auth_cookies.pop(cookie.value, None)
+                return None
+            entry = auth_cookies[cookie.value] = (rows, now)
+        for name, ipnr in entry[0]:
+            if not self.check_ip or ipnr == req.remote_addr:
+                return name
 
     def _get_name_for_cookie(self, req, cookie):
         name = self._cookie_to_name(req, cookie)
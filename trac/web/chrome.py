@@ -25,11 +25,14 @@ from __future__ import with_statement
 
 import datetime
 from functools import partial
+import gzip
 import itertools
 import os.path
+import posixpath
 import pkg_resources
 import pprint
 import re
+from shutil import copy2
 try:
     from cStringIO import StringIO
 except ImportError:
@@ -49,7 +52,8 @@ from trac.env import IEnvironmentSetupParticipant, ISystemInfoProvider
 from trac.mimeview.api import RenderingContext, get_mimetype
 from trac.resource import *
 from trac.util import compat, get_reporter_id, html, presentation, \
-                      get_pkginfo, pathjoin, translation
+                      get_pkginfo, pathjoin, sha1, translation
+from trac.util.concurrency import threading
 from trac.util.html import escape, plaintext
 from trac.util.text import pretty_size, obfuscate_email_address, \
                            shorten_line, unicode_quote_plus, to_unicode, \
@@ -310,13 +314,31 @@ def _chrome_resource_path(req, filename):
     """
     if filename.startswith(('http://', 'https://', '//')):
         return filename
-    elif filename.startswith('common/') and 'htdocs_location' in req.chrome:
+    elif filename.startswith('/'):
+        return req.href(filename)
+    fingerprint = req.chrome.get('fingerprint')
+    if fingerprint:
+        filename = fingerprint(filename)
+    if filename.startswith('common/') and 'htdocs_location' in req.chrome:
         return Href(req.chrome['htdocs_location'])(filename[7:])
     else:
-        href = req.href
-        if not filename.startswith('/'):
-            href = href.chrome
-        return href(filename)
+        return req.href.chrome(filename)
+
+
+_fingerprint_re = re.compile(r'\.([0-9a-f]{10})((?:\.[^./]*)?)$')
+
+_compressible_exts = ('.css', '.html', '.js', '.json', '.svg', '.txt', '.xml')
+
+def _get_fingerprint(path):
+    """Return the fingerprint of the file at `path`, i.e. the beginning
+    of the SHA-1 digest of its content."""
+    with open(path, 'rb') as f:
+        return sha1(f.read()).hexdigest()[:10]
+
+def _add_fingerprint(filename, fingerprint):
+    """Insert the `fingerprint` in `filename`, before its extension."""
+    base, ext = posixpath.splitext(filename)
+    return '%s.%s%s' % (base, fingerprint, ext)
 
 
 def _save_messages(req, url, permanent):
@@ -367,7 +389,13 @@ class Chrome(Component):
         (''since 1.0'')""")
 
     auto_reload = BoolOption('trac', 'auto_reload', False,
-        """Automatically reload template files after modification.""")
+        """Automatically reload template files after modification.
+
+        The modification time of a template file is then checked each
+        time the template is used. Leave it disabled in production, so
+        that the templates are parsed once per process and served from
+        memory afterwards, as long as `genshi_cache_size` is larger
+        than the number of templates in use.""")
 
     genshi_cache_size = IntOption('trac', 'genshi_cache_size', 128,
         """The maximum number of templates that the template loader will cache
@@ -465,6 +493,15 @@ class Chrome(Component):
     logo_height = IntOption('header_logo', 'height', -1,
         """Height of the header logo image in pixels.""")
 
+    htdocs_location_fingerprints = BoolOption('trac',
+        'htdocs_location_fingerprints', 'false',
+        """Whether the links to the static resources served from the
+        [#trac-section htdocs_location] URL include the fingerprint of
+        their content, like those served by Trac itself. Only enable it
+        if that URL serves the `htdocs/common` directory written by
+        [TracAdmin trac-admin ... deploy <deploydir>], which contains
+        the fingerprinted copies of the files. (''since 1.1.2'')""")
+
     show_email_addresses = BoolOption('trac', 'show_email_addresses', 'false',
         """Show email addresses instead of usernames. If false, we obfuscate
         email addresses. (''since 0.11'')""")
@@ -542,6 +579,10 @@ class Chrome(Component):
         'utc': utc,
     }
 
+    def __init__(self):
+        self._fingerprints = {}
+        self._fingerprints_lock = threading.Lock()
+
     # ISystemInfoProvider methods
 
     def get_system_info(self):
@@ -612,22 +653,120 @@ class Chrome(Component):
         prefix = req.args['prefix']
         filename = req.args['filename']
 
-        dirs = []
-        for provider in self.template_providers:
-            for dir in [os.path.normpath(dir[1]) for dir
-                        in provider.get_htdocs_dirs() or []
-                        if dir[0] == prefix and dir[1]]:
-                dirs.append(dir)
-                path = os.path.normpath(os.path.join(dir, filename))
-                if os.path.commonprefix([dir, path]) != dir:
-                    raise TracError(_("Invalid chrome path %(path)s.",
-                                      path=filename))
-                elif os.path.isfile(path):
-                    req.send_file(path, get_mimetype(path))
-
-        self.log.warning('File %s not found in any of %s', filename, dirs)
+        path = self._find_htdocs_file(prefix, filename)
+        if path is None:
+            match = _fingerprint_re.search(filename)
+            if match:
+                filename = filename[:match.start()] + match.group(2)
+                path = self._find_htdocs_file(prefix, filename)
+                if path and \
+                        match.group(1) == self.get_fingerprint(prefix,
+                                                               filename):
+                    # The URL designates that exact content
+                    req.send_header('Cache-Control', 'public, max-age=%d'
+                                                     % (365 * 24 * 3600))
+        if path:
+            req.send_file(path, get_mimetype(path))
+
+        self.log.warning('File %s not found in any of %s', filename,
+                         self._get_htdocs_dirs(prefix))
         raise HTTPNotFound('File %s not found', filename)
 
+    def _get_htdocs_dirs(self, prefix):
+        return [os.path.normpath(dir[1])
+                for provider in self.template_providers
+                for dir in provider.get_htdocs_dirs() or []
+                if dir[0] == prefix and dir[1]]
+
+    def _find_htdocs_file(self, prefix, filename):
+        for dir in self._get_htdocs_dirs(prefix):
+            path = os.path.normpath(os.path.join(dir, filename))
+            if os.path.commonprefix([dir, path]) != dir:
+                raise TracError(_("Invalid chrome path %(path)s.",
+                                  path=filename))
+            elif os.path.isfile(path):
+                return path
+
+    def get_fingerprint(self, prefix, filename):
+        """Return the fingerprint of the static resource `filename`
+        found in the `prefix` htdocs directories, or `None` if there's
+        no such file.
+
+        The fingerprint is a short digest of the file content. It is
+        only recomputed when the file is modified, which is checked
+        on each call if `[trac] auto_reload` is enabled.
+
+        :since: 1.1.2
+        """
+        key = (prefix, filename)
+        entry = self._fingerprints.get(key)
+        if entry and not self.auto_reload:
+            return entry[2]
+        try:
+            path = self._find_htdocs_file(prefix, filename)
+        except TracError:
+            return None
+        if path is None:
+            return None
+        mtime = os.path.getmtime(path)
+        if entry and entry[:2] == (path, mtime):
+            return entry[2]
+        fingerprint = _get_fingerprint(path)
+        with self._fingerprints_lock:
+            self._fingerprints[key] = (path, mtime, fingerprint)
+        return fingerprint
+
+    def add_fingerprint(self, filename):
+        """Return the `filename` of a static resource, given as
+        `prefix/path`, with the fingerprint of its content inserted
+        before the extension. The `filename` is returned unchanged if
+        the resource can't be found.
+
+        :since: 1.1.2
+        """
+        if '/' in filename:
+            prefix, path = filename.split('/', 1)
+            if prefix != 'common' or not self.htdocs_location or \
+                    self.htdocs_location_fingerprints:
+                fingerprint = self.get_fingerprint(prefix, path)
+                if fingerprint:
+                    return '%s/%s' % (prefix,
+                                      _add_fingerprint(path, fingerprint))
+        return filename
+
+    def write_fingerprinted_files(self, dir):
+        """Write the fingerprinted copy of each static resource found
+        below `dir`, as well as a precompressed `.gz` variant of the
+        textual ones.
+
+        The `.gz` variants are meant for the web server serving the
+        deployed resources, e.g. with the `gzip_static` directive of
+        nginx. Trac itself always sends the original files.
+
+        :since: 1.1.2
+        """
+        for root, dirs, files in os.walk(dir):
+            for name in files:
+                if name.endswith('.gz') or _fingerprint_re.search(name):
+                    continue
+                path = os.path.join(root, name)
+                paths = [path]
+                fingerprinted = os.path.join(root, _add_fingerprint(
+                                    name, _get_fingerprint(path)))
+                if not os.path.exists(fingerprinted):
+                    copy2(path, fingerprinted)
+                paths.append(fingerprinted)
+                if os.path.splitext(name)[1].lower() in _compressible_exts:
+                    for path in paths:
+                        mtime = os.path.getmtime(path)
+                        with open(path, 'rb') as f:
+                            content = f.read()
+                        with open(path + '.gz', 'wb') as f:
+                            gz = gzip.GzipFile(name, 'wb', 9, f, mtime)
+                            gz.write(content)
+                            gz.close()
+                        os.utime(path + '.gz', (mtime, mtime))
+
     # ITemplateProvider methods
 
     def get_htdocs_dirs(self):
@@ -674,7 +813,8 @@ class Chrome(Component):
         self.log.debug('Prepare chrome data for request')
 
         chrome = {'metas': [], 'links': {}, 'scripts': [], 'script_data': {},
-                  'ctxtnav': [], 'warnings': [], 'notices': []}
+                  'ctxtnav': [], 'warnings': [], 'notices': [],
+                  'fingerprint': self.add_fingerprint}
         req.chrome = chrome
 
         htdocs_location = self.htdocs_location or req.href.chrome('common')
@@ -967,7 +1107,7 @@ class Chrome(Component):
         return self.templates.load(filename, cls=cls)
 
     def render_template(self, req, filename, data, content_type=None,
-                        fragment=False):
+                        fragment=False, iterable=False):
         """Render the `filename` using the `data` for the context.
 
         The `content_type` argument is used to choose the kind of template
@@ -977,6 +1117,10 @@ class Chrome(Component):
 
         When `fragment` is specified, the (filtered) Genshi stream is
         returned.
+
+        When `iterable` is specified, the markup is not rendered at once
+        but returned as an iterable of `str` chunks, see
+        `iterable_content()` (''since 1.1.2'').
         """
         if content_type is None:
             content_type = 'text/html'
@@ -1033,6 +1177,13 @@ class Chrome(Component):
         })
 
         try:
+            if iterable:
+                chunks = self.iterable_content(stream, method,
+                                               doctype=doctype)
+                # Render the first chunk here, so that template errors
+                # are reported before the response is started
+                first = list(itertools.islice(chunks, 1))
+                return itertools.chain(first, chunks)
             buffer = StringIO()
             stream.render(method, doctype=doctype, out=buffer,
                           encoding='utf-8')
@@ -1056,6 +1207,25 @@ class Chrome(Component):
                                   location=location))
             raise
 
+    def iterable_content(self, stream, method, **kwargs):
+        """Serialize the Genshi `stream` incrementally, generating UTF-8
+        encoded `str` chunks of a few kilobytes stripped of the invalid
+        control characters.
+
+        :since: 1.1.2
+        """
+        buffer = StringIO()
+        for chunk in stream.serialize(method, **kwargs):
+            buffer.write(chunk.encode('utf-8'))
+            if buffer.tell() >= 4096:
+                yield buffer.getvalue().translate(_translate_nop,
+                                                  _invalid_control_chars)
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().translate(_translate_nop,
+                                              _invalid_control_chars)
+
     # E-mail formatting utilities
 
     def cc_list(self, cc_field):
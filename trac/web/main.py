@@ -33,15 +33,15 @@ from genshi.output import DocType
 from genshi.template import TemplateLoader
 
 from trac import __version__ as TRAC_VERSION
-from trac.config import BoolOption, ExtensionOption, Option, \
+from trac.config import BoolOption, ExtensionOption, IntOption, Option, \
                         OrderedExtensionsOption
 from trac.core import *
 from trac.env import open_environment
 from trac.loader import get_plugin_info, match_plugins_to_frames
-from trac.perm import PermissionCache, PermissionError
+from trac.perm import PermissionCache, PermissionError, PermissionSystem
 from trac.resource import ResourceNotFound
 from trac.util import arity, get_frame_info, get_last_traceback, hex_entropy, \
-                      read_file, safe_repr, translation
+                      md5, read_file, safe_repr, translation
 from trac.util.concurrency import threading
 from trac.util.datefmt import format_datetime, localtz, timezone, user_time
 from trac.util.text import exception_to_unicode, shorten_line, to_unicode
@@ -51,6 +51,7 @@ from trac.web.api import *
 from trac.web.chrome import Chrome, add_warning
 from trac.web.href import Href
 from trac.web.session import Session
+from trac.web.wsgi import ResponseCompressor
 
 #: This URL is used for semi-automatic bug reports (see
 #: `send_internal_error`).  Please modify it to point to your own
@@ -121,6 +122,18 @@ class RequestDispatcher(Component):
         language. (''since 1.0'')
         """)
 
+    compression_level = IntOption('trac', 'compression_level', 0,
+        """Level of the gzip or deflate compression applied to the
+        textual responses, when the user agent accepts it, from 1
+        (fastest) to 9 (smallest). Compression is disabled with 0,
+        e.g. when the web server already takes care of it.
+        (''since 1.1.2'')""")
+
+    compression_min_size = IntOption('trac', 'compression_min_size', 1024,
+        """Minimal size in bytes of the responses to compress, when
+        their size is known in advance. Streamed responses are always
+        compressed. (''since 1.1.2'')""")
+
     use_xsendfile = BoolOption('trac', 'use_xsendfile', 'false',
         """When true, send a `X-Sendfile` header and no content when sending
         files from the filesystem, so that the web server handles the content.
@@ -166,6 +179,7 @@ class RequestDispatcher(Component):
             'tz': self._get_timezone,
             'form_token': self._get_form_token,
             'use_xsendfile': self._get_use_xsendfile,
+            'etag_variant': self._get_etag_variant,
         })
 
         try:
@@ -327,6 +341,28 @@ class RequestDispatcher(Component):
     def _get_use_xsendfile(self, req):
         return self.use_xsendfile
 
+    def _get_etag_variant(self, req):
+        """Digest of what the rendering of a page depends upon, besides
+        the requested resource: the permissions of the user, the
+        session (preferences and pending notices), the form token, the
+        negotiated locale and the configuration.
+        """
+        if isinstance(req.perm, FakePerm):
+            perms = None
+        else:
+            perms = PermissionSystem(self.env) \
+                    .get_user_permissions(req.authname)
+        try:
+            config_mtime = os.path.getmtime(self.env.config.filename)
+        except (OSError, TypeError):
+            config_mtime = None
+        m = md5()
+        m.update(repr((TRAC_VERSION, config_mtime,
+                       sorted(perms.iteritems()) if perms else None,
+                       sorted(req.session.iteritems()), req.form_token,
+                       unicode(req.locale))))
+        return m.hexdigest()
+
     def _pre_process_request(self, req, chosen_handler):
         for filter_ in self.filters:
             chosen_handler = filter_.pre_process_request(req, chosen_handler)
@@ -466,10 +502,23 @@ def dispatch_request(environ, start_response):
     except Exception, e:
         env_error = e
 
+    compressor = None
+    if env:
+        dispatcher = RequestDispatcher(env)
+        if dispatcher.compression_level > 0:
+            compressor = ResponseCompressor(
+                environ, start_response,
+                min(dispatcher.compression_level, 9),
+                dispatcher.compression_min_size, env.log)
+            start_response = compressor.start_response
+
     req = RequestWithSession(environ, start_response)
     translation.make_activable(lambda: req.locale, env.path if env else None)
     try:
-        return _dispatch_request(req, env, env_error)
+        resp = _dispatch_request(req, env, env_error)
+        if compressor:
+            resp = compressor(resp)
+        return resp
     finally:
         translation.deactivate()
         if env and not run_once:
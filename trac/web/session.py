@@ -113,6 +113,7 @@ class DetachedSession(dict):
         # eventually purge the tables.
 
         session_saved = False
+        new_session = self._new
 
         with self.env.db_transaction as db:
             # Try to save the session if it's a new one. A failure to
@@ -137,6 +138,10 @@ class DetachedSession(dict):
             # new ones. The last concurrent request to do so "wins".
 
             if self._old != self:
+                user_changed = authenticated and \
+                               (new_session or
+                                any(self._old.get(attr) != self.get(attr)
+                                    for attr in ('name', 'email')))
                 if not items and not authenticated:
                     # No need to keep around empty unauthenticated sessions
                     db("DELETE FROM session WHERE sid=%s AND authenticated=0",
@@ -160,6 +165,9 @@ class DetachedSession(dict):
                     db.rollback()
                     return
                 session_saved = True
+                if user_changed:
+                    self.env.update_known_user(self.sid, self.get('name'),
+                                               self.get('email'))
 
         # Purge expired sessions. We do this only when the session was
         # changed as to minimize the purging.
@@ -290,6 +298,7 @@ class Session(DetachedSession):
                     db("""UPDATE session_attribute SET sid=%s, authenticated=1
                           WHERE sid=%s
                           """, (self.req.authname, sid))
+                    self.env.invalidate_known_users_cache()
             else:
                 # We didn't have an anonymous session for this sid. The
                 # authenticated session might have been inserted between the
@@ -298,6 +307,7 @@ class Session(DetachedSession):
                     db("""INSERT INTO session (sid, last_visit, authenticated)
                           VALUES (%s, %s, 1)
                           """, (self.req.authname, int(time.time())))
+                    self.env.update_known_user(self.req.authname)
                 except self.env.db_exc.IntegrityError:
                     self.env.log.warning('Authenticated session for %s '
                                          'already exists', self.req.authname)
@@ -439,6 +449,8 @@ class SessionAdmin(Component):
             if email is not None:
                 db("INSERT INTO session_attribute VALUES (%s,%s,'email',%s)",
                     (sid, authenticated, email))
+            if authenticated:
+                self.env.update_known_user(sid, name, email)
 
     def _do_set(self, attr, sid, val):
         if attr not in ('name', 'email'):
@@ -457,6 +469,8 @@ class SessionAdmin(Component):
                 """, (sid, authenticated, attr))
             db("INSERT INTO session_attribute VALUES (%s, %s, %s, %s)",
                (sid, authenticated, attr, val))
+            if authenticated:
+                self.env.invalidate_known_users_cache()
 
     def _do_delete(self, *sids):
         with self.env.db_transaction as db:
@@ -474,6 +488,8 @@ class SessionAdmin(Component):
                         DELETE FROM session_attribute
                         WHERE sid=%s AND authenticated=%s
                         """, (sid, authenticated))
+                    if authenticated:
+                        self.env.invalidate_known_users_cache()
 
     def _do_purge(self, age):
         when = parse_date(age, hint='datetime',
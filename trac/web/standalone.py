@@ -23,15 +23,17 @@ import pkg_resources
 import os
 import socket
 import select
+import signal
 import sys
 from SocketServer import ThreadingMixIn
 
 from trac import __version__ as VERSION
+from trac.db.pool import get_pool_size
 from trac.util import autoreload, daemon
 from trac.web.api import Request
 from trac.web.auth import BasicAuthentication, DigestAuthentication
 from trac.web.main import dispatch_request
-from trac.web.wsgi import WSGIServer, WSGIRequestHandler
+from trac.web.wsgi import WorkerPoolMixIn, WSGIServer, WSGIRequestHandler
 
 
 class AuthenticationMiddleware(object):
@@ -96,7 +98,10 @@ class TracHTTPServer(ThreadingMixIn, WSGIServer):
     daemon_threads = True
 
     def __init__(self, server_address, application, env_parent_dir, env_paths,
-                 use_http_11=False):
+                 use_http_11=False, backlog=None, keepalive_timeout=None):
+        if backlog:
+            self.request_queue_size = backlog
+        self.keepalive_timeout = keepalive_timeout
         request_handlers = (TracHTTPRequestHandler, TracHTTP11RequestHandler)
         WSGIServer.__init__(self, server_address, application,
                             request_handler=request_handlers[bool(use_http_11)])
@@ -109,6 +114,21 @@ class TracHTTPServer(ThreadingMixIn, WSGIServer):
                     self.handle_request()
 
 
+class TracWorkerPoolHTTPServer(WorkerPoolMixIn, TracHTTPServer):
+    """HTTP server processing the requests in a bounded pool of worker
+    threads.
+
+    :since: 1.1.2
+    """
+
+    def __init__(self, server_address, application, env_parent_dir, env_paths,
+                 workers, queue_size=0, **kwargs):
+        self.worker_count = workers
+        self.queue_size = queue_size
+        TracHTTPServer.__init__(self, server_address, application,
+                                env_parent_dir, env_paths, **kwargs)
+
+
 class TracHTTPRequestHandler(WSGIRequestHandler):
 
     server_version = 'tracd/' + VERSION
@@ -177,6 +197,24 @@ def main():
                       help='use HTTP/1.0 protocol version instead of HTTP/1.1')
     parser.add_option('--http11', action='store_true', dest='http11',
                       help='use HTTP/1.1 protocol version (default)')
+    parser.add_option('--workers', action='store', type='int',
+                      dest='workers', metavar='N',
+                      help='process the requests in a pool of N worker '
+                      'threads instead of a thread per connection (0 uses '
+                      'the size of the database connection pool)')
+    parser.add_option('--queue-size', action='store', type='int',
+                      dest='queue_size', metavar='N',
+                      help='with --workers, the number of accepted '
+                      'connections waiting for a worker (default: twice '
+                      'the number of workers)')
+    parser.add_option('--backlog', action='store', type='int',
+                      dest='backlog', metavar='N',
+                      help='the number of pending connections of the '
+                      'listening socket')
+    parser.add_option('--keepalive-timeout', action='store', type='int',
+                      dest='keepalive_timeout', metavar='SECONDS',
+                      help='close the idle connections after that delay, '
+                      '0 for never (default 5)')
     parser.add_option('-e', '--env-parent-dir', action='store',
                       dest='env_parent_dir', metavar='PARENTDIR',
                       help='parent directory of the project environments')
@@ -199,6 +237,13 @@ def main():
         parser.add_option('--pidfile', action='store',
                           dest='pidfile',
                           help='when daemonizing, file to which to write pid')
+        parser.add_option('--processes', action='store', type='int',
+                          dest='processes', metavar='N',
+                          help='serve the requests with N forked processes '
+                          'sharing the listening socket, replaced one at a '
+                          'time on SIGHUP (the code is not reloaded: the new '
+                          'processes are forked from the modules already '
+                          'imported by the master process)')
         parser.add_option('--umask', action='callback', type='string',
                           dest='umask', metavar='MASK', callback=_octal,
                           help='when daemonizing, file mode creation mask '
@@ -238,7 +283,8 @@ def main():
 
     parser.set_defaults(port=None, hostname='', base_path='', daemonize=False,
                         protocol='http', http11=True, umask=022, user=None,
-                        group=None)
+                        group=None, workers=None, queue_size=None,
+                        backlog=None, keepalive_timeout=5, processes=None)
     options, args = parser.parse_args()
 
     if not args and not options.env_parent_dir:
@@ -254,6 +300,29 @@ def main():
     if options.daemonize and options.autoreload:
         parser.error('the --auto-reload option cannot be used with '
                      '--daemonize')
+    if options.processes is not None:
+        if options.processes < 1:
+            parser.error('the --processes option must be a positive number')
+        if options.autoreload:
+            parser.error('the --processes option cannot be used with '
+                         '--auto-reload')
+        if options.protocol != 'http':
+            parser.error('the --processes option can only be used with '
+                         'the http protocol')
+    if options.workers is not None:
+        if options.workers < 0:
+            parser.error('the --workers option must be a positive number')
+        pool_size = get_pool_size()
+        if not options.workers:
+            options.workers = pool_size
+        elif options.workers > pool_size:
+            print >> sys.stderr, 'Warning: more workers (%d) than database ' \
+                                 'connections (%d), set TRAC_DB_POOL_SIZE ' \
+                                 'accordingly' % (options.workers, pool_size)
+        if options.queue_size is None:
+            options.queue_size = 2 * options.workers
+    elif options.queue_size is not None:
+        parser.error('the --queue-size option requires --workers')
 
     if options.port is None:
         options.port = {
@@ -293,10 +362,18 @@ def main():
             else:
                 loc = 'http://%s:%s/%s' % (addr, port, base_path)
 
+            kwargs = dict(use_http_11=options.http11,
+                          backlog=options.backlog,
+                          keepalive_timeout=options.keepalive_timeout)
             try:
-                httpd = TracHTTPServer(server_address, wsgi_app,
-                                       options.env_parent_dir, args,
-                                       use_http_11=options.http11)
+                if options.workers:
+                    httpd = TracWorkerPoolHTTPServer(
+                        server_address, wsgi_app, options.env_parent_dir,
+                        args, options.workers, options.queue_size, **kwargs)
+                else:
+                    httpd = TracHTTPServer(server_address, wsgi_app,
+                                           options.env_parent_dir, args,
+                                           **kwargs)
             except socket.error, e:
                 print 'Error starting Trac server on %s' % loc
                 print '[Errno %s] %s' % e.args
@@ -306,7 +383,27 @@ def main():
             print 'Serving on %s' % loc
             if options.http11:
                 print 'Using HTTP/1.1 protocol version'
-            httpd.serve_forever()
+            if options.workers:
+                print 'Using %d worker threads' % options.workers
+
+            def serve_requests():
+                try:
+                    httpd.serve_forever()
+                finally:
+                    httpd.server_close()
+
+            if options.processes:
+                print 'Using %d processes' % options.processes
+                # The environments are opened in each process
+                daemon.prefork(serve_requests, options.processes)
+                httpd.server_close()
+            else:
+                if options.workers and not options.autoreload and \
+                        hasattr(signal, 'SIGTERM'):
+                    # Drain the queued requests when terminated
+                    signal.signal(signal.SIGTERM,
+                                  lambda signum, frame: sys.exit(0))
+                serve_requests()
     elif options.protocol in ('scgi', 'ajp', 'fcgi'):
         def serve():
             server_cls = __import__('flup.server.%s' % options.protocol,
@@ -12,9 +12,15 @@
 # history and logs, available at http://trac.edgewall.org/log/.
 
 from trac.test import Mock
-from trac.web.api import Request, RequestDone, parse_arg_list
+from trac.util.datefmt import utc
+from trac.web.api import HTTPRequestEntityTooLarge, Request, RequestDone, \
+                          parse_arg_list
 
+from datetime import datetime
 from StringIO import StringIO
+import os
+import shutil
+import tempfile
 import unittest
 
 
@@ -101,6 +107,49 @@ class RequestTestCase(unittest.TestCase):
         self.assertEqual('http://example.com/trac/test',
                          headers_sent['Location'])
 
+    def test_check_modified(self):
+        status_sent = []
+        def start_response(status, headers):
+            status_sent.append(status)
+        date = datetime(2013, 1, 1, tzinfo=utc)
+
+        req = Request(self._make_environ(), start_response)
+        req.authname = 'joe'
+        req.callbacks['etag_variant'] = lambda req: 'variant 1'
+        req.check_modified(date, ['extra'])
+        etag = dict(req._outheaders)['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+
+        req = Request(self._make_environ(HTTP_IF_NONE_MATCH=etag),
+                      start_response)
+        req.authname = 'joe'
+        req.callbacks['etag_variant'] = lambda req: 'variant 1'
+        self.assertRaises(RequestDone, req.check_modified, date, ['extra'])
+        self.assertEqual('304 Not Modified', status_sent[0])
+
+        req = Request(self._make_environ(HTTP_IF_NONE_MATCH=etag),
+                      start_response)
+        req.authname = 'joe'
+        req.callbacks['etag_variant'] = lambda req: 'variant 2'
+        req.check_modified(date, ['extra'])
+        self.assertNotEqual(etag, dict(req._outheaders)['ETag'])
+
+    def test_check_etag(self):
+        status_sent = []
+        def start_response(status, headers):
+            status_sent.append(status)
+        environ = self._make_environ(HTTP_IF_NONE_MATCH='"a", "b"')
+        req = Request(environ, start_response)
+        req.check_etag('"c"')
+        self.assertEqual([], status_sent)
+        self.assertRaises(RequestDone, req.check_etag, '"b"')
+        self.assertEqual('304 Not Modified', status_sent[0])
+
+        environ = self._make_environ(method='POST', HTTP_IF_NONE_MATCH='"b"')
+        req = Request(environ, start_response)
+        req.check_etag('"b"')
+        self.assertEqual(1, len(status_sent))
+
     def test_write_unicode(self):
         buf = StringIO()
         def write(data):
@@ -152,6 +201,123 @@ class RequestTestCase(unittest.TestCase):
         req = Request(environ, None)
         self.assertEqual('bar', req.args['action'])
 
+    def test_urlencoded_post(self):
+        content_type = 'application/x-www-form-urlencoded; charset=UTF-8'
+        environ = self._make_environ(method='POST',
+                                     **{'wsgi.input': StringIO(
+                                            'k=r%C3%A9sum%C3%A9&e=&b&k=v'),
+                                        'CONTENT_LENGTH': '27',
+                                        'CONTENT_TYPE': content_type})
+        req = Request(environ, None)
+        self.assertEqual([('k', u'résumé'), ('e', u''), ('b', u''),
+                          ('k', u'v')], req.arg_list)
+        self.assertEqual([u'résumé', u'v'], req.args['k'])
+
+    def test_post_without_form_data(self):
+        environ = self._make_environ(method='POST',
+                                     **{'wsgi.input': StringIO('{"a": 1}'),
+                                        'CONTENT_LENGTH': '8',
+                                        'CONTENT_TYPE': 'application/json',
+                                        'QUERY_STRING': 'action=foo'})
+        req = Request(environ, None)
+        self.assertEqual({}, req.args)
+        self.assertEqual('{"a": 1}', req.read())
+
+    def test_post_invalid_content_length(self):
+        content_type = 'application/x-www-form-urlencoded'
+        for length in ('', 'x'):
+            environ = self._make_environ(method='POST',
+                                         **{'wsgi.input': StringIO('a=1'),
+                                            'CONTENT_LENGTH': length,
+                                            'CONTENT_TYPE': content_type})
+            req = Request(environ, None)
+            self.assertEqual({'a': u'1'}, req.args)
+
+    def test_post_without_content_type(self):
+        environ = self._make_environ(method='POST',
+                                     **{'wsgi.input': StringIO('a=1'),
+                                        'CONTENT_LENGTH': '3',
+                                        'QUERY_STRING': 'x=1'})
+        req = Request(environ, None)
+        self.assertEqual({'a': u'1'}, req.args)
+
+    def test_put_query_string(self):
+        environ = self._make_environ(method='PUT',
+                                     **{'wsgi.input': StringIO('a=1'),
+                                        'CONTENT_LENGTH': '3',
+                                        'QUERY_STRING': 'x=1'})
+        req = Request(environ, None)
+        self.assertEqual({}, req.args)
+        content_type = 'application/x-www-form-urlencoded'
+        environ = self._make_environ(method='PUT',
+                                     **{'wsgi.input': StringIO('a=1'),
+                                        'CONTENT_LENGTH': '3',
+                                        'CONTENT_TYPE': content_type,
+                                        'QUERY_STRING': 'x=1'})
+        req = Request(environ, None)
+        self.assertEqual({'a': u'1', 'x': u'1'}, req.args)
+
+    def _make_multipart_environ(self, content, **kwargs):
+        body = '\r\n'.join([
+            '--BOUNDARY',
+            'Content-Disposition: form-data; name="description"',
+            '',
+            'Some file',
+            '--BOUNDARY',
+            'Content-Disposition: form-data; name="attachment"; '
+            'filename="foo.txt"',
+            'Content-Type: text/plain',
+            '',
+            content,
+            '--BOUNDARY--',
+            ''])
+        kwargs.update({'wsgi.input': StringIO(body),
+                       'CONTENT_LENGTH': str(len(body)),
+                       'CONTENT_TYPE':
+                           'multipart/form-data; boundary=BOUNDARY'})
+        return self._make_environ(method='POST', **kwargs)
+
+    def test_multipart_upload(self):
+        upload_dir = tempfile.mkdtemp(prefix='trac-upload-')
+        try:
+            content = 'x' * 2000
+            environ = self._make_multipart_environ(content,
+                **{'trac.upload_dir': upload_dir,
+                   'trac.upload_max_size': 2000})
+            req = Request(environ, None)
+            self.assertEqual(u'Some file', req.args['description'])
+            upload = req.args['attachment']
+            self.assertEqual('foo.txt', upload.filename)
+            self.assertEqual(content, upload.file.read())
+            self.assertEqual(upload_dir, os.path.dirname(upload.file.name))
+
+            target = os.path.join(upload_dir, 'foo.txt')
+            self.assertTrue(upload.file.move_to(target))
+            self.assertEqual(['foo.txt'], os.listdir(upload_dir))
+            upload.file.close()
+            self.assertEqual(content, open(target).read())
+        finally:
+            shutil.rmtree(upload_dir)
+
+    def test_multipart_upload_removed_on_close(self):
+        upload_dir = tempfile.mkdtemp(prefix='trac-upload-')
+        try:
+            environ = self._make_multipart_environ('x' * 2000,
+                **{'trac.upload_dir': upload_dir})
+            req = Request(environ, None)
+            upload = req.args['attachment']
+            self.assertEqual(1, len(os.listdir(upload_dir)))
+            upload.file.close()
+            self.assertEqual([], os.listdir(upload_dir))
+        finally:
+            shutil.rmtree(upload_dir)
+
+    def test_multipart_upload_too_large(self):
+        environ = self._make_multipart_environ('x' * 2001,
+            **{'trac.upload_max_size': 2000})
+        req = Request(environ, None)
+        self.assertRaises(HTTPRequestEntityTooLarge, getattr, req, 'args')
+
 
 class ParseArgListTestCase(unittest.TestCase):
 
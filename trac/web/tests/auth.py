@@ -195,6 +195,49 @@ class LoginModuleTestCase(unittest.TestCase):
             self.env.db_query("SELECT name, ipnr FROM auth_cookie "
                               "WHERE cookie='123'"))
 
+    def test_cached_cookie_invalidated_on_logout(self):
+        self.env.db_transaction("""
+            INSERT INTO auth_cookie (cookie, name, ipnr)
+            VALUES ('123', 'john', '127.0.0.1')""")
+        incookie = Cookie()
+        incookie['trac_auth'] = '123'
+        req = Mock(incookie=incookie, outcookie=Cookie(),
+                   href=Href('/trac.cgi'), base_path='/trac.cgi',
+                   remote_addr='127.0.0.1', remote_user=None,
+                   authname='john', method='POST')
+        self.assertEqual('john', self.module.authenticate(req))
+        # The cookie is now found without querying the database
+        self.env.db_transaction("DELETE FROM auth_cookie")
+        self.assertEqual('john', self.module.authenticate(req))
+        self.env.db_transaction("""
+            INSERT INTO auth_cookie (cookie, name, ipnr)
+            VALUES ('123', 'john', '127.0.0.1')""")
+        self.module._do_logout(req)
+        self.assertIsNone(self.module.authenticate(req))
+
+    def test_old_cookies_purged_on_login(self):
+        def login():
+            req = Mock(incookie=Cookie(), outcookie=Cookie(),
+                       href=Href('/trac.cgi'), base_path='/trac.cgi',
+                       remote_addr='127.0.0.1', remote_user='john',
+                       authname='anonymous')
+            self.module._do_login(req)
+        def insert_old_cookie(cookie):
+            self.env.db_transaction("""
+                INSERT INTO auth_cookie (cookie, name, ipnr, time)
+                VALUES (%s, 'john', '127.0.0.1', 0)""", (cookie,))
+        def old_cookies():
+            return [cookie for cookie, in self.env.db_query(
+                    "SELECT cookie FROM auth_cookie WHERE time=0")]
+
+        insert_old_cookie('123')
+        login()
+        self.assertEqual([], old_cookies())
+        # The cookies are not purged again on the next login
+        insert_old_cookie('456')
+        login()
+        self.assertEqual(['456'], old_cookies())
+
 
 class BasicAuthenticationTestCase(unittest.TestCase):
     def setUp(self):
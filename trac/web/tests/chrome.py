@@ -368,6 +368,67 @@ class ChromeTestCase2(unittest.TestCase):
         self.assertTrue(self.chrome.match_request(req))
         self.assertRaises(RequestDone, self.chrome.process_request, req)
 
+    def _create_site_file(self, filename, content):
+        site_htdocs_dir = os.path.join(self.env.path, 'htdocs')
+        if not os.path.isdir(site_htdocs_dir):
+            os.makedirs(site_htdocs_dir)
+        create_file(os.path.join(site_htdocs_dir, filename), content)
+
+    def test_fingerprinted_resource_path(self):
+        self._create_site_file('style.css', 'body {}')
+        fingerprint = self.chrome.get_fingerprint('site', 'style.css')
+        self.assertEqual(10, len(fingerprint))
+        self.assertEqual('site/style.%s.css' % fingerprint,
+                         self.chrome.add_fingerprint('site/style.css'))
+        self.assertEqual('site/missing.css',
+                         self.chrome.add_fingerprint('site/missing.css'))
+
+        req = Request(href=Href('/trac.cgi'),
+                      chrome={'fingerprint': self.chrome.add_fingerprint})
+        add_stylesheet(req, 'site/style.css')
+        self.assertEqual('/trac.cgi/chrome/site/style.%s.css' % fingerprint,
+                         req.chrome['links']['stylesheet'][0]['href'])
+
+    def test_fingerprinted_resource_is_found(self):
+        from trac.web.api import RequestDone
+        self._create_site_file('style.css', 'body {}')
+        fingerprint = self.chrome.get_fingerprint('site', 'style.css')
+        sent = []
+        def send_file(path, mimetype):
+            sent.append(path)
+            raise RequestDone
+        headers = {}
+        def send_header(name, value):
+            headers[name] = value
+
+        for name in ('style.%s.css' % fingerprint, 'style.0123456789.css'):
+            req = Request(path_info='/chrome/site/' + name,
+                          send_file=send_file, send_header=send_header)
+            self.assertTrue(self.chrome.match_request(req))
+            self.assertRaises(RequestDone, self.chrome.process_request, req)
+        self.assertEqual(2, len(sent))
+        self.assertEqual(sent[0], sent[1])
+        self.assertTrue(sent[0].endswith('style.css'))
+        self.assertEqual(['Cache-Control'], headers.keys())
+
+    def test_write_fingerprinted_files(self):
+        self._create_site_file('style.css', 'body {}')
+        self._create_site_file('logo.png', 'PNG')
+        site_htdocs_dir = os.path.join(self.env.path, 'htdocs')
+        self.chrome.write_fingerprinted_files(site_htdocs_dir)
+        self.chrome.write_fingerprinted_files(site_htdocs_dir)
+        css = 'style.%s.css' % self.chrome.get_fingerprint('site', 'style.css')
+        png = 'logo.%s.png' % self.chrome.get_fingerprint('site', 'logo.png')
+        self.assertEqual(sorted(['style.css', 'style.css.gz', css,
+                                 css + '.gz', 'logo.png', png]),
+                         sorted(os.listdir(site_htdocs_dir)))
+        import gzip
+        gz = gzip.open(os.path.join(site_htdocs_dir, css + '.gz'))
+        try:
+            self.assertEqual('body {}', gz.read())
+        finally:
+            gz.close()
+
 
 def suite():
     suite = unittest.TestSuite()
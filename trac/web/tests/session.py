@@ -451,6 +451,28 @@ class SessionTestCase(unittest.TestCase):
             SELECT value FROM session_attribute WHERE sid='john' AND name='foo'
             """)[0][0])
 
+    def test_modify_detached_session_updates_known_users(self):
+        """
+        Verify that changing the name or e-mail of an authenticated
+        session updates the cached known users.
+        """
+        self.env.db_transaction("INSERT INTO session VALUES ('john', 1, 0)")
+        self.assertEqual([('john', None, None)],
+                         list(self.env.find_known_users('jo')))
+
+        session = DetachedSession(self.env, 'john')
+        session['email'] = 'john@example.org'
+        session.save()
+        self.assertEqual([('john', None, 'john@example.org')],
+                         list(self.env.find_known_users('jo')))
+
+        session = DetachedSession(self.env, 'joe')
+        session['name'] = 'Joe'
+        session.save()
+        self.assertEqual([('joe', 'Joe', None),
+                          ('john', None, 'john@example.org')],
+                         list(self.env.find_known_users('jo')))
+
     def test_delete_detached_session_var(self):
         """
         Verify that removing a variable in a session not associated with a
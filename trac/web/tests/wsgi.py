@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2013 Edgewall Software
+# All rights reserved.
+#
+# This software is licensed as described in the file COPYING, which
+# you should have received as part of this distribution. The terms
+# are also available at http://trac.edgewall.org/wiki/TracLicense.
+#
+# This software consists of voluntary contributions made by many
+# individuals. For the exact contribution history, see the revision
+# history and logs, available at http://trac.edgewall.org/log/.
+
+import httplib
+import socket
+import time
+import unittest
+import zlib
+
+from trac.util.concurrency import threading
+from trac.web.wsgi import ResponseCompressor, WorkerPoolMixIn, WSGIServer, \
+                          WSGIRequestHandler, negotiate_encoding
+
+
+class NegotiateEncodingTestCase(unittest.TestCase):
+
+    def test_negotiate_encoding(self):
+        encodings = ('gzip', 'deflate')
+        self.assertEqual('gzip', negotiate_encoding('gzip, deflate',
+                                                    encodings))
+        self.assertEqual('deflate', negotiate_encoding('Deflate',
+                                                       encodings))
+        self.assertEqual('deflate', negotiate_encoding('gzip;q=0, *',
+                                                       encodings))
+        self.assertEqual(None, negotiate_encoding('identity', encodings))
+        self.assertEqual(None, negotiate_encoding('', encodings))
+        self.assertEqual(None, negotiate_encoding(None, encodings))
+
+
+class ResponseCompressorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.status_sent = []
+        self.headers_sent = []
+        self.written = []
+
+    def _start_response(self, status, headers, exc_info=None):
+        self.status_sent.append(status)
+        self.headers_sent[:] = headers
+        return self.written.append
+
+    def _process(self, headers, chunks, written=[], min_size=10,
+                 accept_encoding='gzip, deflate'):
+        environ = {'REQUEST_METHOD': 'GET',
+                   'HTTP_ACCEPT_ENCODING': accept_encoding}
+        compressor = ResponseCompressor(environ, self._start_response,
+                                        min_size=min_size)
+        write = compressor.start_response('200 Ok', headers)
+        for data in written:
+            write(data)
+        return ''.join(self.written + list(compressor(chunks)))
+
+    def test_gzip(self):
+        content = self._process([('Content-Type', 'text/html'),
+                                 ('Content-Length', '30')],
+                                ['<html>', '</html>'], ['<p>', '...', '</p>'])
+        headers = dict(self.headers_sent)
+        self.assertEqual('gzip', headers['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', headers['Vary'])
+        self.assertNotIn('Content-Length', headers)
+        self.assertEqual('<p>...</p><html></html>',
+                         zlib.decompress(content, 16 + zlib.MAX_WBITS))
+
+    def test_deflate(self):
+        content = self._process([('Content-Type', 'text/csv'),
+                                 ('Vary', 'Cookie'), ('ETag', '"abc"')],
+                                ['a,b\r\n'] * 10, accept_encoding='deflate')
+        headers = dict(self.headers_sent)
+        self.assertEqual('deflate', headers['Content-Encoding'])
+        self.assertEqual('Cookie, Accept-Encoding', headers['Vary'])
+        self.assertEqual('W/"abc"', headers['ETag'])
+        self.assertEqual('a,b\r\n' * 10, zlib.decompress(content))
+
+    def test_not_accepted(self):
+        chunks = ['<html>', '</html>']
+        self.assertEqual('<html></html>',
+                         self._process([('Content-Type', 'text/html')],
+                                       chunks, accept_encoding='identity'))
+        headers = dict(self.headers_sent)
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual('Accept-Encoding', headers['Vary'])
+
+    def test_skipped_responses(self):
+        for headers in ([('Content-Type', 'image/png')],
+                        [('Content-Type', 'application/zip')],
+                        [('Content-Type', 'text/plain'),
+                         ('Content-Length', '5')],
+                        [('Content-Type', 'text/plain'),
+                         ('Content-Encoding', 'gzip')],
+                        [('Content-Type', 'text/plain'),
+                         ('X-Sendfile', '/path/to/file')]):
+            self.written = []
+            chunks = ['12345']
+            self.assertEqual('12345', self._process(headers, chunks))
+            self.assertEqual(headers, self.headers_sent)
+
+
+class WorkerPoolServer(WorkerPoolMixIn, WSGIServer):
+    worker_count = 2
+    queue_size = 1
+    keepalive_timeout = 0.2
+
+
+class HTTP11RequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WorkerPoolMixInTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.threads = set()
+        def application(environ, start_response):
+            self.threads.add(threading.currentThread().getName())
+            content = environ['PATH_INFO']
+            start_response('200 Ok', [('Content-Type', 'text/plain'),
+                                      ('Content-Length', str(len(content)))])
+            return [content]
+        self.server = WorkerPoolServer(('127.0.0.1', 0), application,
+                                       request_handler=HTTP11RequestHandler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+
+    def test_requests_processed_by_workers(self):
+        for idx in xrange(6):
+            cnx = httplib.HTTPConnection('127.0.0.1', self.port)
+            try:
+                cnx.request('GET', '/path/%d' % idx)
+                self.assertEqual('/path/%d' % idx, cnx.getresponse().read())
+            finally:
+                cnx.close()
+        self.assertTrue(self.threads)
+        self.assertTrue(self.threads <= set(['worker-0', 'worker-1']))
+
+    def test_keepalive(self):
+        cnx = httplib.HTTPConnection('127.0.0.1', self.port)
+        try:
+            cnx.request('GET', '/first')
+            self.assertEqual('/first', cnx.getresponse().read())
+            cnx.request('GET', '/second')
+            self.assertEqual('/second', cnx.getresponse().read())
+        finally:
+            cnx.close()
+
+    def test_idle_connection_closed(self):
+        sock = socket.create_connection(('127.0.0.1', self.port))
+        try:
+            sock.settimeout(5)
+            self.assertEqual('', sock.recv(1024))
+        finally:
+            sock.close()
+
+    def test_idle_connection_closed_for_waiting_one(self):
+        self.server.keepalive_timeout = 30
+        cnxs = [httplib.HTTPConnection('127.0.0.1', self.port)
+                for idx in xrange(3)]
+        try:
+            start = time.time()
+            for idx, cnx in enumerate(cnxs):
+                cnx.request('GET', '/path/%d' % idx)
+                self.assertEqual('/path/%d' % idx, cnx.getresponse().read())
+            self.assertTrue(time.time() - start < 10)
+        finally:
+            for cnx in cnxs:
+                cnx.close()
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(NegotiateEncodingTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(ResponseCompressorTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(WorkerPoolMixInTestCase, 'test'))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -15,12 +15,18 @@
 # Author: Christopher Lenz <cmlenz@gmx.de>
 
 import errno
+import select
 import socket
 import sys
+import time
+import zlib
 from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
-from SocketServer import ForkingMixIn, ThreadingMixIn
+from Queue import Queue
+from SocketServer import ForkingMixIn, TCPServer, ThreadingMixIn
 import urllib
 
+from trac.util.concurrency import threading
+
 
 class _ErrorsWrapper(object):
 
@@ -57,6 +63,147 @@ class _FileWrapper(object):
         return data
 
 
+def negotiate_encoding(accept_encoding, encodings):
+    """Return the first of the content-codings in `encodings` accepted
+    according to the `accept_encoding` value of an "Accept-Encoding"
+    request header, or `None` if none of them is accepted.
+
+    :since: 1.1.2
+    """
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        parts = item.split(';')
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        qvalue = 1.0
+        for param in parts[1:]:
+            key, sep, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        accepted[name] = qvalue
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+
+
+class ResponseCompressor(object):
+    """Compress on the fly the response of a WSGI application, with the
+    gzip or deflate content-coding accepted by the user agent.
+
+    The `start_response` method is passed to the application in place
+    of the original callback, and the iterable returned by the
+    application is wrapped by calling the compressor on it, once the
+    response has been started. Only the textual responses larger than
+    `min_size` bytes, or of unknown length, are compressed.
+
+    :since: 1.1.2
+    """
+
+    encodings = ('gzip', 'deflate')
+
+    def __init__(self, environ, start_response, level=6, min_size=1024,
+                 log=None):
+        self.environ = environ
+        self._start_response = start_response
+        self.level = level
+        self.min_size = min_size
+        self.log = log
+        self.encoding = None
+        self._compressobj = None
+        self._size = self._compressed_size = 0
+
+    def __call__(self, iterable):
+        if not self._compressobj:
+            # Keep the iterable as is, e.g. for a `wsgi.file_wrapper`
+            return iterable
+        return self._iterate(iterable)
+
+    def _iterate(self, iterable):
+        try:
+            for chunk in iterable:
+                yield self._compress(chunk)
+            if self._compressobj:
+                data = self._compressobj.flush()
+                self._compressed_size += len(data)
+                if self.log and self._size:
+                    self.log.debug("Compressed response with %s from %d to "
+                                   "%d bytes (%.1f%%)", self.encoding,
+                                   self._size, self._compressed_size,
+                                   100.0 * self._compressed_size /
+                                   self._size)
+                self._compressobj = None
+                yield data
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    def start_response(self, status, headers, exc_info=None):
+        self.encoding = self._compressobj = None
+        if self._is_compressible(status, headers):
+            headers = [(name, value) for name, value in headers
+                       if name.lower() != 'vary'] + \
+                      [('Vary', ', '.join(filter(None, [
+                           self._get_header(headers, 'Vary'),
+                           'Accept-Encoding'])))]
+            self.encoding = negotiate_encoding(
+                self.environ.get('HTTP_ACCEPT_ENCODING'), self.encodings)
+        if self.encoding:
+            headers = [(name, self._weaken_etag(name, value))
+                       for name, value in headers
+                       if name.lower() != 'content-length']
+            headers.append(('Content-Encoding', self.encoding))
+            # The gzip format is obtained by adding 16 to the window bits
+            wbits = zlib.MAX_WBITS + (16 if self.encoding == 'gzip' else 0)
+            self._compressobj = zlib.compressobj(self.level, zlib.DEFLATED,
+                                                 wbits)
+        write = self._start_response(status, headers, exc_info)
+        def compressing_write(data):
+            data = self._compress(data)
+            if data:
+                write(data)
+        return compressing_write
+
+    def _compress(self, data):
+        if self._compressobj and data:
+            self._size += len(data)
+            data = self._compressobj.compress(data)
+            self._compressed_size += len(data)
+        return data
+
+    def _is_compressible(self, status, headers):
+        if self.environ.get('REQUEST_METHOD') == 'HEAD' or \
+                not status.startswith('200'):
+            return False
+        if self._get_header(headers, 'Content-Encoding') or \
+                self._get_header(headers, 'X-Sendfile'):
+            return False
+        mimetype = (self._get_header(headers, 'Content-Type') or '') \
+                   .split(';')[0].strip().lower()
+        if not (mimetype.startswith('text/') or
+                any(subtype in mimetype
+                    for subtype in ('json', 'javascript', 'xml'))):
+            return False
+        length = self._get_header(headers, 'Content-Length')
+        if length and length.isdigit() and int(length) < self.min_size:
+            return False
+        return True
+
+    def _get_header(self, headers, name):
+        for key, value in headers:
+            if key.lower() == name.lower():
+                return value
+
+    def _weaken_etag(self, name, value):
+        # The compressed representation is not byte-identical
+        if name.lower() == 'etag' and not value.startswith('W/'):
+            return 'W/' + value
+        return value
+
+
 class WSGIGateway(object):
     """Abstract base class for WSGI servers or gateways."""
 
@@ -177,9 +324,27 @@ class WSGIRequestHandler(BaseHTTPRequestHandler):
 
         return environ
 
+    _kept_alive = False
+    _idle_poll_interval = 0.1
+
     def handle_one_request(self):
+        # Don't let idle keep-alive connections hold a thread forever
+        timeout = getattr(self.server, 'keepalive_timeout', None)
+        if self._kept_alive and not self._wait_for_request(timeout):
+            self.close_connection = 1
+            return
+        self._kept_alive = True
         try:
-            environ = self.setup_environ()
+            if timeout:
+                self.connection.settimeout(timeout)
+            try:
+                environ = self.setup_environ()
+            finally:
+                if timeout:
+                    self.connection.settimeout(None)
+        except socket.timeout:
+            environ = None
+            self.close_connection = 1
         except (IOError, socket.error), e:
             environ = None
             if e.args[0] in (errno.EPIPE, errno.ECONNRESET, 10053, 10054):
@@ -192,6 +357,39 @@ class WSGIRequestHandler(BaseHTTPRequestHandler):
             gateway.run(self.server.application)
         # else we had no request or a bad request: we simply exit (#3043)
 
+    def _wait_for_request(self, timeout):
+        """Wait for the next request on a kept-alive connection.
+
+        Return `False` if the connection should be closed instead,
+        because it stayed idle for `timeout` seconds or, with a worker
+        pool, because other connections are waiting for a worker.
+        """
+        # A pipelined request may already be buffered
+        buffered = getattr(self.rfile, '_rbuf', '')
+        if not isinstance(buffered, basestring):
+            buffered = buffered.getvalue()
+        if buffered:
+            return True
+        waiting = getattr(self.server, 'connections_waiting', None)
+        try:
+            if waiting is None:
+                if not timeout:
+                    return True
+                return bool(select.select([self.connection], [], [],
+                                          timeout)[0])
+            deadline = time.time() + (timeout or 0)
+            while not waiting():
+                delay = self._idle_poll_interval
+                if timeout:
+                    delay = min(delay, deadline - time.time())
+                    if delay <= 0:
+                        return False
+                if select.select([self.connection], [], [], delay)[0]:
+                    return True
+        except (select.error, socket.error):
+            pass
+        return False
+
     def finish(self):
         """We need to help the garbage collector a little."""
         BaseHTTPRequestHandler.finish(self)
@@ -242,6 +440,73 @@ class WSGIServerGateway(WSGIGateway):
                 raise
 
 
+class WorkerPoolMixIn:
+    """Mix-in class handling the requests in a bounded pool of worker
+    threads, instead of a new thread per connection.
+
+    The accepted connections wait in a queue of at most `queue_size`
+    entries (unbounded if 0) for a worker to become available. When
+    the queue is full, the server stops accepting the connections,
+    which then wait in the listen backlog of the socket.
+
+    On `server_close`, the queued connections are still processed
+    before the workers stop, waiting at most `drain_timeout` seconds.
+
+    A worker doesn't wait for the next request of a kept-alive
+    connection while other connections are waiting in the queue: the
+    idle connection is closed instead.
+
+    :since: 1.1.2
+    """
+
+    worker_count = 10
+    queue_size = 0
+    drain_timeout = 30
+
+    _requests = _workers = None
+
+    def connections_waiting(self):
+        """Return whether accepted connections are waiting for a
+        worker.
+        """
+        return self._requests is not None and not self._requests.empty()
+
+    def process_request(self, request, client_address):
+        if self._workers is None:
+            self._requests = Queue(self.queue_size)
+            self._workers = []
+            for idx in xrange(self.worker_count):
+                worker = threading.Thread(target=self._process_requests,
+                                          name='worker-%d' % idx)
+                worker.setDaemon(True)
+                worker.start()
+                self._workers.append(worker)
+        self._requests.put((request, client_address))
+
+    def server_close(self):
+        TCPServer.server_close(self)
+        if self._workers is not None:
+            for worker in self._workers:
+                self._requests.put(None)
+            deadline = time.time() + self.drain_timeout
+            for worker in self._workers:
+                worker.join(max(deadline - time.time(), 0))
+            self._workers = None
+
+    def _process_requests(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            # `shutdown_request` is only available since Python 2.6
+            getattr(self, 'shutdown_request', self.close_request)(request)
+
+
 class WSGIServer(HTTPServer):
 
     def __init__(self, server_address, application, gateway=WSGIServerGateway,
@@ -250,7 +515,8 @@ class WSGIServer(HTTPServer):
 
         self.application = application
 
-        gateway.wsgi_multithread = isinstance(self, ThreadingMixIn)
+        gateway.wsgi_multithread = isinstance(self, (ThreadingMixIn,
+                                                     WorkerPoolMixIn))
         gateway.wsgi_multiprocess = isinstance(self, ForkingMixIn)
         self.gateway = gateway
 
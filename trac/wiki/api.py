@@ -30,6 +30,26 @@ from trac.util.translation import _
 from .parser import WikiParser
 
 
+class _UnicodeCharClass(object):
+    """Class attribute containing all the characters of the Basic
+    Multilingual Plane for which `predicate` is true.
+
+    The string is only computed on first access, as scanning the whole
+    plane noticeably slows down the startup of short-lived processes.
+    """
+
+    def __init__(self, name, predicate):
+        self.name = name
+        self.predicate = predicate
+
+    def __get__(self, instance, owner):
+        predicate = self.predicate
+        value = ''.join(c for c in (unichr(i) for i in xrange(0x10000))
+                        if predicate(c))
+        setattr(owner, self.name, value)
+        return value
+
+
 class IWikiChangeListener(Interface):
     """Components that want to get notified about the creation,
     deletion and modification of wiki pages should implement that
@@ -201,6 +221,39 @@ class IWikiSyntaxProvider(Interface):
         for the link.
         """
 
+    def get_link_prefetchers():
+        """Return an iterable over `(namespace, prefetcher)` tuples.
+
+        Implementing this method is optional. Each prefetcher should
+        be a function of the form::
+
+          def prefetch(formatter, ns, targets):
+              pass
+
+        Before formatting a text, the formatter calls it with the set
+        of link targets found in the text for that namespace, so that
+        the data needed by the link resolver can be retrieved in bulk
+        and stored in `formatter.prefetched(realm)`.
+        (''since 1.1.2'')
+        """
+
+    def get_link_shorthands():
+        """Return an iterable over `(regexp, link)` tuples, for the
+        additional wiki syntax which is a shorthand for a TracLink.
+
+        Implementing this method is optional. The `regexp` is the one
+        given by `get_wiki_syntax` for the shorthand, and `link` is a
+        function of the form `link(match, fullmatch)` returning the
+        equivalent `(namespace, target)` pair, or `None` if there's
+        none, e.g.::
+
+          yield (r"!?#\d+", lambda match, fullmatch: ('ticket', match[1:]))
+
+        It is used for finding the targets passed to the link
+        prefetchers (see `get_link_prefetchers`).
+        (''since 1.1.2'')
+        """
+
 
 def parse_args(args, strict=True):
     """Utility for parsing macro "content" and splitting them into arguments.
@@ -254,7 +307,7 @@ def validate_page_name(pagename):
 class WikiSystem(Component):
     """Wiki system manager."""
 
-    implements(IWikiSyntaxProvider, IResourceManager)
+    implements(IWikiChangeListener, IWikiSyntaxProvider, IResourceManager)
 
     change_listeners = ExtensionPoint(IWikiChangeListener)
     macro_providers = ExtensionPoint(IWikiMacroProvider)
@@ -305,6 +358,58 @@ class WikiSystem(Component):
         """Whether a page with the specified name exists."""
         return pagename.rstrip('/') in self.pages
 
+    def get_change_stamp(self):
+        """Return a value which changes whenever a wiki page, a ticket,
+        a milestone or an attachment is created, modified or deleted,
+        or a changeset is added to a cached repository.
+
+        The rendering of wiki text depends on those through the wiki
+        links and the macros, so the value can be used to validate a
+        previous rendering (see `Request.check_modified`). The changes
+        are tracked by the change listeners of those resources, in a
+        cached generation number, so the value is cheap to compute.
+        Changes made to other resources (e.g. reports or the resources
+        of plugins), to non-cached repositories or directly in the
+        database aren't taken into account.
+
+        :since: 1.1.2
+        """
+        youngest = self.env.db_query("""
+            SELECT id, value FROM repository WHERE name='youngest_rev'
+            ORDER BY id""")
+        return self._change_generation, youngest
+
+    def invalidate_change_stamp(self):
+        """Change the value returned by `get_change_stamp()`.
+
+        :since: 1.1.2
+        """
+        del self._change_generation
+
+    @cached
+    def _change_generation(self, db):
+        for generation, in db("SELECT generation FROM cache WHERE id=%s",
+                              (WikiSystem._change_generation.id,)):
+            return generation
+        return -1
+
+    # IWikiChangeListener methods
+
+    def wiki_page_added(self, page):
+        self.invalidate_change_stamp()
+
+    def wiki_page_changed(self, page, version, t, comment, author, ipnr):
+        self.invalidate_change_stamp()
+
+    def wiki_page_deleted(self, page):
+        self.invalidate_change_stamp()
+
+    def wiki_page_version_deleted(self, page):
+        self.invalidate_change_stamp()
+
+    def wiki_page_renamed(self, page, old_name):
+        self.invalidate_change_stamp()
+
     # IWikiSyntaxProvider methods
 
     XML_NAME = r"[\w:](?<!\d)(?:[\w:.-]*[\w-])?"
@@ -313,8 +418,8 @@ class WikiSystem(Component):
 
     PAGE_SPLIT_RE = re.compile(r"([a-z])([A-Z])(?=[a-z])")
 
-    Lu = ''.join(unichr(c) for c in range(0, 0x10000) if unichr(c).isupper())
-    Ll = ''.join(unichr(c) for c in range(0, 0x10000) if unichr(c).islower())
+    Lu = _UnicodeCharClass('Lu', unicode.isupper)
+    Ll = _UnicodeCharClass('Ll', unicode.islower)
 
     def format_page_name(self, page, split=False):
         if split or self.split_page_names:
@@ -437,10 +437,73 @@ class Formatter(object):
         self.wikiparser = WikiParser(self.env)
         self._anchors = {}
         self._open_tags = []
+        self._prefetched = {}
         self._safe_schemes = None
         if not self.wiki.render_unsafe_content:
             self._safe_schemes = set(self.wiki.safe_schemes)
 
+    def prefetched(self, realm):
+        """Return the `dict` in which link prefetchers store the data
+        retrieved for the links to resources of `realm`.
+
+        :since: 1.1.2
+        """
+        return self._prefetched.setdefault(realm, {})
+
+    def prefetch_links(self, lines):
+        """Collect the TracLinks targets found in `lines` and give them
+        to the link prefetchers of their namespace, so that the links
+        can be rendered without querying the resources one by one.
+
+        :since: 1.1.2
+        """
+        prefetchers = self.wikiparser.link_prefetchers
+        if not prefetchers:
+            return
+        intertrac = self.env.config['intertrac']
+        shorthands = self.wikiparser.link_shorthands
+        targets = {}
+        depth = 0
+        for line in lines:
+            # Skip code blocks, in which links are not rendered
+            if WikiParser.ENDBLOCK not in line and \
+                    WikiParser._startblock_re.match(line):
+                depth += 1
+                continue
+            if depth:
+                if line.strip() == WikiParser.ENDBLOCK:
+                    depth -= 1
+                continue
+            for match in self.wikiparser.rules.finditer(line):
+                if match.group(0).startswith('!'):
+                    continue
+                link = None
+                if match.group('shref'):
+                    link = match.group('sns'), match.group('stgt')
+                elif match.group('shrefbr'):
+                    link = match.group('snsbr'), match.group('stgtbr')
+                elif match.group('lhref'):
+                    if match.group('lns'):
+                        link = match.group('lns'), match.group('ltgt') or ''
+                else:
+                    for itype, shorthand in shorthands.iteritems():
+                        if match.group(itype):
+                            link = shorthand(match.group(itype), match)
+                            break
+                if link:
+                    ns, target = link
+                    ns = intertrac.get(ns, ns)
+                    if ns in prefetchers:
+                        targets.setdefault(ns, set()) \
+                               .add(unquote_label(target))
+        for ns, ns_targets in targets.iteritems():
+            try:
+                prefetchers[ns](self, ns, ns_targets)
+            except Exception, e:
+                self.env.log.warning("Failed to prefetch %s links: %s", ns,
+                                     exception_to_unicode(e,
+                                                          traceback=True))
+
 
     def split_link(self, target):
         return split_url_into_path_query_fragment(target)
@@ -1255,6 +1318,9 @@ class Formatter(object):
         text = self.reset(text, out)
         if isinstance(text, basestring):
             text = text.splitlines()
+        else:
+            text = list(text)
+        self.prefetch_links(text)
 
         for line in text:
             # Detect start of code block (new block or embedded block)
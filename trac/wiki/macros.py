@@ -741,6 +741,8 @@ class TracIniMacro(WikiMacroBase):
 
     def expand_macro(self, formatter, name, args):
         from trac.config import ConfigSection, Option
+        from trac.loader import load_deferred_components
+        load_deferred_components(self.env)
         section_filter = key_filter = ''
         args, kw = parse_args(args)
         if args:
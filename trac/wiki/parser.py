@@ -168,8 +168,10 @@ class WikiParser(Component):
     def __init__(self):
         self._compiled_rules = None
         self._link_resolvers = None
+        self._link_prefetchers = None
         self._helper_patterns = None
         self._external_handlers = None
+        self._link_shorthands = None
 
     @property
     def rules(self):
@@ -186,16 +188,28 @@ class WikiParser(Component):
         self._prepare_rules()
         return self._external_handlers
 
+    @property
+    def link_shorthands(self):
+        self._prepare_rules()
+        return self._link_shorthands
+
     def _prepare_rules(self):
         from trac.wiki.api import WikiSystem
         if not self._compiled_rules:
             helpers = []
             handlers = {}
+            shorthands = {}
             syntax = self._pre_rules[:]
             i = 0
             for resolver in WikiSystem(self.env).syntax_providers:
+                get_link_shorthands = getattr(resolver, 'get_link_shorthands',
+                                              None)
+                links = dict(get_link_shorthands and
+                             get_link_shorthands() or [])
                 for regexp, handler in resolver.get_wiki_syntax() or []:
                     handlers['i' + str(i)] = handler
+                    if regexp in links:
+                        shorthands['i' + str(i)] = links[regexp]
                     syntax.append('(?P<i%d>%s)' % (i, regexp))
                     i += 1
             syntax += self._post_rules[:]
@@ -204,6 +218,7 @@ class WikiParser(Component):
                 helpers += helper_re.findall(rule)[1:]
             rules = re.compile('(?:' + '|'.join(syntax) + ')', re.UNICODE)
             self._external_handlers = handlers
+            self._link_shorthands = shorthands
             self._helper_patterns = helpers
             self._compiled_rules = rules
 
@@ -218,6 +233,20 @@ class WikiParser(Component):
             self._link_resolvers = resolvers
         return self._link_resolvers
 
+    @property
+    def link_prefetchers(self):
+        if self._link_prefetchers is None:
+            from trac.wiki.api import WikiSystem
+            prefetchers = {}
+            for provider in WikiSystem(self.env).syntax_providers:
+                get_link_prefetchers = getattr(provider,
+                                               'get_link_prefetchers', None)
+                if get_link_prefetchers:
+                    for namespace, prefetcher in get_link_prefetchers():
+                        prefetchers[namespace] = prefetcher
+            self._link_prefetchers = prefetchers
+        return self._link_prefetchers
+
     def parse(self, wikitext):
         """Parse `wikitext` and produce a WikiDOM tree."""
         # obviously still some work to do here ;)
@@ -23,8 +23,9 @@ from trac.attachment import Attachment
 from trac.core import *
 from trac.test import EnvironmentStub
 from trac.tests import compat
+from trac.ticket.model import Milestone, Ticket
 from trac.util.datefmt import utc, to_utimestamp
-from trac.wiki import WikiPage, IWikiChangeListener
+from trac.wiki import WikiPage, WikiSystem, IWikiChangeListener
 
 
 class TestWikiChangeListener(Component):
@@ -276,6 +277,35 @@ class WikiPageTestCase(unittest.TestCase):
             page = WikiPage(self.env, 'TestPage')
             self.assertRaises(TracError, page.rename, name)
 
+    def test_change_stamp(self):
+        wikisys = WikiSystem(self.env)
+        stamps = [wikisys.get_change_stamp()]
+        def assert_changed():
+            stamp = wikisys.get_change_stamp()
+            self.assertNotIn(stamp, stamps)
+            stamps.append(stamp)
+
+        self.assertEqual(stamps[-1], wikisys.get_change_stamp())
+        page = WikiPage(self.env, 'TestPage')
+        page.text = 'Bla bla'
+        page.save('joe', 'Testing', '::1')
+        assert_changed()
+        attachment = Attachment(self.env, 'wiki', 'TestPage')
+        attachment.insert('foo.txt', StringIO(''), 0)
+        assert_changed()
+        ticket = Ticket(self.env)
+        ticket['summary'] = 'Ticket'
+        ticket.insert()
+        assert_changed()
+        milestone = Milestone(self.env)
+        milestone.name = 'Milestone'
+        milestone.insert()
+        assert_changed()
+        self.env.db_transaction("INSERT INTO repository VALUES (1, %s, %s)",
+                                ('youngest_rev', '42'))
+        assert_changed()
+        self.assertEqual(stamps[-1], wikisys.get_change_stamp())
+
 
 def suite():
     return unittest.makeSuite(WikiPageTestCase, 'test')
@@ -23,7 +23,7 @@ import re
 
 from genshi.builder import tag
 
-from trac.attachment import AttachmentModule
+from trac.attachment import Attachment, AttachmentModule
 from trac.config import IntOption
 from trac.core import *
 from trac.mimeview.api import IContentConverter, Mimeview
@@ -32,7 +32,8 @@ from trac.resource import *
 from trac.search import ISearchSource, search_to_sql, shorten_result
 from trac.timeline.api import ITimelineEventProvider
 from trac.util import get_reporter_id
-from trac.util.datefmt import from_utimestamp, to_utimestamp
+from trac.util.datefmt import from_utimestamp, pretty_timedelta, \
+                              to_utimestamp
 from trac.util.text import shorten_line
 from trac.util.translation import _, tag_
 from trac.versioncontrol.diff import get_diff_options, diff_blocks
@@ -578,6 +579,15 @@ class WikiModule(Component):
     def _render_view(self, req, page):
         version = page.resource.version
 
+        if page.exists:
+            req.check_modified(page.time, [
+                page.name, version, req.query_string,
+                [(attachment.filename, attachment.date, attachment.description)
+                 for attachment in Attachment.select(self.env, 'wiki',
+                                                     page.name)],
+                WikiSystem(self.env).get_change_stamp(),
+                pretty_timedelta(page.time)])
+
         # Add registered converters
         if page.exists:
             for conversion in Mimeview(self.env).get_supported_conversions(
@@ -791,3 +801,10 @@ class ReadonlyWikiPolicy(Component):
             page = WikiPage(self.env, resource)
             if page.readonly and 'WIKI_ADMIN' not in perm(resource):
                 return False
+
+    def check_permissions(self, action, username, resources, perm):
+        if action not in ('WIKI_DELETE', 'WIKI_MODIFY', 'WIKI_RENAME'):
+            return [None] * len(resources)
+        return [self.check_permission(action, username, resource,
+                                      perm(resource) if resource else perm)
+                for resource in resources]
@@ -14,14 +14,15 @@
 #
 # Author: Alec Thomas <alec@swapoff.org>
 
-from fnmatch import fnmatch
+from fnmatch import translate
 from itertools import groupby
 import os
+import re
 
 from trac.core import *
 from trac.config import ConfigurationError, Option
 from trac.perm import PermissionSystem, IPermissionPolicy
-from trac.util import lazy
+from trac.util import LRUCache, lazy
 from trac.util.text import to_unicode
 from trac.util.translation import _
 
@@ -138,12 +139,29 @@ class AuthzPolicy(Component):
     authz = None
     authz_mtime = None
 
+    # Number of decisions remembered between two reloads of the file
+    decisions_cache_size = 10000
+
+    _literal_prefix_re = re.compile(r'[^*?[]*')
+
+    def __init__(self):
+        self._decisions = LRUCache(self.decisions_cache_size)
+
     # IPermissionPolicy methods
 
     def check_permission(self, action, username, resource, perm):
         if not self.authz_mtime or \
                 os.path.getmtime(self.get_authz_file) > self.authz_mtime:
             self.parse_authz()
+        key = (action, username, resource)
+        try:
+            return self._decisions[key]
+        except KeyError:
+            decision = self._check_permission(action, username, resource)
+            self._decisions[key] = decision
+            return decision
+
+    def _check_permission(self, action, username, resource):
         resource_key = self.normalise_resource(resource)
         self.log.debug('Checking %s on %s', action, resource_key)
         permissions = self.authz_permissions(resource_key, username)
@@ -217,6 +235,26 @@ class AuthzPolicy(Component):
         for group, users in groups.iteritems():
             add_items('@' + group, users)
 
+        # Index the sections by the literal prefix of their pattern, so
+        # that only the sections which can match a resource are tried
+        self.rules = []
+        self.rules_by_prefix = {}
+        for resource_section in self.authz.sections:
+            if resource_section == 'groups':
+                continue
+            resource_glob = resource_section
+            if '@' not in resource_glob:
+                resource_glob += '@*'
+            resource_glob = os.path.normcase(resource_glob)
+            prefix = self._literal_prefix_re.match(resource_glob).group(0)
+            self.rules_by_prefix.setdefault(prefix, []) \
+                                .append(len(self.rules))
+            self.rules.append((re.compile(translate(resource_glob)).match,
+                               resource_glob, resource_section))
+        self.prefix_lengths = sorted(set(len(prefix) for prefix
+                                         in self.rules_by_prefix))
+        self._decisions.clear()
+
         self.authz_mtime = os.path.getmtime(self.get_authz_file)
 
     def normalise_resource(self, resource):
@@ -251,13 +289,16 @@ class AuthzPolicy(Component):
             valid_users = ['*', 'authenticated', username]
         else:
             valid_users = ['*', 'anonymous']
-        for resource_section in [a for a in self.authz.sections
-                                 if a != 'groups']:
-            resource_glob = resource_section
-            if '@' not in resource_glob:
-                resource_glob += '@*'
-
-            if fnmatch(resource_key, resource_glob):
+        resource_key = os.path.normcase(resource_key)
+        candidates = set()
+        for length in self.prefix_lengths:
+            if length > len(resource_key):
+                break
+            candidates.update(self.rules_by_prefix.get(resource_key[:length],
+                                                       ()))
+        for idx in sorted(candidates):
+            match, resource_glob, resource_section = self.rules[idx]
+            if match(resource_key):
                 section = self.authz[resource_section]
                 for who, permissions in section.iteritems():
                     if who in valid_users or \
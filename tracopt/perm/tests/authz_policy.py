@@ -135,6 +135,40 @@ wiki:WikiStart]
 """)
         self.assertRaises(ConfigurationError, self.authz_policy.parse_authz)
 
+    def test_sections_matched_in_order(self):
+        create_file(self.authz_file, """\
+[wiki:Private*]
+* =
+
+[wiki:PrivateNotes/Public]
+* = WIKI_VIEW
+
+[*]
+* = WIKI_VIEW
+""")
+        self.assertEqual(False, self.check_permission(
+            'WIKI_VIEW', 'anonymous', Resource('wiki', 'PrivateNotes/Public'),
+            None))
+        self.assertEqual(False, self.check_permission(
+            'WIKI_VIEW', 'anonymous', Resource('wiki', 'Private'), None))
+        self.assertEqual(True, self.check_permission(
+            'WIKI_VIEW', 'anonymous', Resource('wiki', 'WikiStart'), None))
+
+    def test_decisions_invalidated_on_reload(self):
+        resource = Resource('wiki', 'WikiStart')
+        self.assertEqual(
+            True,
+            self.check_permission('WIKI_VIEW', u'änon', resource, None))
+        create_file(self.authz_file, """\
+[wiki:WikiStart]
+* =
+""")
+        mtime = os.path.getmtime(self.authz_file) + 10
+        os.utime(self.authz_file, (mtime, mtime))
+        self.assertEqual(
+            False,
+            self.check_permission('WIKI_VIEW', u'änon', resource, None))
+
 
 def suite():
     suite = unittest.TestSuite()
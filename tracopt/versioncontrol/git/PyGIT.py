@@ -24,11 +24,12 @@ from operator import itemgetter
 import re
 from subprocess import Popen, PIPE
 import sys
-from threading import Lock
+from threading import BoundedSemaphore, Lock
 import time
 import weakref
 
-from trac.util import terminate
+from trac.util import AtomicFile, terminate
+from trac.util.compat import sha1
 from trac.util.text import to_unicode
 
 __all__ = ['GitError', 'GitErrorSha', 'Storage', 'StorageFactory']
@@ -117,14 +118,21 @@ class GitCore(object):
             return Popen(self.__build_git_cmd(git_cmd, *cmd_args),
                          close_fds=True, **kw)
 
-    def __execute(self, git_cmd, *cmd_args):
-        """execute git command and return file-like object of stdout"""
+    def __execute(self, git_cmd, *cmd_args, **kw):
+        """execute git command and return file-like object of stdout
+
+        The `input` keyword argument, if given, is written to the
+        standard input of the command.
+        """
 
         #print >>sys.stderr, "DEBUG:", git_cmd, cmd_args
 
-        p = self.__pipe(git_cmd, stdout=PIPE, stderr=PIPE, *cmd_args)
+        input = kw.get('input')
+        p = self.__pipe(git_cmd, stdout=PIPE, stderr=PIPE,
+                        stdin=PIPE if input is not None else None,
+                        *cmd_args)
 
-        stdout_data, stderr_data = p.communicate()
+        stdout_data, stderr_data = p.communicate(input)
         if self.__log and (p.returncode != 0 or stderr_data):
             self.__log.debug('%s exits with %d, dir: %r, args: %s %r, '
                              'stderr: %r', self.__git_bin, p.returncode,
@@ -135,11 +143,16 @@ class GitCore(object):
     def cat_file_batch(self):
         return self.__pipe('cat-file', '--batch', stdin=PIPE, stdout=PIPE)
 
+    def cat_file_batch_check(self):
+        return self.__pipe('cat-file', '--batch-check', stdin=PIPE,
+                           stdout=PIPE)
+
     def log_pipe(self, *cmd_args):
         return self.__pipe('log', stdout=PIPE, *cmd_args)
 
     def __getattr__(self, name):
-        if name[0] == '_' or name in ['cat_file_batch', 'log_pipe']:
+        if name[0] == '_' or name in ['cat_file_batch',
+                                      'cat_file_batch_check', 'log_pipe']:
             raise AttributeError, name
         return partial(self.__execute, name.replace('_','-'))
 
@@ -187,20 +200,76 @@ class SizedDict(dict):
         raise NotImplemented("SizedDict has no setdefault() method")
 
 
+class CatFilePool(object):
+    """Pool of long-lived `git cat-file --batch` processes
+
+    At most `max_size` processes are alive at the same time. They are
+    created on demand and kept for later use once released. When all
+    of them are in use, `acquire()` waits for one to be released.
+    """
+
+    def __init__(self, create, max_size=1):
+        self.__create = create
+        self.__slots = BoundedSemaphore(max(1, max_size))
+        self.__idle = []
+        self.__lock = Lock()
+
+    def acquire(self):
+        """Return an idle process, or a new one if none is available."""
+        self.__slots.acquire()
+        try:
+            with self.__lock:
+                if self.__idle:
+                    return self.__idle.pop()
+            return self.__create()
+        except:
+            self.__slots.release()
+            raise
+
+    def release(self, proc, discard=False):
+        """Give back a process obtained from `acquire()`.
+
+        The process is terminated if `discard` is `True` (e.g. when its
+        output is in an unknown state).
+        """
+        try:
+            if discard:
+                self.__close(proc)
+            else:
+                with self.__lock:
+                    self.__idle.append(proc)
+        finally:
+            self.__slots.release()
+
+    def close(self):
+        """Terminate all the idle processes."""
+        with self.__lock:
+            procs, self.__idle = self.__idle, []
+        for proc in procs:
+            self.__close(proc)
+
+    def __close(self, proc):
+        proc.stdin.close()
+        terminate(proc)
+        proc.wait()
+
+
 class StorageFactory(object):
     __dict = weakref.WeakValueDictionary()
     __dict_nonweak = dict()
     __dict_lock = Lock()
 
     def __init__(self, repo, log, weak=True, git_bin='git',
-                 git_fs_encoding=None):
+                 git_fs_encoding=None, rev_cache_file=None,
+                 cat_file_pool_size=1):
         self.logger = log
 
         with StorageFactory.__dict_lock:
             try:
                 i = StorageFactory.__dict[repo]
             except KeyError:
-                i = Storage(repo, log, git_bin, git_fs_encoding)
+                i = Storage(repo, log, git_bin, git_fs_encoding,
+                            rev_cache_file, cat_file_pool_size)
                 StorageFactory.__dict[repo] = i
 
                 # create or remove additional reference depending on 'weak'
@@ -334,7 +403,8 @@ class Storage(object):
                            "execute/parse '%s --version' but got %s)"
                            % (git_bin, repr(e)))
 
-    def __init__(self, git_dir, log, git_bin='git', git_fs_encoding=None):
+    def __init__(self, git_dir, log, git_bin='git', git_fs_encoding=None,
+                 rev_cache_file=None, cat_file_pool_size=1):
         """Initialize PyGit.Storage instance
 
         `git_dir`: path to .git folder;
@@ -349,6 +419,16 @@ class Storage(object):
                 if `None`, no implicit decoding/encoding to/from
                 unicode objects is performed, and bytestrings are
                 returned instead
+
+        `rev_cache_file`: path to the file in which the commit tree is
+                saved, so that it can be loaded by other processes and
+                only needs to be updated with the new commits; if
+                `None`, the whole commit tree is retrieved from git
+                whenever the revision cache is rebuilt
+
+        `cat_file_pool_size`: maximum number of `git cat-file` processes
+                run for reading objects; it should match the number
+                of threads concurrently accessing the repository
         """
 
         self.logger = log
@@ -358,13 +438,14 @@ class Storage(object):
         # caches
         self.__rev_cache = None
         self.__rev_cache_lock = Lock()
+        self.__rev_cache_file = rev_cache_file
 
         # cache the last 200 commit messages
         self.__commit_msg_cache = SizedDict(200)
         self.__commit_msg_lock = Lock()
 
-        self.__cat_file_pipe = None
-        self.__cat_file_pipe_lock = Lock()
+        self.__cat_file_pool = None
+        self.__cat_file_check_pool = None
 
         if git_fs_encoding is not None:
             # validate encoding name
@@ -402,15 +483,17 @@ class Storage(object):
                            % (git_dir, to_unicode(e)))
 
         self.repo = GitCore(git_dir, git_bin=git_bin, log=log)
+        self.__cat_file_pool = CatFilePool(self.repo.cat_file_batch,
+                                           cat_file_pool_size)
+        self.__cat_file_check_pool = \
+            CatFilePool(self.repo.cat_file_batch_check, cat_file_pool_size)
 
         self.logger.debug("PyGIT.Storage instance %d constructed" % id(self))
 
     def __del__(self):
-        with self.__cat_file_pipe_lock:
-            if self.__cat_file_pipe is not None:
-                self.__cat_file_pipe.stdin.close()
-                terminate(self.__cat_file_pipe)
-                self.__cat_file_pipe.wait()
+        for pool in (self.__cat_file_pool, self.__cat_file_check_pool):
+            if pool is not None:
+                pool.close()
 
     #
     # cache handling
@@ -475,11 +558,7 @@ class Storage(object):
                 head_revs = set(v for _, v in new_branches)
 
                 rev = ord_rev = 0
-                for ord_rev, revs in enumerate(
-                                        self.repo.rev_list('--parents',
-                                                           '--topo-order',
-                                                           '--all')
-                                                 .splitlines()):
+                for ord_rev, revs in enumerate(self.__read_rev_list()):
                     revs = map(__rev_reuse, revs.strip().split())
 
                     rev = revs[0]
@@ -570,6 +649,99 @@ class Storage(object):
     # see RevCache namedtuple
     rev_cache = property(get_rev_cache)
 
+    __REV_CACHE_FILE_MAGIC = 'trac-git-rev-cache 1'
+
+    def __read_rev_list(self):
+        """Return the lines of `git rev-list --parents --topo-order --all`.
+
+        If a revision cache file is used, the lines are read from that
+        file when the refs of the repository didn't change since it was
+        written. Otherwise, if all the commits of the file are still
+        reachable, only the new commits are retrieved from git and
+        prepended to the lines of the file, which is then updated.
+        """
+        def rev_list(*args, **kw):
+            return self.repo.rev_list('--parents', '--topo-order',
+                                      *args, **kw).splitlines()
+
+        def stdin_revs(revs, excluded):
+            # The revisions are passed on the standard input, as there
+            # may be too many of them for the command line
+            return ''.join([rev + '\n' for rev in revs] +
+                           ['^' + rev + '\n' for rev in excluded])
+
+        path = self.__rev_cache_file
+        if not path:
+            return rev_list('--all')
+
+        tips = sorted(set(self.repo.rev_list('--no-walk', '--all').split()))
+        refs_hash = sha1(' '.join(tips)).hexdigest()
+        old_hash, old_tips, lines = self.__load_rev_list(path)
+        if old_hash == refs_hash:
+            self.logger.debug("loaded commit tree for %d from %s",
+                              id(self), path)
+            return lines
+
+        if old_tips and tips and \
+                self.repo.rev_list('--count', '--stdin',
+                                   input=stdin_revs(old_tips, tips)) \
+                         .strip() == '0':
+            # The new commits are not reachable from the old tips, so
+            # they come first in topological order
+            new_lines = rev_list('--stdin', input=stdin_revs(tips, old_tips))
+            lines = new_lines + lines
+            revs = set(line[:40] for line in lines)
+            if all(tip in revs for tip in tips):
+                self.logger.debug("added %d commits to commit tree for %d",
+                                  len(new_lines), id(self))
+            else:
+                lines = None
+        else:
+            lines = None
+        if lines is None:
+            lines = rev_list('--all')
+        self.__save_rev_list(path, refs_hash, tips, lines)
+        return lines
+
+    def __load_rev_list(self, path):
+        """Return a `(refs_hash, tips, lines)` tuple read from the
+        revision cache file, or `(None, None, None)` if the file doesn't
+        exist or can't be used."""
+        try:
+            with open(path, 'rb') as f:
+                if f.readline().rstrip('\n').rsplit(' ', 1)[0] == \
+                        self.__REV_CACHE_FILE_MAGIC:
+                    f.seek(0)
+                    refs_hash = f.readline().split()[-1]
+                    tips = f.readline().split()
+                    return refs_hash, tips, f.read().splitlines()
+                self.logger.warning("ignoring invalid commit tree file %s",
+                                    path)
+        except IOError, e:
+            if os.path.exists(path):
+                self.logger.warning("can't read commit tree file %s: %s",
+                                    path, to_unicode(e))
+        return None, None, None
+
+    def __save_rev_list(self, path, refs_hash, tips, lines):
+        try:
+            dir = os.path.dirname(path)
+            if not os.path.isdir(dir):
+                os.makedirs(dir)
+            f = AtomicFile(path, 'wb')
+            try:
+                f.write('%s %s\n' % (self.__REV_CACHE_FILE_MAGIC, refs_hash))
+                f.write(' '.join(tips) + '\n')
+                for line in lines:
+                    f.write(line + '\n')
+            except:
+                f.rollback()
+                raise
+            f.commit()
+        except (IOError, OSError), e:
+            self.logger.warning("can't write commit tree file %s: %s",
+                                path, to_unicode(e))
+
     def _get_branches(self):
         """returns list of (local) branches, with active (= HEAD) one being
         the first item
@@ -665,38 +837,65 @@ class Storage(object):
         return self.verifyrev('HEAD')
 
     def cat_file(self, kind, sha):
-        with self.__cat_file_pipe_lock:
-            if self.__cat_file_pipe is None:
-                self.__cat_file_pipe = self.repo.cat_file_batch()
-
-            try:
-                self.__cat_file_pipe.stdin.write(sha + '\n')
-                self.__cat_file_pipe.stdin.flush()
+        pipe = self.__cat_file_pool.acquire()
+        try:
+            pipe.stdin.write(sha + '\n')
+            pipe.stdin.flush()
 
-                split_stdout_line = self.__cat_file_pipe.stdout.readline() \
-                                                               .split()
-                if len(split_stdout_line) != 3:
-                    raise GitError("internal error (could not split line "
-                                   "'%s')" % (split_stdout_line,))
+            split_stdout_line = pipe.stdout.readline().split()
+            if len(split_stdout_line) != 3:
+                raise GitError("internal error (could not split line "
+                               "'%s')" % (split_stdout_line,))
 
-                _sha, _type, _size = split_stdout_line
+            _sha, _type, _size = split_stdout_line
 
-                if _type != kind:
-                    raise GitError("internal error (got unexpected object "
-                                   "kind '%s', expected '%s')"
-                                   % (_type, kind))
+            if _type != kind:
+                raise GitError("internal error (got unexpected object "
+                               "kind '%s', expected '%s')"
+                               % (_type, kind))
 
-                size = int(_size)
-                return self.__cat_file_pipe.stdout.read(size + 1)[:size]
-            except:
-                # There was an error, we should close the pipe to get to a
-                # consistent state (Otherwise it happens that next time we
-                # call cat_file we get payload from previous call)
-                self.logger.debug("closing cat_file pipe")
-                self.__cat_file_pipe.stdin.close()
-                terminate(self.__cat_file_pipe)
-                self.__cat_file_pipe.wait()
-                self.__cat_file_pipe = None
+            size = int(_size)
+            data = pipe.stdout.read(size + 1)[:size]
+        except Exception, e:
+            # There was an error, we should close the pipe to get to a
+            # consistent state (Otherwise it happens that next time we
+            # call cat_file we get payload from previous call)
+            self.logger.debug("closing cat_file pipe")
+            self.__cat_file_pool.release(pipe, discard=True)
+            if isinstance(e, GitError):
+                raise
+            raise GitError("cat-file failed for '%s' (%s)"
+                           % (sha, to_unicode(e)))
+        self.__cat_file_pool.release(pipe)
+        return data
+
+    def cat_file_check(self, shas):
+        """Return a `{sha: (type, size)}` dict for the given objects,
+        as reported by `git cat-file --batch-check`. Missing objects are
+        not part of the result."""
+        result = {}
+        shas = list(shas)
+        pipe = self.__cat_file_check_pool.acquire()
+        try:
+            # query in chunks, so that git never blocks on a full pipe
+            # while we're still writing
+            for idx in xrange(0, len(shas), 100):
+                chunk = shas[idx:idx + 100]
+                pipe.stdin.write(''.join(sha + '\n' for sha in chunk))
+                pipe.stdin.flush()
+                for sha in chunk:
+                    line = pipe.stdout.readline().split()
+                    if len(line) == 3:
+                        result[sha] = (line[1], int(line[2]))
+                    elif len(line) != 2 or line[1] != 'missing':
+                        raise GitError("internal error (could not split "
+                                       "line '%s')" % (line,))
+        except:
+            self.logger.debug("closing cat_file --batch-check pipe")
+            self.__cat_file_check_pool.release(pipe, discard=True)
+            raise
+        self.__cat_file_check_pool.release(pipe)
+        return result
 
     def verifyrev(self, rev):
         """verify/lookup given revision object and return a sha id or None
@@ -797,7 +996,12 @@ class Storage(object):
         if path.startswith('/'):
             path = path[1:]
 
-        tree = self.repo.ls_tree('-z', '-l', rev, '--', path).split('\0')
+        if rev in self.rev_cache.rev_dict:
+            return self.__read_tree_entries(rev, path)
+
+        # recent versions of git reject an empty pathspec
+        args = ('-z', '-l', rev, '--') + ((path,) if path else ())
+        tree = self.repo.ls_tree(*args).split('\0')
 
         def split_ls_tree_line(l):
             """split according to '<mode> <type> <sha> <size>\t<fname>'"""
@@ -814,6 +1018,65 @@ class Storage(object):
 
         return [ split_ls_tree_line(e) for e in tree if e ]
 
+    @staticmethod
+    def __parse_tree(raw):
+        """Split a raw tree object in `(mode, type, sha, name)` tuples."""
+        entries = []
+        pos = 0
+        while raw and pos < len(raw):
+            sp = raw.index(' ', pos)
+            nul = raw.index('\0', sp)
+            mode = raw[pos:sp].zfill(6)
+            sha = raw[nul + 1:nul + 21].encode('hex')
+            if mode == '040000':
+                kind = 'tree'
+            elif mode == '160000':
+                kind = 'commit'
+            else:
+                kind = 'blob'
+            entries.append((mode, kind, sha, raw[sp + 1:nul]))
+            pos = nul + 21
+        return entries
+
+    def __read_tree_entries(self, commit_sha, path):
+        """Same as `git ls-tree -l <commit_sha> -- <path>`, but reading
+        and parsing the tree objects through `git cat-file --batch`.
+
+        `path` is an encoded path; with a trailing `/`, the entries of
+        the directory are returned, otherwise the entry for `path`.
+        """
+        raw = self.cat_file('commit', commit_sha)
+        if not raw or not raw.startswith('tree '):
+            raise GitErrorSha
+        tree_sha = raw[5:45]
+        prefix = ''
+        names = [name for name in path.split('/') if name]
+        if path and not path.endswith('/'):
+            path = names.pop()
+        else:
+            path = None
+        for name in names:
+            for _mode, _type, _sha, _name in \
+                    self.__parse_tree(self.cat_file('tree', tree_sha)):
+                if _name == name:
+                    break
+            else:
+                return []
+            if _type != 'tree':
+                return []
+            tree_sha = _sha
+            prefix += name + '/'
+        entries = self.__parse_tree(self.cat_file('tree', tree_sha))
+        if path is not None:
+            entries = [e for e in entries if e[3] == path]
+
+        sizes = self.cat_file_check(_sha for _mode, _type, _sha, _name
+                                         in entries if _type == 'blob')
+        return [(_mode, _type, _sha,
+                 sizes[_sha][1] if _type == 'blob' else None,
+                 self._fs_to_unicode(prefix + _name))
+                for _mode, _type, _sha, _name in entries]
+
     def read_commit(self, commit_id):
         if not commit_id:
             raise GitError("read_commit called with empty commit_id")
@@ -848,12 +1111,10 @@ class Storage(object):
         sha = str(sha)
 
         try:
-            obj_size = int(self.repo.cat_file('-s', sha).strip())
-        except ValueError:
+            return self.cat_file_check([sha])[sha][1]
+        except KeyError:
             raise GitErrorSha("object '%s' not found" % sha)
 
-        return obj_size
-
     def children(self, sha):
         db = self.get_commits()
 
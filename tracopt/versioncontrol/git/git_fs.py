@@ -24,6 +24,7 @@ from trac.cache import cached
 from trac.config import BoolOption, IntOption, PathOption, Option
 from trac.core import *
 from trac.util import TracError, shorten_line
+from trac.util.compat import sha1
 from trac.util.datefmt import FixedOffset, to_timestamp, format_datetime
 from trac.util.text import to_unicode, exception_to_unicode
 from trac.versioncontrol.api import Changeset, Node, Repository, \
@@ -57,8 +58,8 @@ class GitCachedRepository(CachedRepository):
             raise NoSuchChangeset(rev)
         return normrev
 
-    def get_changeset(self, rev):
-        return GitCachedChangeset(self, self.normalize_rev(rev), self.env)
+    def _create_changeset(self, rev, data=None):
+        return GitCachedChangeset(self, rev, self.env, data)
 
 
 class GitCachedChangeset(CachedChangeset):
@@ -203,6 +204,20 @@ class GitConnector(Component):
     git_bin = Option('git', 'git_bin', 'git',
         """Path to the git executable.""")
 
+    rev_cache_dir = PathOption('git', 'rev_cache_dir', '',
+        """Directory in which the commit tree of each repository is
+        saved, so that it can be reloaded and updated incrementally
+        instead of being rebuilt from the full history. Relative paths
+        are resolved relative to the `conf` directory of the
+        environment. Leave empty to disable the on-disk cache.
+        (''since 1.1.2'')""")
+
+    cat_file_pool_size = IntOption('git', 'cat_file_pool_size', 4,
+        """Maximum number of `git cat-file` processes run per repository
+        for reading objects. When they are all in use, the requests wait
+        for one of them. It should be about the number of threads
+        serving requests concurrently. (''since 1.1.2'')""")
+
 
     def get_supported_types(self):
         yield ('git', 8)
@@ -255,6 +270,8 @@ class GitConnector(Component):
                               persistent_cache=self.persistent_cache,
                               git_bin=self.git_bin,
                               git_fs_encoding=self.git_fs_encoding,
+                              rev_cache_dir=self.rev_cache_dir,
+                              cat_file_pool_size=self.cat_file_pool_size,
                               shortrev_len=self.shortrev_len,
                               rlookup_uid=rlookup_uid,
                               use_committer_id=self.use_committer_id,
@@ -362,6 +379,8 @@ class GitRepository(Repository):
                  persistent_cache=False,
                  git_bin='git',
                  git_fs_encoding='utf-8',
+                 rev_cache_dir=None,
+                 cat_file_pool_size=1,
                  shortrev_len=7,
                  rlookup_uid=lambda _: None,
                  use_committer_id=False,
@@ -378,10 +397,19 @@ class GitRepository(Repository):
         self.use_committer_time = use_committer_time
         self.use_committer_id = use_committer_id
 
+        rev_cache_file = None
+        if rev_cache_dir:
+            rev_cache_file = os.path.join(rev_cache_dir,
+                                          sha1(path.encode('utf-8'))
+                                          .hexdigest())
+
         try:
             self.git = PyGIT.StorageFactory(path, log, not persistent_cache,
                                             git_bin=git_bin,
-                                            git_fs_encoding=git_fs_encoding) \
+                                            git_fs_encoding=git_fs_encoding,
+                                            rev_cache_file=rev_cache_file,
+                                            cat_file_pool_size=
+                                                cat_file_pool_size) \
                             .getInstance()
         except PyGIT.GitError, e:
             log.error(exception_to_unicode(e))
@@ -15,6 +15,8 @@ from __future__ import with_statement
 
 import os
 import tempfile
+import threading
+import time
 import unittest
 from subprocess import Popen, PIPE
 
@@ -25,8 +27,9 @@ from trac.util import create_file
 from trac.util.compat import close_fds
 from trac.versioncontrol.api import Changeset, DbRepositoryProvider
 from tracopt.versioncontrol.git.git_fs import GitConnector
-from tracopt.versioncontrol.git.PyGIT import GitCore, GitError, Storage, \
-                                             parse_commit
+from tracopt.versioncontrol.git.PyGIT import CatFilePool, GitCore, \
+                                             GitError, GitErrorSha, \
+                                             Storage, parse_commit
 
 
 class GitTestCase(unittest.TestCase):
@@ -279,6 +282,112 @@ class NormalTestCase(unittest.TestCase):
                          sorted(b[0] for b in storage.get_branches()))
         self.assertEqual(False, storage.sync())
 
+    def test_rev_cache_file(self):
+        cache_file = os.path.join(self.repos_path, 'cache', 'revs')
+        storage = Storage(os.path.join(self.repos_path, '.git'),
+                          self.env.log, self.git_bin, 'utf-8', cache_file)
+        rev_dict = storage.rev_cache.rev_dict
+        self.assertTrue(os.path.isfile(cache_file))
+
+        # the commit tree is read back from the file
+        storage = Storage(os.path.join(self.repos_path, '.git'),
+                          self.env.log, self.git_bin, 'utf-8', cache_file)
+        self.assertEqual(rev_dict, storage.rev_cache.rev_dict)
+
+        # the file is updated with the new commits only
+        self._git('checkout', '-b', 'b1', 'master')
+        create_file(os.path.join(self.repos_path, 'b1.txt'))
+        self._git('add', 'b1.txt')
+        self._git('commit', '-m', 'added b1.txt',
+                  '--date', 'Wed Jan 8 10:21:05 2014 +0900')
+        self._git('checkout', 'master')
+        create_file(os.path.join(self.repos_path, 'master.txt'))
+        self._git('add', 'master.txt')
+        self._git('commit', '-m', 'added master.txt',
+                  '--date', 'Wed Jan 8 10:25:37 2014 +0900')
+        self._git('merge', '--no-ff', '-m', 'merged b1', 'b1')
+        self.assertEqual(True, storage.sync())
+        rev_cache = storage.rev_cache
+        expected = self._storage().rev_cache
+        self.assertEqual(expected.rev_dict, rev_cache.rev_dict)
+        self.assertEqual(expected.youngest_rev, rev_cache.youngest_rev)
+        self.assertEqual(expected.oldest_rev, rev_cache.oldest_rev)
+        with open(cache_file, 'rb') as f:
+            self.assertEqual(4, len(f.read().splitlines()) - 2)
+
+        # history rewrites lead to a full rebuild
+        self._git('reset', '--hard', 'HEAD~1')
+        self._git('branch', '-D', 'b1')
+        self.assertEqual(True, storage.sync())
+        self.assertEqual(self._storage().rev_cache.rev_dict,
+                         storage.rev_cache.rev_dict)
+
+    def test_ls_tree_from_cat_file(self):
+        os.makedirs(os.path.join(self.repos_path, 'dir', 'sub'))
+        create_file(os.path.join(self.repos_path, 'dir', 'file.txt'),
+                    'file content')
+        create_file(os.path.join(self.repos_path, 'dir', 'sub', 'a.txt'))
+        self._git('add', 'dir')
+        self._git('commit', '-m', 'added dir',
+                  '--date', 'Thu Jan 9 11:06:41 2014 +0900')
+
+        storage = self._storage()
+        rev = storage.head()
+        for path in ('', '/', '.gitignore', 'dir', 'dir/', 'dir/file.txt',
+                     'dir/sub/', 'dir/sub/a.txt', 'dir/missing', 'missing/',
+                     'dir/file.txt/'):
+            # 'HEAD' isn't a sha, so `git ls-tree` is used
+            self.assertEqual(storage.ls_tree('HEAD', path),
+                             storage.ls_tree(rev, path), path)
+        self.assertEqual(12, storage.get_obj_size(
+                                storage.ls_tree(rev, 'dir/file.txt')[0][2]))
+        self.assertRaises(GitErrorSha, storage.get_obj_size, '1' * 40)
+
+    def test_cat_file_concurrent(self):
+        storage = Storage(os.path.join(self.repos_path, '.git'),
+                          self.env.log, self.git_bin, 'utf-8',
+                          cat_file_pool_size=2)
+        rev = storage.head()
+        expected = storage.cat_file('commit', rev)
+        results = []
+
+        def read():
+            for idx in xrange(20):
+                results.append(storage.cat_file('commit', rev))
+
+        threads = [threading.Thread(target=read) for idx in xrange(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([expected] * 80, results)
+
+    def test_cat_file_error(self):
+        storage = Storage(os.path.join(self.repos_path, '.git'),
+                          self.env.log, self.git_bin, 'utf-8')
+        rev = storage.head()
+        self.assertRaises(GitError, storage.cat_file, 'commit', '1' * 40)
+        self.assertRaises(GitError, storage.cat_file, 'tree', rev)
+        self.assertTrue(storage.cat_file('commit', rev).startswith('tree '))
+
+    def test_cat_file_pool_bounded(self):
+        created = []
+        def create():
+            created.append(object())
+            return created[-1]
+        pool = CatFilePool(create, 2)
+        procs = [pool.acquire(), pool.acquire()]
+        acquired = []
+        thread = threading.Thread(target=lambda:
+                                  acquired.append(pool.acquire()))
+        thread.start()
+        time.sleep(0.1)
+        self.assertEqual([], acquired)
+        pool.release(procs[0])
+        thread.join(5)
+        self.assertEqual([procs[0]], acquired)
+        self.assertEqual(2, len(created))
+
 
 class UnicodeNameTestCase(unittest.TestCase):
 
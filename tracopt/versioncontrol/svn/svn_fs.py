@@ -47,12 +47,14 @@ Warning:
   those properties...
 """
 
+from __future__ import with_statement
+
 import os.path
 import re
 import weakref
 import posixpath
 
-from trac.config import ListOption, ChoiceOption
+from trac.config import ChoiceOption, IntOption, ListOption
 from trac.core import *
 from trac.env import ISystemInfoProvider
 from trac.versioncontrol import Changeset, Node, Repository, \
@@ -60,6 +62,7 @@ from trac.versioncontrol import Changeset, Node, Repository, \
                                 NoSuchChangeset, NoSuchNode
 from trac.versioncontrol.cache import CachedRepository
 from trac.util import embedded_numbers
+from trac.util.concurrency import threading
 from trac.util.text import exception_to_unicode, to_unicode
 from trac.util.translation import _
 from trac.util.datefmt import from_utimestamp, to_datetime, utc
@@ -151,6 +154,18 @@ def _mark_weakpool_invalid(weakpool):
 class Pool(object):
     """A Pythonic memory pool object"""
 
+    _live = 0
+    _live_lock = threading.RLock()
+
+    @classmethod
+    def live_count(cls):
+        """Return the number of memory pools which have not been
+        destroyed yet.
+
+        :since: 1.1.2
+        """
+        return cls._live
+
     def __init__(self, parent_pool=None):
         """Create a new memory pool"""
 
@@ -169,6 +184,8 @@ class Pool(object):
 
             self._pool = core.svn_pool_create(None)
         self._mark_valid()
+        with Pool._live_lock:
+            Pool._live += 1
 
     def __call__(self):
         return self._pool
@@ -229,6 +246,8 @@ class Pool(object):
     def _mark_invalid(self):
         """Mark pool as invalid"""
         if self.valid():
+            with Pool._live_lock:
+                Pool._live -= 1
             # Mark invalid
             del self._is_valid
 
@@ -238,6 +257,101 @@ class Pool(object):
                 del self._weakref
 
 
+class RepositoryHandle(object):
+    """An opened `svn_repos_t` handle, with the memory pool in which it
+    lives.
+
+    :since: 1.1.2
+    """
+
+    def __init__(self, root_path_utf8):
+        self.root_path_utf8 = root_path_utf8
+        self.pool = Pool()
+        try:
+            self.repos = repos.svn_repos_open(root_path_utf8, self.pool())
+        except core.SubversionException, e:
+            self.pool.destroy()
+            raise TracError(_("Couldn't open Subversion repository %(path)s: "
+                              "%(svn_error)s",
+                              path=to_unicode(root_path_utf8),
+                              svn_error=exception_to_unicode(e)))
+        self.fs_ptr = repos.svn_repos_fs(self.repos)
+        self.uuid = fs.get_uuid(self.fs_ptr, self.pool())
+
+    def close(self):
+        if self.pool:
+            self.pool.destroy()
+        self.repos = self.fs_ptr = self.pool = None
+
+
+class RepositoryHandles(object):
+    """A thread-safe pool of opened `RepositoryHandle`s.
+
+    A handle is only used by one `SubversionRepository` at a time, as
+    the Subversion filesystem objects must not be shared between
+    threads. When the repository is closed, its handle is kept for
+    reuse instead of being destroyed, as long as no more than
+    `max_idle` handles are idle for that repository.
+
+    :since: 1.1.2
+    """
+
+    def __init__(self, max_idle, log=None):
+        self.max_idle = max_idle
+        self.log = log
+        self._idle = {}
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, root_path_utf8):
+        """Return an opened handle for the given repository root."""
+        with self._lock:
+            idle = self._idle.get(root_path_utf8)
+            handle = idle.pop() if idle else None
+            self._in_use += 1
+        if handle is None:
+            try:
+                handle = RepositoryHandle(root_path_utf8)
+            except:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+        return handle
+
+    def release(self, handle):
+        """Give back a handle obtained from `acquire()`."""
+        with self._lock:
+            self._in_use -= 1
+            idle = self._idle.setdefault(handle.root_path_utf8, [])
+            if len(idle) < self.max_idle:
+                idle.append(handle)
+                handle = None
+        if handle is not None:
+            handle.close()
+        if self.log:
+            self.log.debug("Subversion handles: %(in_use)d in use, "
+                           "%(idle)d idle, %(pools)d live pools",
+                           self.get_stats())
+
+    def clear(self):
+        """Close all the idle handles."""
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+        for handles in idle.itervalues():
+            for handle in handles:
+                handle.close()
+
+    def get_stats(self):
+        """Return a dictionary with the number of handles currently
+        `in_use` and `idle`, and the number of live memory `pools`.
+        """
+        with self._lock:
+            return {'in_use': self._in_use,
+                    'idle': sum(len(idle) for idle in self._idle.values()),
+                    'pools': Pool.live_count()}
+
+
 class SvnCachedRepository(CachedRepository):
     """Subversion-specific cached repository, zero-pads revision numbers
     in the cache tables.
@@ -280,6 +394,14 @@ class SubversionConnector(Component):
         specified EOL marker.
         """)
 
+    max_idle_handles = IntOption('svn', 'max_idle_handles', 4,
+        """Maximum number of opened handles kept for reuse for each
+        Subversion repository, once the request which used them is
+        done. Reusing a handle avoids reopening the repository and
+        reallocating its memory pools for each request. A value of 0
+        closes the handles when the request is done.
+        (''since 1.1.2'')""")
+
     error = None
 
     def __init__(self):
@@ -298,6 +420,7 @@ class SubversionConnector(Component):
                 self.error = _("Subversion >= 1.0 required, found %(version)s",
                                version=self._version)
             Pool()
+        self.handles = RepositoryHandles(self.max_idle_handles, self.log)
 
     # ISystemInfoProvider methods
 
@@ -323,20 +446,31 @@ class SubversionConnector(Component):
         """
         params.update(tags=self.tags, branches=self.branches)
         params.setdefault('eol_style', self.eol_style)
-        repos = SubversionRepository(dir, params, self.log)
+        repos = SubversionRepository(dir, params, self.log, self.handles)
         if type != 'direct-svnfs':
             repos = SvnCachedRepository(self.env, repos, self.log)
         return repos
 
+    def shutdown(self):
+        self.handles.clear()
+
 
 class SubversionRepository(Repository):
     """Repository implementation based on the svn.fs API."""
 
     has_linear_changesets = True
 
-    def __init__(self, path, params, log):
+    def __init__(self, path, params, log, handles=None):
+        """Open the Subversion repository at `path`.
+
+        :param handles: the `RepositoryHandles` from which the
+                        repository handle is taken, if given; otherwise
+                        a handle is opened for this instance only
+        """
         self.log = log
-        self.pool = Pool()
+        self.pool = None
+        self._handles = handles
+        self._handle = None
 
         # Remove any trailing slash or else subversion might abort
         if isinstance(path, unicode):
@@ -348,20 +482,26 @@ class SubversionRepository(Repository):
                                 os.path.normpath(path_utf8).replace('\\', '/'))
         self.path = path_utf8.decode('utf-8')
 
-        root_path_utf8 = repos.svn_repos_find_root_path(path_utf8, self.pool())
+        tmp = Pool()
+        try:
+            root_path_utf8 = repos.svn_repos_find_root_path(path_utf8, tmp())
+        finally:
+            tmp.destroy()
         if root_path_utf8 is None:
             raise TracError(_("%(path)s does not appear to be a Subversion "
                               "repository.", path=to_unicode(path_utf8)))
 
-        try:
-            self.repos = repos.svn_repos_open(root_path_utf8, self.pool())
-        except core.SubversionException, e:
-            raise TracError(_("Couldn't open Subversion repository %(path)s: "
-                              "%(svn_error)s", path=to_unicode(path_utf8),
-                              svn_error=exception_to_unicode(e)))
-        self.fs_ptr = repos.svn_repos_fs(self.repos)
-
-        self.uuid = fs.get_uuid(self.fs_ptr, self.pool())
+        if handles is not None:
+            self._handle = handles.acquire(root_path_utf8)
+        else:
+            self._handle = RepositoryHandle(root_path_utf8)
+        # All the memory allocated on behalf of this instance comes from
+        # a sub-pool of the handle, which is freed by `close()`
+        self.pool = Pool(self._handle.pool)
+        self.repos = self._handle.repos
+        self.fs_ptr = self._handle.fs_ptr
+
+        self.uuid = self._handle.uuid
         self.base = 'svn:%s:%s' % (self.uuid, _from_svn(root_path_utf8))
         name = 'svn:%s:%s' % (self.uuid, self.path)
 
@@ -424,9 +564,20 @@ class SubversionRepository(Repository):
             raise NoSuchChangeset(rev)
 
     def close(self):
-        """Dispose of low-level resources associated to this repository."""
+        """Dispose of low-level resources associated to this repository.
+
+        The repository handle is given back for reuse if it was taken
+        from a `RepositoryHandles` pool.
+        """
         if self.pool:
             self.pool.destroy()
+        handle = getattr(self, '_handle', None)
+        if handle:
+            if self._handles is not None:
+                self._handles.release(handle)
+            else:
+                handle.close()
+        self._handle = None
         self.repos = self.fs_ptr = self.pool = None
 
     def get_base(self):
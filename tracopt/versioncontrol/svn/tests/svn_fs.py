@@ -1029,6 +1029,17 @@ class SubversionRepositoryTestCase(unittest.TestCase):
         # the file ... being used by another process: ...\rep-cache.db'
         self.env.shutdown(get_thread_id())
 
+    def test_repository_handle_reused(self):
+        handles = svn_fs.SubversionConnector(self.env).handles
+        handle = self.repos._handle
+        self.env.shutdown(get_thread_id())
+        self.assertEqual(0, handles.get_stats()['in_use'])
+        self.assertEqual(1, handles.get_stats()['idle'])
+        self.repos = self.env.get_repository(REPOS_NAME)
+        self.assertIs(handle, self.repos._handle)
+        self.assertEqual(1, handles.get_stats()['in_use'])
+        self.assertEqual(0, handles.get_stats()['idle'])
+
 
 # -- Test cases for SvnCachedRepository
 